@@ -0,0 +1,109 @@
+"""Compare the legacy and compact check-in encodings on a synthetic dataset.
+
+    python benchmarks/checkin_encoding.py --users 100000 --days 180 --goals 3
+
+Writes both encodings of the same data to a temp directory, then loads each
+one in a fresh interpreter and reports file size, load time and the resident
+memory the loaded data holds.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from checkins import CheckinHistory
+from storage import decode_records, encode_record_value
+
+
+def synthetic_users(users, days, goals, seed=42):
+    """Legacy-schema records with ~70% of goals done on ~80% of days"""
+    rng = random.Random(seed)
+    today = date.today()
+    names = [f"Goal number {i + 1}" for i in range(goals)]
+    data = {}
+    for user_id in range(1, users + 1):
+        checkins = {}
+        for offset in range(days):
+            if rng.random() < 0.8:
+                day = (today - timedelta(days=offset)).isoformat()
+                checkins[day] = {name: rng.random() < 0.7 for name in names}
+        data[str(1_000_000 + user_id)] = {
+            "goals": list(names),
+            "checkins": checkins,
+            "reminders": {names[0]: "09:00"},
+            "chat_id": 1_000_000 + user_id
+        }
+    return data
+
+
+def rss_kb():
+    """Current resident set size (Linux)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(encoding, path):
+    """Runs in a fresh interpreter: load one file and report time and the memory the data keeps.
+
+    The legacy file is kept as plain dicts, as the bot held it before
+    CheckinHistory; the compact one is decoded the way UserStore loads it.
+    """
+    before = rss_kb()
+    started = time.perf_counter()
+    with open(path) as f:
+        data = json.load(f)
+    if encoding == "compact":
+        decode_records(data)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    print(json.dumps({"seconds": elapsed, "rss_kb": rss_kb() - before, "users": len(data)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--goals", type=int, default=3)
+    parser.add_argument("--measure", nargs=2, metavar=("ENCODING", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    print(f"Generating {args.users} users x {args.days} days x {args.goals} goals...")
+    data = synthetic_users(args.users, args.days, args.goals)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {"legacy": os.path.join(tmp, "legacy.json"), "compact": os.path.join(tmp, "compact.json")}
+        with open(paths["legacy"], "w") as f:
+            json.dump(data, f)
+        for record in data.values():
+            record["checkins"] = CheckinHistory.from_legacy(record["checkins"])
+        with open(paths["compact"], "w") as f:
+            json.dump(data, f, default=encode_record_value)
+        del data
+
+        print(f"{'encoding':<10}{'file MB':>10}{'load s':>10}{'RSS MB':>10}")
+        for encoding, path in paths.items():
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--measure", encoding, path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(out)
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{encoding:<10}{size_mb:>10.1f}{result['seconds']:>10.2f}{result['rss_kb'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
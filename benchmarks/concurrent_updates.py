@@ -0,0 +1,170 @@
+"""Throughput of sequential vs concurrent update processing, and what one noisy user costs.
+
+    python benchmarks/concurrent_updates.py --users 200 --api-latency-ms 20
+    python benchmarks/concurrent_updates.py --users 200 --burst 2000
+
+Each of --users users sends /start, /goals, two goals, /done, /checkin and
+a tap on both goals. The updates are interleaved across users, as they
+arrive from Telegram, and handed to the application's update processor all
+at once. With --burst, one extra user taps a goal that many times first.
+Each processing mode runs in a fresh interpreter against fake_bot_api.py:
+
+  sequential  PerUserUpdateProcessor(1), one update at a time
+  per_user    PerUserUpdateProcessor(--max-concurrent), as the bot runs
+  unlocked    SimpleUpdateProcessor(--max-concurrent), no per-user order
+
+Reports updates/s, p50/p99 latency of the ordinary users' updates, and how
+many users ended up with both goals saved and checked in (updates raced
+in unlocked mode get lost).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from fake_bot_api import TOKEN, serve_in_child
+from load_test import FIRST_USER_ID, message_update, callback_update, percentile
+
+MODES = ("sequential", "per_user", "unlocked")
+NOISY_USER_ID = FIRST_USER_ID - 1
+
+
+def user_script(user_id):
+    """Update factories for one user's session; they take (update_id, message_id)"""
+    texts = ["/start", "/goals", f"Goal A for {user_id}", f"Goal B for {user_id}", "/done", "/checkin"]
+    for text in texts:
+        yield lambda update_id, message_id, text=text: message_update(update_id, user_id, text)
+    for data in ("c:1", "c:2"):
+        yield lambda update_id, message_id, data=data: callback_update(update_id, user_id, message_id, data)
+
+
+def user_is_complete(record):
+    if len(record["goals"]) != 2:
+        return False
+    days = list(record["checkins"].iter_days())
+    return bool(days) and sum(days[-1][1].values()) == 2
+
+
+async def run(mode, args, api_port):
+    import bot
+    from telegram import Update
+    from telegram.ext import ApplicationBuilder, SimpleUpdateProcessor
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if mode == "sequential":
+        bot.MAX_CONCURRENT_UPDATES = 1
+    else:
+        bot.MAX_CONCURRENT_UPDATES = args.max_concurrent
+    if mode == "unlocked":
+        bot.PerUserUpdateProcessor = SimpleUpdateProcessor
+    app = bot.build_application(
+        ApplicationBuilder().token(TOKEN).base_url(f"http://127.0.0.1:{api_port}/bot")
+        .connection_pool_size(args.max_concurrent).pool_timeout(60)
+    )
+    await bot.load_store()
+    await app.initialize()
+    processor = app.update_processor
+    update_ids = iter(range(1, 1 << 62))
+
+    # Interleave: everybody's first update, then everybody's second, ...
+    batches = []
+    if args.burst:
+        bot.store.get(NOISY_USER_ID)["goals"].append("Noisy goal")
+        noisy = [callback_update(next(update_ids), NOISY_USER_ID, 1, "c:1") for _ in range(args.burst)]
+        batches.append([(None, update) for update in noisy])
+    scripts = {user_id: list(user_script(user_id)) for user_id in range(FIRST_USER_ID, FIRST_USER_ID + args.users)}
+    first_ids = {}
+    for step in range(len(scripts[FIRST_USER_ID])):
+        batch = []
+        for user_id, script in scripts.items():
+            update_id = next(update_ids)
+            message_id = first_ids.setdefault(user_id, update_id)
+            batch.append((user_id, script[step](update_id, message_id)))
+        batches.append(batch)
+
+    latencies = []
+
+    async def handle(user_id, data):
+        update = Update.de_json(data, app.bot)
+        started = time.perf_counter()
+        await processor.process_update(update, app.process_update(update))
+        if user_id is not None:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handle(user_id, data) for batch in batches for user_id, data in batch))
+    elapsed = time.perf_counter() - started
+
+    complete = sum(user_is_complete(bot.store.get(user_id)) for user_id in scripts)
+    await bot.shutdown_bot(app)
+    await app.shutdown()
+    latencies.sort()
+    return {
+        "updates": sum(len(batch) for batch in batches),
+        "updates_per_second": sum(len(batch) for batch in batches) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "complete": complete
+    }
+
+
+def measure(mode, args):
+    """Runs in a fresh interpreter with its own fake Bot API and data directory; prints JSON"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    api = multiprocessing.Process(
+        target=serve_in_child, args=(0, args.api_latency_ms / 1000, sender), daemon=True
+    )
+    api.start()
+    api_port = receiver.recv()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.environ.update(REMINDER_STATE_FILE="reminders.state")
+            result = asyncio.run(run(mode, args, api_port))
+            os.chdir(HERE)
+    finally:
+        api.terminate()
+        api.join()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=0, help="updates from one noisy user, sent first")
+    parser.add_argument("--max-concurrent", type=int, default=256)
+    parser.add_argument("--api-latency-ms", type=float, default=20.0, help="fake Bot API response delay")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args)
+        return
+
+    print(f"{args.users} users x 8 updates, {args.burst} burst updates, "
+          f"{args.api_latency_ms:g} ms API latency, max {args.max_concurrent} concurrent")
+    print(f"{'mode':<12}{'updates/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'complete':>12}")
+    for mode in args.modes:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--users", str(args.users), "--burst", str(args.burst),
+             "--max-concurrent", str(args.max_concurrent), "--api-latency-ms", str(args.api_latency_ms),
+             "--measure", mode],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(out.splitlines()[-1])
+        print(f"{mode:<12}{result['updates_per_second']:>11.0f}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{result['complete']:>8}/{args.users}")
+
+
+if __name__ == "__main__":
+    main()
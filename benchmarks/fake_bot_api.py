@@ -0,0 +1,122 @@
+"""A local stand-in for the Telegram Bot API, for load tests.
+
+    python benchmarks/fake_bot_api.py --port 8081 --latency-ms 20
+
+Answers the methods the bot calls with plausible results after an optional
+delay, and counts calls per method. Point a bot at it with
+ApplicationBuilder().base_url(f"http://127.0.0.1:{port}/bot"); load_test.py
+runs it in a child process so its work doesn't land on the bot's loop.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from http_server import HttpServer, Response
+
+TOKEN = "123456:BENCHMARK"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+
+
+def request_params(request):
+    """Bot API parameters from a form-encoded or JSON body; structured values stay JSON strings"""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return {key: value if isinstance(value, str) else json.dumps(value)
+                for key, value in json.loads(request.body or b"{}").items()}
+    return {key: values[-1] for key, values in parse_qs(request.body.decode()).items()}
+
+
+class FakeBotApi:
+    """Route handlers for the Bot API methods the bot uses"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._message_ids = itertools.count(1)
+
+    def message(self, params):
+        chat_id = int(params.get("chat_id", 0))
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", "")
+        }
+        if "reply_markup" in params:
+            message["reply_markup"] = json.loads(params["reply_markup"])
+        return message
+
+    def results(self):
+        return {
+            "getMe": lambda params: BOT_USER,
+            "sendMessage": self.message,
+            "editMessageText": self.message,
+            "editMessageReplyMarkup": self.message,
+            "answerCallbackQuery": lambda params: True,
+            "setWebhook": lambda params: True,
+            "deleteWebhook": lambda params: True,
+            "getUpdates": lambda params: [],
+            "close": lambda params: True,
+            "logOut": lambda params: True
+        }
+
+    def handler(self, method, result):
+        async def handle(request):
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            body = json.dumps({"ok": True, "result": result(request_params(request))})
+            return Response(200, body, content_type="application/json")
+        return handle
+
+    async def stats(self, request):
+        return Response(200, json.dumps(self.calls), content_type="application/json")
+
+    def server(self, host="127.0.0.1", port=0):
+        server = HttpServer(host=host, port=port, max_body=16 << 20)
+        for method, result in self.results().items():
+            server.route("POST", f"/bot{TOKEN}/{method}", self.handler(method, result))
+        server.route("GET", "/stats", self.stats)
+        return server
+
+
+async def run(port, latency, ready=None):
+    """Serve until cancelled; ready(port) is called once listening"""
+    server = FakeBotApi(latency).server(port=port)
+    await server.start()
+    if ready is not None:
+        ready(server.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def serve_in_child(port, latency, connection):
+    """multiprocessing target: sends the bound port back over connection"""
+    try:
+        asyncio.run(run(port, latency, ready=connection.send))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before each response")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.port, args.latency_ms / 1000, ready=lambda port: print(f"Fake Bot API on :{port}")))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Drive the bot's real handlers with synthetic users against a fake Bot API.
+
+    python benchmarks/load_test.py --users 10000 --concurrency 200
+    python benchmarks/load_test.py --users 2000 --preload 100000 --storage sqlite --json
+
+Each user goes through /start, /goals with --goals goals and /done, /checkin
+and a tap on every goal, /progress, then /reminders, a reminder button and a
+time. Updates pass through the application's own update processor and
+handlers, so per-user locking, conversations, the store and the reminder
+wheel all do their real work; only the Bot API is replaced, by
+fake_bot_api.py in a child process. Runs in a temp directory; --preload
+seeds it with that many existing users first.
+
+Reports updates/s, p50/p99 latency per handler step (including the wait for
+the user's lock), storage bytes written per update and the peak RSS of the
+bot process. --json prints the same figures as one JSON object for
+comparing runs.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from fake_bot_api import TOKEN, serve_in_child
+from checkin_encoding import synthetic_users
+
+FIRST_USER_ID = 2_000_000
+
+
+def message_update(update_id, user_id, text):
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+        "text": text
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id, user_id, message_id, data):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": str(user_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "Buttons"
+            },
+            "data": data
+        }
+    }
+
+
+def user_script(user_id, goals, rng):
+    """(step, update factory) for one user's session; factories take (update_id, message_id)"""
+    steps = [("start", "/start"), ("goals_start", "/goals")]
+    steps += [("add_goal", f"Goal {i + 1} for {user_id}") for i in range(goals)]
+    steps += [("done_adding_goals", "/done"), ("checkin", "/checkin")]
+    steps += [("button_callback:checkin", ("c", i + 1)) for i in range(goals)]
+    steps += [
+        ("progress", "/progress"),
+        ("reminders_menu", "/reminders"),
+        ("button_callback:remind", ("r", 1)),
+        ("save_goal_reminder", f"{rng.randrange(24):02d}:{rng.randrange(60):02d}")
+    ]
+    for step, payload in steps:
+        if isinstance(payload, tuple):
+            action, goal = payload
+            yield step, lambda update_id, message_id, data=f"{action}:{goal}": (
+                callback_update(update_id, user_id, message_id, data)
+            )
+        else:
+            yield step, lambda update_id, message_id, text=payload: message_update(update_id, user_id, text)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def disk_write_bytes():
+    """Bytes this process has sent to storage (Linux), or None"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def storage_bytes(disk_before):
+    """Bytes written to disk since disk_before; without /proc, what the store counted itself (JSON and log only)"""
+    disk_after = disk_write_bytes()
+    if disk_before is not None and disk_after is not None:
+        return disk_after - disk_before
+    from storage import STORE_FLUSH_BYTES, CHECKIN_LOG_BYTES
+    return STORE_FLUSH_BYTES.labels().value + CHECKIN_LOG_BYTES.labels().value
+
+
+async def run(args, api_port):
+    import bot
+    from telegram import Update
+    from telegram.ext import ApplicationBuilder
+
+    logging.getLogger().setLevel(args.log_level)
+    app = bot.build_application(
+        ApplicationBuilder().token(TOKEN).base_url(f"http://127.0.0.1:{api_port}/bot")
+        .connection_pool_size(args.concurrency).pool_timeout(30)
+    )
+    await bot.load_store()
+    await app.initialize()
+    await bot.start_reminders(app)
+    disk_before = disk_write_bytes()
+
+    processor = app.update_processor
+    latencies = {}
+    update_ids = iter(range(1, 1 << 62))
+    rng = random.Random(42)
+    users = asyncio.Queue()
+    for i in range(args.users):
+        users.put_nowait(FIRST_USER_ID + i)
+
+    async def worker():
+        while not users.empty():
+            user_id = users.get_nowait()
+            message_id = None
+            for step, make in user_script(user_id, args.goals, rng):
+                update_id = next(update_ids)
+                message_id = message_id or update_id
+                update = Update.de_json(make(update_id, message_id), app.bot)
+                started = time.perf_counter()
+                await processor.process_update(update, app.process_update(update))
+                latencies.setdefault(step, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    scheduled = len(app.bot_data["reminders"])
+    await bot.shutdown_bot(app)
+    await app.shutdown()
+
+    total = sum(len(values) for values in latencies.values())
+    result = {
+        "users": args.users,
+        "preloaded_users": args.preload,
+        "storage": args.storage,
+        "updates": total,
+        "seconds": elapsed,
+        "updates_per_second": total / elapsed,
+        "storage_bytes_per_update": storage_bytes(disk_before) / total,
+        "reminders_scheduled": scheduled,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "steps": {}
+    }
+    for step, values in latencies.items():
+        values.sort()
+        result["steps"][step] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.5) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000
+        }
+    return result
+
+
+def print_report(result):
+    print(f"{result['updates']} updates from {result['users']} users "
+          f"({result['preloaded_users']} preloaded, {result['storage']} storage) "
+          f"in {result['seconds']:.2f}s: {result['updates_per_second']:.0f} updates/s")
+    print(f"storage written: {result['storage_bytes_per_update']:.0f} bytes/update; "
+          f"peak RSS {result['peak_rss_mb']:.1f} MB; {result['reminders_scheduled']} reminders scheduled")
+    print(f"{'step':<26}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for step, stats in result["steps"].items():
+        print(f"{step:<26}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="users that go through the scenario")
+    parser.add_argument("--preload", type=int, default=0, help="existing users in the data file")
+    parser.add_argument("--goals", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=100, help="users active at once")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="fake Bot API response delay")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    api = multiprocessing.Process(
+        target=serve_in_child, args=(0, args.api_latency_ms / 1000, sender), daemon=True
+    )
+    api.start()
+    api_port = receiver.recv()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.environ.update(
+                STORAGE_BACKEND=args.storage,
+                SQLITE_FILE="goals.sqlite3",
+                CHECKIN_LOG="checkins.log",
+                REMINDER_STATE_FILE="reminders.state"
+            )
+            if args.preload:
+                with open("goals.json", "w") as f:
+                    json.dump(synthetic_users(args.preload, days=90, goals=args.goals), f)
+            result = asyncio.run(run(args, api_port))
+            os.chdir(HERE)
+    finally:
+        api.terminate()
+        api.join()
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
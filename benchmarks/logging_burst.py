@@ -0,0 +1,110 @@
+"""Event-loop time spent on logging during a reminder burst.
+
+    python benchmarks/logging_burst.py --reminders 10000
+
+Queues --reminders reminders (one per chat) on a SendQueue whose bot
+returns immediately and waits for all of them to be sent, logging as the
+bot does, once per logging setup:
+
+  off      logging disabled, for reference
+  sync     StreamHandler on the loop thread (the old basicConfig setup)
+  queue    logs.setup() without rate limiting
+  sampled  logs.setup() with the default per-call-site limit
+  json     as sampled, with JSON output
+
+Each setup runs in a fresh interpreter and writes to a temp file. Reported
+times are CPU time of the event-loop thread and wall time for the burst,
+and the number of lines written.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+MODES = ("off", "sync", "queue", "sampled", "json")
+
+
+class InstantBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        return None
+
+
+async def burst(reminders):
+    from send_queue import SendQueue
+
+    logger = logging.getLogger("bot")
+    queue = SendQueue(InstantBot(), global_rate=1e9, per_chat_rate=1e9, max_in_flight=1000)
+    queue.start()
+    remaining = reminders
+    finished = asyncio.Event()
+
+    def on_done(sent):
+        nonlocal remaining
+        remaining -= 1
+        if not remaining:
+            finished.set()
+
+    cpu_started, started = time.thread_time(), time.perf_counter()
+    for i in range(reminders):
+        queue.submit(1_000_000 + i, f"⏰ *Reminder: Goal {i}*", on_done=on_done, parse_mode="Markdown")
+    logger.info("📤 Queued %s reminders as %s messages", reminders, reminders)
+    await finished.wait()
+    cpu, wall = time.thread_time() - cpu_started, time.perf_counter() - started
+    await queue.close()
+    return cpu, wall
+
+
+def measure(mode, reminders, path):
+    """Runs in a fresh interpreter: set up logging, run the burst, report the figures as JSON"""
+    stream = open(path, "w")
+    if mode == "off":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync":
+        from logs import TEXT_FORMAT
+        logging.basicConfig(stream=stream, format=TEXT_FORMAT, level=logging.INFO)
+    else:
+        import logs
+        listener = logs.setup(
+            fmt="json" if mode == "json" else "text", burst=0 if mode == "queue" else 20, stream=stream
+        )
+    cpu, wall = asyncio.run(burst(reminders))
+    if mode not in ("off", "sync"):
+        listener.stop()
+    stream.close()
+    with open(path) as f:
+        lines = sum(1 for _ in f)
+    print(json.dumps({"cpu": cpu, "wall": wall, "lines": lines}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reminders", type=int, default=10_000)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure[0], args.reminders, args.measure[1])
+        return
+
+    print(f"{args.reminders} reminders")
+    print(f"{'setup':<10}{'loop CPU s':>12}{'wall s':>10}{'lines':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--reminders", str(args.reminders),
+                 "--measure", mode, os.path.join(tmp, f"{mode}.log")],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(out)
+            print(f"{mode:<10}{result['cpu']:>12.3f}{result['wall']:>10.3f}{result['lines']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Play Telegram's side of the webhook against a locally running bot.
+
+    WEBHOOK_URL=https://example.test WEBHOOK_SECRET=s3cret python bot.py
+    python benchmarks/webhook_sender.py --secret s3cret --updates 1000 --users 50
+
+Posts synthetic message updates (a command, /help by default) from --users
+distinct users, --concurrency at a time, the way Telegram delivers them, and
+reports how fast the bot acknowledges them. The bot's replies still go to
+the Bot API, so point it at a test bot token.
+"""
+import time
+import asyncio
+import argparse
+import itertools
+import httpx
+
+
+def message_update(update_id, user_id, text):
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+        "text": text
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def send_all(args):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret}
+    update_ids = itertools.count(1)
+    latencies = []
+    statuses = {}
+
+    async def worker(client, count):
+        for _ in range(count):
+            update_id = next(update_ids)
+            user_id = 1_000_000 + update_id % args.users
+            started = time.perf_counter()
+            response = await client.post(args.url, json=message_update(update_id, user_id, args.text), headers=headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    per_worker, extra = divmod(args.updates, args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, per_worker + (1 if i < extra else 0)) for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{args.updates} updates in {elapsed:.2f}s ({args.updates / elapsed:.0f}/s)")
+    print(f"ack latency p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print("status codes: " + ", ".join(f"{code}: {n}" for code, n in sorted(statuses.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080/telegram")
+    parser.add_argument("--secret", required=True, help="WEBHOOK_SECRET the bot was started with")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--text", default="/help")
+    asyncio.run(send_all(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,217 @@
-from keep_alive import keep_alive
-keep_alive()
+import time
+STARTED_AT = time.perf_counter()
 
 from dotenv import load_dotenv
 load_dotenv()
 import os
-import json
+import signal
 import asyncio
-import aiofiles
+import socket
+import secrets
+from functools import partial, wraps
 from datetime import datetime, date, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, ContextTypes,
     MessageHandler, filters, ConversationHandler, CallbackQueryHandler
 )
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-import nest_asyncio
 import pytz
 import logging
+import logs
+from user_locks import PerUserUpdateProcessor, update_user_key
+from reminders import ReminderWheel, CompletedGoals, DeliveryLag, minute_of_day, parse_time
+from send_queue import SendQueue
+from message_edits import MessageEditor
+from storage import (
+    UserStore, CheckinLog, CheckinArchive, open_backend, migrate_json_to_sqlite, split_into_shards,
+    write_atomic
+)
+from goals import (
+    CHECKIN, REMIND, REMIND_PATTERN, NOT_REMIND_PATTERN, current_goal_ids, goal_id, goal_names,
+    encode_callback, decode_callback, resolve_goal
+)
+from stats import GoalMatrix
+from persistence import SqlitePersistence
+from leaderboards import Leaderboards, Standing
+from timezones import get_timezone, find_timezone, utc_offset_minutes, format_offset
+from startup import StartupTimer, FirstPollRequest
+from http_server import HttpServer, Response
+from webhook import telegram_webhook
+from metrics import REGISTRY, CONTENT_TYPE, Counter, Gauge, Histogram
+from config import (
+    GOAL_FILE, STORAGE_BACKEND, SQLITE_FILE, CHECKIN_LOG, CHECKIN_HOT_DAYS, CHECKIN_ARCHIVE, WORKERS, SHARD
+)
+from shards import WorkerPool, Channel, RemoteReminders, RemoteCompletedGoals, RemoteLeaderboards, shard_path
+
+startup = StartupTimer(STARTED_AT)
+startup.record("imports", STARTED_AT, time.perf_counter())
 
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+# Logs are formatted and written on a background thread (see logs.py);
+# LOG_FORMAT=json gives one JSON object per line. Per-event INFO lines are
+# limited to LOG_SAMPLE_BURST per call site every LOG_SAMPLE_INTERVAL seconds.
+logs.setup(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    fmt=os.environ.get("LOG_FORMAT", "text"),
+    burst=int(os.environ.get("LOG_SAMPLE_BURST", "20")),
+    interval=float(os.environ.get("LOG_SAMPLE_INTERVAL", "10"))
 )
 logger = logging.getLogger(__name__)
 
-# File to store goals and check-ins
-GOAL_FILE = "goals.json"
+# Updates handled at once; each user's updates still run one at a time
+MAX_CONCURRENT_UPDATES = int(os.environ.get("MAX_CONCURRENT_UPDATES", "256"))
+
+# Outbound reminder limits (Telegram allows ~30 msg/s overall, ~1 msg/s per chat;
+# the global rate leaves headroom for replies to interactive commands)
+SEND_RATE_GLOBAL = float(os.environ.get("SEND_RATE_GLOBAL", "25"))
+SEND_RATE_PER_CHAT = float(os.environ.get("SEND_RATE_PER_CHAT", "1"))
+SEND_MAX_RETRIES = int(os.environ.get("SEND_MAX_RETRIES", "3"))
+
+# Reminders missed while the bot was down or stalled are sent up to this many
+# minutes late, at most REMINDER_CATCH_UP_LIMIT a minute; older ones are dropped
+REMINDER_CATCH_UP_MINUTES = int(os.environ.get("REMINDER_CATCH_UP_MINUTES", "60"))
+REMINDER_CATCH_UP_LIMIT = int(os.environ.get("REMINDER_CATCH_UP_LIMIT", "1500"))
+# Delivery lag target in seconds; minutes whose p95 lag exceeds it are logged as warnings
+REMINDER_LAG_SLO = float(os.environ.get("REMINDER_LAG_SLO", "60"))
+# Last minute the reminder wheel ticked, so a restart knows what it missed
+REMINDER_STATE_FILE = os.environ.get("REMINDER_STATE_FILE", "reminders.state")
+
+# In-progress /goals and /reminders conversations and their context.user_data
+# survive restarts in this file, which all processes share; changes are saved
+# every CONVERSATION_SAVE_INTERVAL seconds, and ones untouched for
+# CONVERSATION_MAX_AGE_DAYS are dropped
+CONVERSATION_FILE = os.environ.get("CONVERSATION_FILE", "conversations.sqlite3")
+CONVERSATION_SAVE_INTERVAL = float(os.environ.get("CONVERSATION_SAVE_INTERVAL", "10"))
+CONVERSATION_MAX_AGE_DAYS = float(os.environ.get("CONVERSATION_MAX_AGE_DAYS", "7"))
+
+# Check-in taps on one message within this many seconds are shown in a single edit
+CHECKIN_EDIT_INTERVAL = float(os.environ.get("CHECKIN_EDIT_INTERVAL", "1.0"))
+
+# Bot API endpoint; point it at a local Bot API server (or benchmarks/fake_bot_api.py)
+BOT_API_URL = os.environ.get("BOT_API_URL", "https://api.telegram.org/bot")
+
+# Port of the HTTP server (health check, and the webhook when enabled);
+# worker N serves its /metrics on localhost at PORT + 1 + N
+PORT = int(os.environ.get("PORT", "8080"))
+# Public HTTPS base URL for webhook mode, e.g. https://bot.example.com; polling when unset
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram")
+# Sent back by Telegram with every delivery; a random one is used if unset
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+
+# Startup phase that ends when updates can first arrive
+UPDATES_READY_PHASE = "webhook set" if WEBHOOK_URL else "first poll"
+
+# Zone for users who haven't picked one with /timezone (an IANA name); reminder
+# times and each user's "today" are in their own zone
+DEFAULT_TIMEZONE = os.environ.get("DEFAULT_TIMEZONE", "Asia/Kolkata")
+
+# Users whose reminders are loaded per step of the background reload
+RELOAD_CHUNK_SIZE = int(os.environ.get("RELOAD_CHUNK_SIZE", "500"))
 
 # Conversation states
 ADDING_GOALS, WAITING_FOR_GOAL, SETTING_REMINDER_TIME = range(3)
 
+# Members shown by /leaderboard in a group chat
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", "10"))
+MEDALS = ("🥇", "🥈", "🥉")
+
+# Longer /progress views, in days, and their heatmap squares (none, some, half or more, all)
+PROGRESS_RANGES = (30, 90, 365)
+HEATMAP_CELLS = ("⬜", "🟨", "🟩", "✅")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# === Metrics ===
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Time spent handling an update, by handler (buttons also by callback type)",
+    ("handler", "callback")
+)
+REMINDERS_DISPATCHED = Counter("bot_reminders_dispatched_total", "Reminders handed to the send queue")
+REMINDERS_SKIPPED = Counter("bot_reminders_skipped_total", "Reminders not sent as their goal was already done that day")
+# Values read when /metrics is scraped rather than tracked on every change; register_gauges() binds them
+DATA_FILE_BYTES = Gauge("bot_data_file_bytes", "Size of the user data file on disk")
+USERS = Gauge("bot_users", "Users held in memory")
+ARCHIVED_USERS = Gauge("bot_archived_users", "Users with check-ins in the archive")
+LEADERBOARDS = Gauge("bot_leaderboards", "Group chats with a leaderboard")
+REMINDERS_SCHEDULED = Gauge("bot_reminders_scheduled", "Reminders on the reminder wheel")
+SCHEDULER_JOBS = Gauge("bot_scheduler_jobs", "Pending scheduled work: APScheduler jobs plus reminders on the wheel")
+REMINDERS_DONE_TODAY = Gauge("bot_reminders_done_today", "Reminders whose goal is already done today, so they'll be skipped")
+SEND_QUEUE_LENGTH = Gauge("bot_send_queue_length", "Messages waiting in the send queue")
+MESSAGE_EDITS = Counter("bot_message_edits_total", "Check-in message edits by outcome", ("result",))
+# Button callbacks with fixed data; anything else is reported as "other"
+BUTTON_CALLBACKS = {"add_goals", "clear_goals", "keep_goals", "skip_checkin", "clear_reminders"}
+
+def callback_type(update):
+    """Low-cardinality label for a button press"""
+    data = update.callback_query.data if update.callback_query else None
+    if data is None:
+        return ""
+    goal_callback = decode_callback(data)
+    if goal_callback:
+        action = "checkin" if goal_callback[0] == CHECKIN else "remind"
+        return f"{action}_legacy" if goal_callback[2] else action
+    return data if data in BUTTON_CALLBACKS else "other"
+
+def instrumented(callback):
+    """Record a handler's latency in HANDLER_SECONDS"""
+    name = callback.__name__
+    
+    @wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            label = callback_type(update) if update.callback_query else ""
+            HANDLER_SECONDS.labels(name, label).observe(time.perf_counter() - started)
+    return wrapper
+
 # === Data Management ===
-async def load_data():
-    """Load all user data"""
-    try:
-        async with aiofiles.open(GOAL_FILE, "r") as f:
-            contents = await f.read()
-            return json.loads(contents)
-    except FileNotFoundError:
-        return {}
+def data_path(path):
+    """A data file, or this worker's shard of it"""
+    return shard_path(path, SHARD, WORKERS) if SHARD is not None else path
+
+# All user data lives in memory; changes are written back in batches
+store = UserStore(
+    open_backend(STORAGE_BACKEND, data_path(GOAL_FILE), data_path(SQLITE_FILE)),
+    log=CheckinLog(data_path(CHECKIN_LOG)),
+    archive=CheckinArchive(data_path(CHECKIN_ARCHIVE)),
+    hot_days=CHECKIN_HOT_DAYS
+)
 
-async def save_data(data):
-    """Save all user data"""
-    async with aiofiles.open(GOAL_FILE, "w") as f:
-        await f.write(json.dumps(data, indent=4))
+async def load_store():
+    """Load user data, migrating goals.json the first time the SQLite backend is used"""
+    if SHARD is None:
+        # Shards left by an earlier multi-process run are merged back first
+        await split_into_shards(STORAGE_BACKEND, GOAL_FILE, SQLITE_FILE, CHECKIN_LOG, 1, CHECKIN_ARCHIVE)
+    goal_file, sqlite_file = data_path(GOAL_FILE), data_path(SQLITE_FILE)
+    if STORAGE_BACKEND.lower() == "sqlite" and not os.path.exists(sqlite_file) and os.path.exists(goal_file):
+        logger.info("📦 Migrating %s to %s...", goal_file, sqlite_file)
+        await migrate_json_to_sqlite(goal_file, sqlite_file)
+    await store.load()
 
 async def get_user_data(user_id):
     """Get data for specific user"""
-    data = await load_data()
-    if str(user_id) not in data:
-        data[str(user_id)] = {
-            "goals": [],
-            "checkins": {},  # date -> {goal: True/False}
-            "reminders": {},  # goal -> time
-            "chat_id": None  # Store chat_id for reminders
-        }
-        await save_data(data)
-    return data[str(user_id)]
+    return store.get(user_id)
 
 async def save_user_data(user_id, user_data):
     """Save data for specific user"""
-    data = await load_data()
-    data[str(user_id)] = user_data
-    await save_data(data)
+    store.put(user_id, user_data)
+
+def user_zone(user_data):
+    """The user's tz object (shared by everyone in the zone)"""
+    return get_timezone(user_data.get('timezone') or DEFAULT_TIMEZONE)
+
+def zone_label(zone):
+    """'America/New_York' -> 'America/New York', which also keeps Markdown intact"""
+    return zone.zone.replace("_", " ")
+
+def user_today(user_data):
+    """The date it is for the user, in their zone"""
+    return datetime.now(user_zone(user_data)).date()
 
 # === Bot Commands ===
 
+@instrumented
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Welcome message"""
     user_id = update.effective_user.id
@@ -77,7 +222,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_data['chat_id'] = chat_id
     await save_user_data(user_id, user_data)
     
-    logger.info(f"User {user_id} started bot, chat_id: {chat_id}")
+    logger.info("User %s started bot, chat_id: %s", user_id, chat_id)
     
     await update.message.reply_text(
         "👋 Welcome to Your Accountability Bot!\n\n"
@@ -85,13 +230,15 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Commands:\n"
         "• /goals - Set up your goals\n"
         "• /checkin - Mark today's progress\n"
-        "• /progress - See your stats\n"
+        "• /progress - See your stats (/progress 30, 90 or 365 for longer)\n"
         "• /reminders - Set goal reminders\n"
+        "• /timezone - Set your timezone\n"
         "• /debug - Check scheduled reminders\n"
         "• /help - Show all commands\n\n"
         "Start by setting your goals with /goals"
     )
 
+@instrumented
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show help message"""
     await update.message.reply_text(
@@ -100,7 +247,11 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/goals - Set or modify your daily goals\n"
         "/checkin - Mark which goals you completed today\n"
         "/progress - View your 7-day progress and streak\n"
+        "/progress 30|90|365 - Completion rates, weekdays and a heatmap\n"
         "/reminders - Set time reminders for your goals\n"
+        "/timezone - Show or set your timezone (e.g. /timezone London)\n"
+        "/join, /leave - Join or leave a group chat's leaderboard\n"
+        "/leaderboard - Group members by streak and 7-day completion\n"
         "/debug - Check scheduled reminders (testing)\n"
         "/test\\_reminder - Test reminder immediately\n"
         "/help - Show this help message\n\n"
@@ -112,50 +263,65 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+@instrumented
 async def debug_reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Debug command to check scheduled jobs"""
     user_id = update.effective_user.id
     user_data = await get_user_data(user_id)
     
-    scheduler = context.application.bot_data.get("scheduler")
-    if not scheduler:
+    wheel = context.application.bot_data.get("reminders")
+    if wheel is None:
         await update.message.reply_text("❌ Scheduler not found!")
         return
     
-    # Get current IST time
-    ist = pytz.timezone('Asia/Kolkata')
-    current_time = datetime.now(ist)
+    zone = user_zone(user_data)
+    current_time = datetime.now(zone)
     
     msg = f"🔍 *Debug Info*\n\n"
-    msg += f"Current IST Time: {current_time.strftime('%H:%M:%S')}\n"
+    msg += f"Your Time: {current_time.strftime('%H:%M:%S')} ({zone_label(zone)})\n"
     msg += f"Your Chat ID: {update.effective_chat.id}\n"
     msg += f"Your User ID: {user_id}\n\n"
     
     msg += f"*Saved Reminders in DB:*\n"
+    names = goal_names(user_data)
     if user_data.get('reminders'):
-        for goal, time_str in user_data['reminders'].items():
-            msg += f"• {goal}: {time_str}\n"
+        for gid, time_str in user_data['reminders'].items():
+            msg += f"• {names.get(gid, gid)}: {time_str}\n"
     else:
         msg += "None\n"
     
-    msg += f"\n*Active Scheduler Jobs:*\n"
-    jobs = scheduler.get_jobs()
-    if jobs:
-        for job in jobs:
-            if str(user_id) in job.id:
-                msg += f"• {job.id}\n"
-                msg += f"  Next: {job.next_run_time}\n"
-    else:
-        msg += "No jobs scheduled!\n"
+    msg += f"\n*Active Reminders ({len(wheel)} total):*\n"
+    keys = sorted(wheel.keys_for(str(user_id)))
+    for key in keys:
+        gid = key[1]
+        msg += f"• {names.get(gid, gid)}"
+        if gid not in user_data.get('reminders', {}):
+            msg += " (not saved)"
+        msg += f"\n  Next: {wheel.next_run(key, current_time)}\n"
+    if not keys:
+        msg += "No reminders scheduled!\n"
+    
+    msg += f"\n*Delivery lag (SLO {REMINDER_LAG_SLO:g}s):*\n"
+    recent = context.application.bot_data["delivery_lag"].recent()
+    for due, summary in recent:
+        msg += f"• {due.astimezone(zone):%H:%M}: {summary['sent']} sent"
+        if summary['failed'] or summary['pending']:
+            msg += f", {summary['failed']} failed, {summary['pending']} pending"
+        if summary['sent']:
+            msg += f", p50 {summary['p50']:.1f}s, p95 {summary['p95']:.1f}s, max {summary['max']:.1f}s"
+        msg += "\n"
+    if not recent:
+        msg += "No reminders sent recently\n"
     
     await update.message.reply_text(msg, parse_mode="Markdown")
 
+@instrumented
 async def test_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Test sending a reminder immediately"""
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
     
-    logger.info(f"Testing reminder for user {user_id}, chat {chat_id}")
+    logger.info("Testing reminder for user %s, chat %s", user_id, chat_id)
     
     try:
         await context.bot.send_message(
@@ -166,11 +332,12 @@ async def test_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown"
         )
         await update.message.reply_text("✅ Test reminder sent!")
-        logger.info(f"Test reminder sent successfully to {chat_id}")
+        logger.info("Test reminder sent successfully to %s", chat_id)
     except Exception as e:
         await update.message.reply_text(f"❌ Error: {str(e)}")
-        logger.error(f"Error sending test reminder: {e}")
+        logger.error("Error sending test reminder: %s", e)
 
+@instrumented
 async def goals_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start goal setting process"""
     user_id = update.effective_user.id
@@ -203,6 +370,7 @@ async def goals_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ADDING_GOALS
 
+@instrumented
 async def add_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add a goal to temporary list"""
     goal = update.message.text.strip()
@@ -222,6 +390,7 @@ async def add_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return ADDING_GOALS
 
+@instrumented
 async def done_adding_goals(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Finish adding goals"""
     user_id = update.effective_user.id
@@ -232,7 +401,10 @@ async def done_adding_goals(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_data = await get_user_data(user_id)
     user_data['goals'] = context.user_data['temp_goals']
+    for goal in user_data['goals']:
+        goal_id(user_data, goal)
     await save_user_data(user_id, user_data)
+    update_standing(context.application, user_id, user_data)
     
     goals_list = "\n".join([f"• {goal}" for goal in user_data['goals']])
     
@@ -246,30 +418,47 @@ async def done_adding_goals(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.pop('temp_goals', None)
     return ConversationHandler.END
 
-async def show_checkin_status(query, user_id, user_data, today):
-    """Show check-in buttons with current status"""
+def checkin_state(user_data, today):
+    """What the check-in message shows: the day and each current goal's status"""
+    ordinal = today.toordinal()
+    checkins = user_data['checkins']
+    return (ordinal, tuple(
+        (gid, goal, checkins.get(ordinal, gid)) for gid, goal in current_goal_ids(user_data)
+    ))
+
+def render_checkin(state):
+    """Text and keyboard for a check-in state"""
+    _, goals = state
     keyboard = []
     
-    for goal in user_data['goals']:
-        completed = user_data['checkins'].get(today, {}).get(goal, False)
+    for gid, goal, completed in goals:
         emoji = "✅" if completed else "⭕"
         keyboard.append([InlineKeyboardButton(
             f"{emoji} {goal}",
-            callback_data=f"checkin_{goal}"
+            callback_data=encode_callback(CHECKIN, gid)
         )])
     
     keyboard.append([InlineKeyboardButton("⏭️ Done for today", callback_data="skip_checkin")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    completed_count = sum(user_data['checkins'].get(today, {}).values())
-    total = len(user_data['goals'])
+    completed_count = sum(1 for _, _, completed in goals if completed)
+    total = len(goals)
     
-    await query.edit_message_text(
+    text = (
         f"📋 Today's Check-in ({completed_count}/{total} completed)\n\n"
-        f"Tap goals to mark as done:",
-        reply_markup=reply_markup
+        f"Tap goals to mark as done:"
     )
+    return text, reply_markup
+
+def checkin_view(user_id):
+    """Renderer for a user's check-in message, evaluated when the edit goes out"""
+    def render():
+        user_data = store.get(user_id)
+        state = checkin_state(user_data, user_today(user_data))
+        return (state, *render_checkin(state))
+    return render
 
+@instrumented
 async def checkin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show check-in interface"""
     user_id = update.effective_user.id
@@ -281,31 +470,72 @@ async def checkin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    today = str(date.today())
-    keyboard = []
+    state = checkin_state(user_data, user_today(user_data))
+    text, reply_markup = render_checkin(state)
+    message = await update.message.reply_text(text, reply_markup=reply_markup)
+    context.application.bot_data["message_editor"].shown(message.chat_id, message.message_id, state)
+
+def heat_cell(done, possible):
+    """Heatmap square for `done` completions out of `possible`"""
+    if not done or not possible:
+        return HEATMAP_CELLS[0]
+    if done >= possible:
+        return HEATMAP_CELLS[3]
+    return HEATMAP_CELLS[2] if done * 2 >= possible else HEATMAP_CELLS[1]
+
+def render_heatmap(matrix, goal_count):
+    """Calendar lines: a square per day in rows of weeks, or past ~3 months a square per week in rows of months"""
+    totals = matrix.daily_totals()
+    first, last = matrix.first, matrix.first + matrix.days - 1
+    monday = first - date.fromordinal(first).weekday()
+    lines = []
+    if matrix.days <= 93:
+        for week in range(monday, last + 1, 7):
+            cells = "".join(
+                heat_cell(totals[day - first], goal_count) if first <= day <= last else "▫️"
+                for day in range(week, week + 7)
+            )
+            lines.append(f"`{date.fromordinal(week):%d %b}` {cells}")
+        return lines
+    months = {}
+    for week in range(monday, last + 1, 7):
+        lo, hi = max(week, first), min(week + 6, last)
+        cell = heat_cell(sum(totals[lo - first:hi - first + 1]), goal_count * (hi - lo + 1))
+        months.setdefault(date.fromordinal(week).strftime("%b %y"), []).append(cell)
+    return [f"`{month}` {''.join(cells)}" for month, cells in months.items()]
+
+async def progress_range(user_id, user_data, days):
+    """Text of the /progress 30|90|365 view"""
+    today = user_today(user_data).toordinal()
+    first = today - days + 1
+    goals = current_goal_ids(user_data)
+    # Only reads archived check-ins when the window reaches back into them
+    history = await store.full_history(user_id, since=first)
+    matrix = GoalMatrix(history, [gid for gid, _ in goals], first, days)
     
-    for goal in user_data['goals']:
-        completed = user_data['checkins'].get(today, {}).get(goal, False)
-        emoji = "✅" if completed else "⭕"
-        keyboard.append([InlineKeyboardButton(
-            f"{emoji} {goal}",
-            callback_data=f"checkin_{goal}"
-        )])
+    text = f"📊 *Your Progress (Last {days} Days)*\n\n"
+    completed = matrix.completed()
+    for (gid, goal), done in zip(goals, completed):
+        text += f"🎯 *{goal}*: {done}/{days} ({int(done / days * 100)}%)\n"
     
-    keyboard.append([InlineKeyboardButton("⏭️ Done for today", callback_data="skip_checkin")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    total, possible = sum(completed), days * len(goals)
+    text += f"\n📈 *Overall: {total}/{possible} ({int(total / possible * 100)}%)*\n\n"
     
-    completed_count = sum(user_data['checkins'].get(today, {}).values())
-    total = len(user_data['goals'])
+    text += "📅 *By weekday*\n"
+    for name, done, count in zip(WEEKDAYS, matrix.weekday_completed(), matrix.weekday_days()):
+        rate = done / (count * len(goals)) if count else 0
+        filled = round(rate * 10)
+        text += f"`{name} {'▓' * filled}{'░' * (10 - filled)} {int(rate * 100):>3}%`\n"
     
-    await update.message.reply_text(
-        f"📋 Today's Check-in ({completed_count}/{total} completed)\n\n"
-        f"Tap goals to mark as done:",
-        reply_markup=reply_markup
-    )
+    layout = "weeks, Mon–Sun" if days <= 93 else "months, a square per week"
+    text += f"\n🗓️ *Heatmap* ({layout})\n"
+    text += "\n".join(render_heatmap(matrix, len(goals)))
+    text += f"\n{HEATMAP_CELLS[0]} none  {HEATMAP_CELLS[1]} some  {HEATMAP_CELLS[2]} half+  {HEATMAP_CELLS[3]} all"
+    return text
 
+@instrumented
 async def progress(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show detailed progress"""
+    """Show detailed progress; /progress 30, 90 or 365 for a longer view"""
     user_id = update.effective_user.id
     user_data = await get_user_data(user_id)
     
@@ -313,60 +543,154 @@ async def progress(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ No goals set! Use /goals first.")
         return
     
-    # Calculate stats for last 7 days
-    today = date.today()
-    dates = [(today - timedelta(days=i)).isoformat() for i in range(6, -1, -1)]
+    if context.args:
+        days = int(context.args[0]) if context.args[0].isdigit() else None
+        if days not in PROGRESS_RANGES:
+            await update.message.reply_text("Usage: /progress, or /progress 30, 90 or 365 for a longer view")
+            return
+        await update.message.reply_text(await progress_range(user_id, user_data, days), parse_mode="Markdown")
+        return
+    
+    # Stats for the last 7 days come from the cached aggregates
+    today = user_today(user_data)
+    today_ordinal = today.toordinal()
+    stats = store.stats(user_id, today)
     
     progress_text = "📊 *Your Progress (Last 7 Days)*\n\n"
     
     total_completed = 0
     total_possible = len(user_data['goals']) * 7
     
-    for goal in user_data['goals']:
-        week_status = ""
-        goal_completed = 0
-        
-        for date_str in dates:
-            if user_data['checkins'].get(date_str, {}).get(goal, False):
-                week_status += "✅"
-                goal_completed += 1
-            else:
-                week_status += "⭕"
+    for gid, goal in current_goal_ids(user_data):
+        week_status = "".join(
+            "✅" if stats.done(gid, today_ordinal - i, today_ordinal) else "⭕"
+            for i in range(6, -1, -1)
+        )
+        goal_completed = stats.completed_in(gid, 7, today_ordinal)
+        month_completed = stats.completed_in(gid, 30, today_ordinal)
         
         total_completed += goal_completed
         percentage = int((goal_completed / 7) * 100)
-        progress_text += f"🎯 *{goal}*\n{week_status} ({goal_completed}/7 - {percentage}%)\n\n"
+        progress_text += (
+            f"🎯 *{goal}*\n{week_status} ({goal_completed}/7 - {percentage}%)\n"
+            f"30 days: {month_completed}/30\n\n"
+        )
     
     # Overall stats
     overall = int((total_completed / total_possible) * 100) if total_possible > 0 else 0
     progress_text += f"📈 *Overall: {total_completed}/{total_possible} ({overall}%)*\n\n"
     
-    # Current streak
-    streak = calculate_streak(user_data)
-    progress_text += f"🔥 *Current Streak: {streak} days*"
+    # Streaks
+    streak = calculate_streak(user_id, user_data)
+    progress_text += f"🔥 *Current Streak: {streak} days*\n"
+    progress_text += f"🏆 Longest Streak: {stats.longest_streak()} days"
+    last_active = stats.last_active()
+    if last_active and last_active != today:
+        progress_text += f"\n📅 Last check-in: {last_active.isoformat()}"
     
     await update.message.reply_text(progress_text, parse_mode="Markdown")
 
-def calculate_streak(user_data):
+def calculate_streak(user_id, user_data):
     """Calculate current streak"""
     if not user_data['goals']:
         return 0
     
-    streak = 0
-    today = date.today()
+    today = user_today(user_data)
+    return store.stats(user_id, today).current_streak(today.toordinal())
+
+# === Group Leaderboards ===
+
+def standing_for(user_id, user_data):
+    """What a user's leaderboard scores are worked out from"""
+    today = user_today(user_data)
+    return Standing.from_stats(
+        store.stats(user_id, today), len(user_data['goals']), today.toordinal(), user_data.get('timezone')
+    )
+
+def update_standing(application, user_id, user_data, left=False):
+    """Refresh a user's place on the leaderboards of the groups they're in (or have just left)"""
+    groups = user_data.get('groups')
+    if groups or left:
+        application.bot_data["leaderboards"].set_standing(user_id, groups or {}, standing_for(user_id, user_data))
+
+def leaderboard_standings(users):
+    """(user_id, groups, Standing) for each of these (user_id, record) pairs in a group"""
+    for user_id, user_data in users:
+        if user_data.get('groups'):
+            yield user_id, user_data['groups'], standing_for(user_id, user_data)
+
+async def load_leaderboards(application):
+    """Put every group member on the leaderboards, in chunks while updates are being served"""
+    leaderboards = application.bot_data["leaderboards"]
+    users = list(store.users())
+    members = 0
+    for start_index in range(0, len(users), RELOAD_CHUNK_SIZE):
+        for user_id, groups, standing in leaderboard_standings(users[start_index:start_index + RELOAD_CHUNK_SIZE]):
+            leaderboards.set_standing(user_id, groups, standing)
+            members += 1
+        await asyncio.sleep(0)
+    logger.info("🏆 Loaded %s group members onto %s leaderboards", members, len(leaderboards))
+
+def in_group(update):
+    return update.effective_chat is not None and update.effective_chat.type in ("group", "supergroup")
+
+@instrumented
+async def join_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Join the leaderboard of the group chat this is sent in"""
+    if not in_group(update):
+        await update.message.reply_text("👥 Send /join in a group chat to join its leaderboard.")
+        return
+    user = update.effective_user
+    user_data = await get_user_data(user.id)
+    user_data.setdefault('groups', {})[str(update.effective_chat.id)] = user.first_name or user.username or str(user.id)
+    await save_user_data(user.id, user_data)
+    update_standing(context.application, user.id, user_data)
+    await update.message.reply_text(f"🏆 {user.first_name} joined this group's /leaderboard!")
+
+@instrumented
+async def leave_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Leave the leaderboard of the group chat this is sent in"""
+    if not in_group(update):
+        await update.message.reply_text("👥 Send /leave in the group chat whose leaderboard you want to leave.")
+        return
+    user = update.effective_user
+    user_data = await get_user_data(user.id)
+    if user_data.get('groups', {}).pop(str(update.effective_chat.id), None) is None:
+        await update.message.reply_text("You're not on this group's leaderboard. Use /join to join it.")
+        return
+    await save_user_data(user.id, user_data)
+    update_standing(context.application, user.id, user_data, left=True)
+    await update.message.reply_text(f"👋 {user.first_name} left this group's leaderboard.")
+
+@instrumented
+async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Group members ranked by current streak, then 7-day completion.
+
+    Reads only the leaderboards (which the leader keeps in multi-process
+    mode), never the store.
+    """
+    if not in_group(update):
+        await update.message.reply_text("👥 /leaderboard works in group chats. Add me to a group and send /join there.")
+        return
+    board = context.application.bot_data["leaderboards"].board(update.effective_chat.id)
+    if board is None:
+        await update.message.reply_text("🏆 Nobody is on this group's leaderboard yet. Send /join to be the first!")
+        return
     
-    for i in range(365):  # Check up to 1 year back
-        check_date = (today - timedelta(days=i)).isoformat()
-        day_checkins = user_data['checkins'].get(check_date, {})
-        
-        # Check if at least one goal was completed
-        if any(day_checkins.values()):
-            streak += 1
-        else:
-            break
+    # Each member is scored on their own date, in their own zone
+    days = {zone: datetime.now(get_timezone(zone or DEFAULT_TIMEZONE)).date().toordinal() for zone in board.zones()}
+    text = f"🏆 Leaderboard ({len(board)} members)\n\n"
+    for position, (user_id, name, standing) in enumerate(board.top(days, LEADERBOARD_SIZE), start=1):
+        place = MEDALS[position - 1] if position <= len(MEDALS) else f"{position}."
+        today = days[standing.zone]
+        text += f"{place} {name} — 🔥 {standing.streak(today)} · 7d {standing.week_percent(today)}%\n"
     
-    return streak
+    rank = board.rank(str(update.effective_user.id), days)
+    if rank is not None and rank > LEADERBOARD_SIZE:
+        text += f"\nYou're #{rank}"
+    await update.message.reply_text(text)
 
+@instrumented
 async def reminders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show reminders menu"""
     user_id = update.effective_user.id
@@ -382,10 +706,10 @@ async def reminders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     keyboard = []
-    for goal in user_data['goals']:
-        time = user_data['reminders'].get(goal, "Not set")
+    for gid, goal in current_goal_ids(user_data):
+        time = user_data['reminders'].get(gid, "Not set")
         button_text = f"{'⏰' if time != 'Not set' else '⭕'} {goal} - {time}"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"remind_{goal}")])
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=encode_callback(REMIND, gid))])
     
     keyboard.append([InlineKeyboardButton("🔕 Clear All Reminders", callback_data="clear_reminders")])
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -399,15 +723,16 @@ async def reminders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return SETTING_REMINDER_TIME  # Keep in conversation
 
+@instrumented
 async def save_goal_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Save reminder time for goal"""
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
-    goal = context.user_data.get('setting_reminder_for')
+    gid = context.user_data.get('setting_reminder_for')
     
-    logger.info(f"save_goal_reminder called for user {user_id}, goal: {goal}")
+    logger.info("save_goal_reminder called for user %s, goal: %s", user_id, gid)
     
-    if not goal:
+    if not gid:
         await update.message.reply_text("❌ Error: No goal selected. Use /reminders to start again.")
         return ConversationHandler.END
     
@@ -420,42 +745,29 @@ async def save_goal_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
         # Save reminder time and chat_id
         user_data = await get_user_data(user_id)
-        user_data['reminders'][goal] = f"{hour:02d}:{minute:02d}"
+        goal = goal_names(user_data).get(gid, gid)
+        user_data['reminders'][gid] = f"{hour:02d}:{minute:02d}"
         user_data['chat_id'] = chat_id
         await save_user_data(user_id, user_data)
         
-        logger.info(f"💾 Saved reminder for user {user_id}, goal '{goal}' at {hour:02d}:{minute:02d}")
+        logger.info("💾 Saved reminder for user %s, goal '%s' at %02d:%02d", user_id, goal, hour, minute)
         
-        # Schedule with APScheduler
-        scheduler = context.application.bot_data.get("scheduler")
-        if scheduler:
-            # Remove old job if exists
-            job_id = f"reminder_{user_id}_{goal.replace(' ', '_')}"
-            
-            for job in list(scheduler.get_jobs()):
-                if job.id == job_id:
-                    job.remove()
-                    logger.info(f"🗑️ Removed old job: {job_id}")
-            
-            # Add new job
-            ist = pytz.timezone('Asia/Kolkata')
-            scheduler.add_job(
-                goal_reminder_job,
-                trigger='cron',
-                hour=hour,
-                minute=minute,
-                timezone=ist,
-                id=job_id,
-                args=[chat_id, context.application, goal],
-                replace_existing=True
+        # Schedule on the reminder wheel (replaces any previous time for this goal)
+        zone = user_zone(user_data)
+        wheel = context.application.bot_data.get("reminders")
+        if wheel is not None:
+            wheel.add((str(user_id), gid), minute_of_day(hour, minute), (str(user_id), chat_id, goal, gid), zone)
+            logger.info(
+                "✅ Scheduled reminder for user %s, goal '%s' at %02d:%02d %s for chat %s",
+                user_id, goal, hour, minute, zone.zone, chat_id
             )
-            logger.info(f"✅ Scheduled job: {job_id} at {hour:02d}:{minute:02d} IST for chat {chat_id}")
-            logger.info(f"📋 Total active jobs: {len(scheduler.get_jobs())}")
+            logger.info("📋 Total active reminders: %s", len(wheel))
         else:
             logger.error("❌ Scheduler not found!")
+        track_completion(context.application, user_id, user_data, gid, user_today(user_data))
         
         await update.message.reply_text(
-            f"✅ Reminder set for *{goal}* at {hour:02d}:{minute:02d} IST\n\n"
+            f"✅ Reminder set for *{goal}* at {hour:02d}:{minute:02d} ({zone_label(zone)})\n\n"
             f"You'll receive a notification at this time every day.\n\n"
             f"Use /reminders to manage reminders\n"
             f"Use /debug to verify it's scheduled",
@@ -466,7 +778,7 @@ async def save_goal_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return ConversationHandler.END
         
     except ValueError as e:
-        logger.warning(f"Invalid time format: {time_text}, error: {e}")
+        logger.warning("Invalid time format: %s, error: %s", time_text, e)
         await update.message.reply_text(
             "❌ Invalid format. Please use HH:MM (24-hour)\n"
             "Example: 09:00 or 21:30\n\n"
@@ -474,74 +786,194 @@ async def save_goal_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return SETTING_REMINDER_TIME
 
-async def goal_reminder_job(chat_id, application, goal):
-    """Send reminder for specific goal"""
-    try:
-        logger.info(f"🔔 Executing reminder job for goal '{goal}' to chat {chat_id}")
-        await application.bot.send_message(
-            chat_id=chat_id,
-            text=f"⏰ *Reminder: {goal}*\n\n"
-                 f"Time to work on your goal! 🔥\n"
-                 f"Use /checkin when done.",
+def reminder_text(goals):
+    """Reminder message for one or more goals due at the same time"""
+    if len(goals) == 1:
+        return (
+            f"⏰ *Reminder: {goals[0]}*\n\n"
+            f"Time to work on your goal! 🔥\n"
+            f"Use /checkin when done."
+        )
+    goals_list = "\n".join([f"• {goal}" for goal in goals])
+    return (
+        f"⏰ *Reminders*\n\n{goals_list}\n\n"
+        f"Time to work on your goals! 🔥\n"
+        f"Use /checkin when done."
+    )
+
+async def dispatch_reminders(application, due, payloads):
+    """Queue one minute's reminders, one message per chat, leaving out goals already done today"""
+    send_queue = application.bot_data["send_queue"]
+    delivery_lag = application.bot_data["delivery_lag"]
+    completed = application.bot_data["completed_goals"]
+    now = time.time()
+    goals_by_chat = {}
+    skipped = 0
+    for user_id, chat_id, goal, gid in payloads:
+        if completed.done((user_id, gid), now):
+            skipped += 1
+            continue
+        goals_by_chat.setdefault(chat_id, []).append(goal)
+    queued = len(payloads) - skipped
+    if skipped:
+        REMINDERS_SKIPPED.inc(skipped)
+    if queued:
+        delivery_lag.expect(due, queued)
+    for chat_id, goals in goals_by_chat.items():
+        send_queue.submit(
+            chat_id, reminder_text(goals),
+            on_done=partial(delivery_lag.done, due, len(goals)),
             parse_mode="Markdown"
         )
-        logger.info(f"✅ Reminder sent for goal '{goal}' to chat {chat_id}")
-    except Exception as e:
-        logger.error(f"❌ Error sending reminder to chat {chat_id}: {e}")
+    REMINDERS_DISPATCHED.inc(queued)
+    logger.info(
+        "📤 Queued %s reminders as %s messages; skipped %s for goals already done", queued, len(goals_by_chat), skipped
+    )
+
+def done_until(user_data, gid, today):
+    """End of the user's `today` as a timestamp if the goal is done on it, else None"""
+    if not user_data['checkins'].get(today.toordinal(), gid):
+        return None
+    tomorrow = today + timedelta(days=1)
+    return user_zone(user_data).localize(datetime(tomorrow.year, tomorrow.month, tomorrow.day)).timestamp()
+
+def completed_reminders(user_id, user_data):
+    """(wheel key, done until) for each of a user's reminders whose goal is already done today"""
+    today = user_today(user_data)
+    for gid in user_data.get('reminders', {}):
+        until = done_until(user_data, gid, today)
+        if until is not None:
+            yield (user_id, gid), until
+
+def track_completion(application, user_id, user_data, gid, today):
+    """Tell the reminder dispatcher whether a goal with a reminder is done on the user's `today`"""
+    if gid in user_data.get('reminders', {}):
+        application.bot_data["completed_goals"].set((str(user_id), gid), done_until(user_data, gid, today))
+
+def forget_completions(application, user_id, user_data):
+    """Drop what the reminder dispatcher knows about a user's done goals, before their reminders are cleared"""
+    completed = application.bot_data["completed_goals"]
+    for gid in user_data.get('reminders', {}):
+        completed.set((str(user_id), gid), None)
+
+def user_reminders(user_id, user_data):
+    """(wheel key, minute of day, payload, zone) for each of a user's saved reminders"""
+    names = goal_names(user_data)
+    zone = user_zone(user_data)
+    for gid, time_str in user_data.get('reminders', {}).items():
+        goal = names.get(gid, gid)
+        try:
+            minute = parse_time(time_str)
+        except ValueError as e:
+            logger.error("❌ Failed to reload %s/%s: %s", user_id, goal, e)
+            continue
+        yield (user_id, gid), minute, (user_id, user_data.get('chat_id'), goal, gid), zone
 
 async def reload_all_reminders(application):
-    """Reload all reminders from storage on bot startup"""
+    """Reload all reminders from storage in chunks while the bot is already serving updates"""
     try:
         logger.info("🔄 Starting to reload reminders...")
-        data = await load_data()
-        scheduler = application.bot_data.get("scheduler")
+        wheel = application.bot_data.get("reminders")
+        completed = application.bot_data["completed_goals"]
         
-        if not scheduler:
+        if wheel is None:
             logger.error("❌ No scheduler found for reload")
             return
         
         reminder_count = 0
-        for user_id, user_data in data.items():
-            reminders = user_data.get('reminders', {})
-            chat_id = user_data.get('chat_id')
-            
-            if not chat_id:
-                logger.warning(f"⚠️ No chat_id for user {user_id}, skipping reminders")
-                continue
-            
-            for goal, time_str in reminders.items():
-                try:
-                    hour, minute = map(int, time_str.split(":"))
-                    job_id = f"reminder_{user_id}_{goal.replace(' ', '_')}"
-                    
-                    ist = pytz.timezone('Asia/Kolkata')
-                    scheduler.add_job(
-                        goal_reminder_job,
-                        trigger='cron',
-                        hour=hour,
-                        minute=minute,
-                        timezone=ist,
-                        id=job_id,
-                        args=[chat_id, application, goal],
-                        replace_existing=True
-                    )
+        skipped_users = 0
+        users = list(store.users())
+        wheel.begin_loading()
+        for start_index in range(0, len(users), RELOAD_CHUNK_SIZE):
+            for user_id, user_data in users[start_index:start_index + RELOAD_CHUNK_SIZE]:
+                if not user_data.get('chat_id'):
+                    if user_data.get('reminders'):
+                        skipped_users += 1
+                    continue
+                
+                for key, minute, payload, zone in user_reminders(user_id, user_data):
+                    wheel.add_loaded(key, minute, payload, zone)
                     reminder_count += 1
-                    logger.info(f"✅ Reloaded: {job_id} at {time_str} IST for chat {chat_id}")
-                except Exception as e:
-                    logger.error(f"❌ Failed to reload {user_id}/{goal}: {e}")
+                for key, until in completed_reminders(user_id, user_data):
+                    completed.set(key, until)
+            # Let updates through between chunks and send anything that came due meanwhile
+            await wheel.dispatch_late()
+            await asyncio.sleep(0)
+        await wheel.end_loading()
         
-        logger.info(f"🔄 Reloaded {reminder_count} reminders. Total jobs: {len(scheduler.get_jobs())}")
+        if skipped_users:
+            logger.warning("⚠️ Skipped reminders for %s users without a chat_id", skipped_users)
+        logger.info("🔄 Reloaded %s reminders. Total scheduled: %s", reminder_count, len(wheel))
     except Exception as e:
-        logger.error(f"❌ Error reloading reminders: {e}")
+        logger.error("❌ Error reloading reminders: %s", e)
 
+def unschedule_reminders(application, user_id):
+    """Take all of a user's reminders off the wheel, whether or not they are still saved"""
+    wheel = application.bot_data.get("reminders")
+    if wheel is None:
+        return
+    removed = wheel.remove_all(str(user_id))
+    if removed:
+        logger.info("Removed %s reminders of user %s", len(removed), user_id)
+
+@instrumented
+async def set_timezone(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show the user's timezone, or change it with /timezone <city or zone>"""
+    user_id = update.effective_user.id
+    user_data = await get_user_data(user_id)
+    
+    if not context.args:
+        zone = user_zone(user_data)
+        now = datetime.now(zone)
+        await update.message.reply_text(
+            f"🕰️ Your timezone: {zone_label(zone)} ({format_offset(utc_offset_minutes(zone, now))}), "
+            f"where it's {now:%H:%M}\n\n"
+            f"Change it with /timezone and a city or zone, e.g. /timezone London or /timezone America/New_York"
+        )
+        return
+    
+    name = find_timezone(" ".join(context.args))
+    if name is None:
+        await update.message.reply_text(
+            "❓ I don't know that timezone. Try a city (/timezone Berlin) or a zone name (/timezone Europe/Berlin)."
+        )
+        return
+    user_data['timezone'] = name
+    await save_user_data(user_id, user_data)
+    
+    # Reminders keep their times of day, now in the new zone, and "done today" means its today
+    wheel = context.application.bot_data.get("reminders")
+    if wheel is not None and user_data.get('chat_id'):
+        for key, minute, payload, zone in user_reminders(str(user_id), user_data):
+            wheel.add(key, minute, payload, zone)
+    today = user_today(user_data)
+    for gid in user_data.get('reminders', {}):
+        track_completion(context.application, user_id, user_data, gid, today)
+    update_standing(context.application, user_id, user_data)
+    logger.info("🕰️ User %s moved to %s", user_id, name)
+    
+    zone = user_zone(user_data)
+    await update.message.reply_text(
+        f"✅ Timezone set to {zone_label(zone)}, where it's {datetime.now(zone):%H:%M}.\n\n"
+        f"Your reminders go off at their times there, and check-ins count for that day."
+    )
+
+@instrumented
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button clicks"""
     query = update.callback_query
-    await query.answer()
-    
     user_id = query.from_user.id
     
-    logger.info(f"Button callback: {query.data} from user {user_id}")
+    logger.info("Button callback: %s from user %s", query.data, user_id)
+    
+    # Goal buttons carry a goal ID ("c:3"); older messages still have "checkin_<name>"
+    goal_callback = decode_callback(query.data)
+    gid = resolve_goal(await get_user_data(user_id), *goal_callback[1:]) if goal_callback else None
+    if goal_callback and gid is None:
+        # A button from an old message for a goal that has since been removed
+        await query.answer("⚠️ This goal no longer exists.")
+    else:
+        await query.answer()
     
     if query.data == "add_goals":
         context.user_data['temp_goals'] = []
@@ -553,10 +985,13 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif query.data == "clear_goals":
         user_data = await get_user_data(user_id)
+        unschedule_reminders(context.application, user_id)
+        forget_completions(context.application, user_id, user_data)
         user_data['goals'] = []
-        user_data['checkins'] = {}
         user_data['reminders'] = {}
+        store.clear_checkins(user_id)
         await save_user_data(user_id, user_data)
+        update_standing(context.application, user_id, user_data)
         await query.edit_message_text(
             "🗑️ All goals cleared!\n\nUse /goals to set new goals."
         )
@@ -564,34 +999,46 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif query.data == "keep_goals":
         await query.edit_message_text("✅ Goals kept! Use /checkin to track progress.")
     
-    elif query.data.startswith("checkin_"):
+    elif goal_callback and goal_callback[0] == CHECKIN:
         # Handle check-in for specific goal
-        goal = query.data.replace("checkin_", "")
         user_data = await get_user_data(user_id)
-        today = str(date.today())
-        
-        if today not in user_data['checkins']:
-            user_data['checkins'][today] = {}
+        message = query.message
+        if gid is None:
+            # Redraw the keyboard without the removed goal
+            await context.application.bot_data["message_editor"].request(
+                message.chat_id, message.message_id, checkin_view(user_id)
+            )
+            return ConversationHandler.END
+        today = user_today(user_data)
         
         # Toggle completion
-        current = user_data['checkins'][today].get(goal, False)
-        user_data['checkins'][today][goal] = not current
-        await save_user_data(user_id, user_data)
+        current = user_data['checkins'].get(today.toordinal(), gid)
+        store.set_checkin(user_id, today.isoformat(), gid, not current)
+        track_completion(context.application, user_id, user_data, gid, today)
+        update_standing(context.application, user_id, user_data)
         
-        # Refresh the check-in view
-        await show_checkin_status(query, user_id, user_data, today)
+        # Refresh the check-in view; quick taps are merged into one edit
+        await context.application.bot_data["message_editor"].request(
+            message.chat_id, message.message_id, checkin_view(user_id)
+        )
     
     elif query.data == "skip_checkin":
+        message = query.message
+        context.application.bot_data["message_editor"].forget(message.chat_id, message.message_id)
         await query.edit_message_text("⏭️ Check-in skipped. See you tomorrow! 💪")
     
-    elif query.data.startswith("remind_"):
+    elif goal_callback and goal_callback[0] == REMIND:
         # Handle reminder setting for specific goal
-        goal = query.data.replace("remind_", "")
-        context.user_data['setting_reminder_for'] = goal
-        logger.info(f"User {user_id} setting reminder for goal: {goal}")
+        user_data = await get_user_data(user_id)
+        if gid is None:
+            await query.edit_message_text("⚠️ That goal no longer exists. Use /reminders for a fresh list.")
+            return ConversationHandler.END
+        goal = goal_names(user_data)[gid]
+        context.user_data['setting_reminder_for'] = gid
+        logger.info("User %s setting reminder for goal: %s", user_id, goal)
         await query.edit_message_text(
             f"⏰ Set reminder for: *{goal}*\n\n"
-            f"Send time in HH:MM format (24-hour, IST)\n"
+            f"Send time in HH:MM format (24-hour, {zone_label(user_zone(user_data))})\n"
             f"Example: 09:00 or 21:30\n\n"
             f"Send /cancel to go back",
             parse_mode="Markdown"
@@ -600,21 +1047,19 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif query.data == "clear_reminders":
         user_data = await get_user_data(user_id)
+        
+        # Remove all scheduled reminders for this user
+        unschedule_reminders(context.application, user_id)
+        forget_completions(context.application, user_id, user_data)
+        
         user_data['reminders'] = {}
         await save_user_data(user_id, user_data)
         
-        # Remove all scheduled jobs for this user
-        scheduler = context.bot_data.get("scheduler")
-        if scheduler:
-            for job in list(scheduler.get_jobs()):
-                if f"reminder_{user_id}_" in job.id:
-                    job.remove()
-                    logger.info(f"Removed job: {job.id}")
-        
         await query.edit_message_text("🔕 All reminders cleared!")
     
     return ConversationHandler.END
 
+@instrumented
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel any operation"""
     await update.message.reply_text("❌ Operation cancelled.")
@@ -624,6 +1069,413 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # === Main Function ===
 
+def read_last_tick():
+    """When the reminder wheel last ticked before this run, or None"""
+    try:
+        with open(REMINDER_STATE_FILE) as f:
+            return datetime.fromisoformat(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+async def reminder_tick(application):
+    """Run the wheel's minute tick and remember it for catch-up after a restart"""
+    wheel = application.bot_data["reminders"]
+    await wheel.tick()
+    try:
+        await asyncio.to_thread(write_atomic, REMINDER_STATE_FILE, wheel.last_tick.isoformat())
+    except OSError as e:
+        logger.error("❌ Failed to save reminder state: %s", e)
+
+def log_missed_tick(event):
+    logger.warning("⚠️ Reminder tick due %s missed; catching up on the next one", event.scheduled_run_time)
+
+async def start_reminders(application, load=reload_all_reminders):
+    """Start the once-a-minute reminder tick, then load reminders into the wheel with load(application)"""
+    with startup.phase("scheduler population"):
+        # Imported here so APScheduler stays off the path to the first poll
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        from apscheduler.events import EVENT_JOB_MISSED
+        
+        wheel = application.bot_data["reminders"]
+        last_tick = await asyncio.to_thread(read_last_tick)
+        if last_tick is not None:
+            logger.info("⏰ Last reminder tick before restart: %s", last_tick)
+            wheel.resume(last_tick)
+        scheduler = AsyncIOScheduler(timezone=wheel.timezone)
+        application.bot_data["scheduler"] = scheduler
+        scheduler.add_listener(log_missed_tick, EVENT_JOB_MISSED)
+        scheduler.add_job(
+            reminder_tick,
+            args=[application],
+            trigger='cron',
+            second=0,
+            id="reminder_tick",
+            coalesce=True,
+            misfire_grace_time=30,
+            replace_existing=True
+        )
+        scheduler.start()
+        
+        await load(application)
+    report_startup()
+
+def report_startup():
+    """Log the startup breakdown once the reminders are loaded and updates can arrive"""
+    if not startup.reported and startup.done("scheduler population", UPDATES_READY_PHASE):
+        startup.report()
+
+def updates_ready():
+    startup.end(UPDATES_READY_PHASE)
+    report_startup()
+
+async def post_init(application, load=reload_all_reminders):
+    """Runs right before updates start coming in: load reminders without holding them up"""
+    startup.begin(UPDATES_READY_PHASE)
+    application.bot_data["startup_task"] = asyncio.create_task(start_reminders(application, load))
+
+async def shutdown_bot(application):
+    """Stop sending reminders and write any pending user data before the process exits"""
+    scheduler = application.bot_data.get("scheduler")
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+    send_queue = application.bot_data.get("send_queue")
+    if send_queue is not None:
+        await send_queue.close()
+    message_editor = application.bot_data.get("message_editor")
+    if message_editor is not None:
+        await message_editor.close()
+    logger.info("💾 Flushing user data...")
+    await store.close()
+
+async def health(request):
+    return Response(200, "Bot is Alive!")
+
+async def metrics_endpoint(request):
+    return Response(200, REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def register_gauges(app):
+    """Point the scrape-time metrics at this application's state"""
+    message_editor = app.bot_data["message_editor"]
+    DATA_FILE_BYTES.set_function(
+        lambda: file_size(data_path(SQLITE_FILE if STORAGE_BACKEND.lower() == "sqlite" else GOAL_FILE))
+    )
+    USERS.set_function(lambda: len(store))
+    ARCHIVED_USERS.set_function(lambda: len(store.archive))
+    LEADERBOARDS.set_function(
+        lambda: len(app.bot_data["leaderboards"]) if isinstance(app.bot_data["leaderboards"], Leaderboards) else 0
+    )
+    REMINDERS_SCHEDULED.set_function(lambda: len(app.bot_data["reminders"]))
+    SCHEDULER_JOBS.set_function(lambda: scheduler_jobs(app))
+    REMINDERS_DONE_TODAY.set_function(
+        lambda: len(app.bot_data["completed_goals"]) if isinstance(app.bot_data["completed_goals"], CompletedGoals) else 0
+    )
+    SEND_QUEUE_LENGTH.set_function(lambda: len(app.bot_data["send_queue"]))
+    MESSAGE_EDITS.set_function(
+        lambda: {
+            "sent": message_editor.edits_sent,
+            "skipped": message_editor.edits_skipped,
+            "merged": message_editor.requests_merged
+        }
+    )
+
+def scheduler_jobs(app):
+    scheduler = app.bot_data.get("scheduler")
+    return (len(scheduler.get_jobs()) if scheduler is not None else 0) + len(app.bot_data["reminders"])
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+async def handle_worker_message(application, index, message):
+    """Leader: apply the reminder, check-in and leaderboard changes a shard worker reports"""
+    wheel = application.bot_data["reminders"]
+    if message["op"] == "add":
+        zone = get_timezone(message["zone"]) if message.get("zone") else None
+        wheel.add_loaded(tuple(message["key"]), message["minute"], tuple(message["payload"]), zone)
+    elif message["op"] == "remove":
+        wheel.remove(tuple(message["key"]))
+    elif message["op"] == "done":
+        application.bot_data["completed_goals"].set(tuple(message["key"]), message["until"])
+    elif message["op"] == "standing":
+        application.bot_data["leaderboards"].set_standing(
+            message["user"], message["groups"], Standing.from_list(message["standing"])
+        )
+
+async def load_worker_reminders(workers, application):
+    """Leader: wait until every worker has reported its shard's reminders"""
+    await workers.wait_loaded()
+    wheel = application.bot_data["reminders"]
+    await wheel.end_loading()
+    logger.info("🔄 %s workers reported their reminders. Total scheduled: %s", len(workers.workers), len(wheel))
+
+def is_command(update, command):
+    message = update.effective_message
+    text = message.text if message is not None and message.text else ""
+    return text.startswith("/") and text.split(maxsplit=1)[0].split("@")[0] == f"/{command}"
+
+async def forward_updates(application, workers):
+    """Leader: hand each incoming update to the worker that owns its user, until a None.
+
+    /leaderboard is answered here, where every shard's standings are.
+    """
+    answering = set()
+    while True:
+        update = await application.update_queue.get()
+        if update is None:
+            break
+        if is_command(update, "leaderboard"):
+            task = asyncio.create_task(
+                application.update_processor.process_update(update, application.process_update(update))
+            )
+            answering.add(task)
+            task.add_done_callback(answering.discard)
+            continue
+        try:
+            await workers.route(update_user_key(update), {"update": update.to_dict()})
+        except Exception as e:
+            logger.error("❌ Error forwarding update %s: %s", update.update_id, e)
+    if answering:
+        await asyncio.gather(*answering, return_exceptions=True)
+
+async def serve(app):
+    """Run the bot until SIGINT/SIGTERM.
+
+    One HTTP server on the bot's loop answers health checks, /metrics and,
+    in webhook mode, Telegram's deliveries; without WEBHOOK_URL updates are
+    polled. With WORKERS > 1 this process is the leader: updates are
+    forwarded to the shard workers, and reminders, which the workers report,
+    are scheduled and sent from here.
+    """
+    server = HttpServer(port=PORT)
+    server.route("GET", "/", health)
+    server.route("GET", "/metrics", metrics_endpoint)
+    secret_token = None
+    if WEBHOOK_URL:
+        secret_token = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        server.route("POST", WEBHOOK_PATH, telegram_webhook(app, secret_token))
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    
+    workers = forwarder = None
+    if WORKERS > 1:
+        def worker_exited(index, returncode):
+            logger.error("❌ Worker %s exited with code %s; stopping", index, returncode)
+            stop.set()
+        
+        workers = WorkerPool(
+            WORKERS, os.path.abspath(__file__), partial(handle_worker_message, app), worker_exited
+        )
+    
+    await app.initialize()
+    try:
+        if workers is None:
+            await post_init(app)
+            app.bot_data["leaderboard_task"] = asyncio.create_task(load_leaderboards(app))
+            await app.start()
+        else:
+            # Reminders the workers report while the tick is already running may be late
+            app.bot_data["reminders"].begin_loading()
+            await workers.start()
+            await post_init(app, partial(load_worker_reminders, workers))
+            forwarder = asyncio.create_task(forward_updates(app, workers))
+        await server.start()
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL + WEBHOOK_PATH,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            logger.info("🪝 Receiving updates by webhook at %s%s", WEBHOOK_URL, WEBHOOK_PATH)
+            updates_ready()
+        else:
+            # Deletes any webhook left from an earlier run
+            await app.updater.start_polling(drop_pending_updates=True)
+        logger.info("✅ Bot is running and ready!")
+        await stop.wait()
+    finally:
+        logger.info("🛑 Stopping bot...")
+        await server.close()
+        if app.updater.running:
+            await app.updater.stop()
+        if forwarder is not None:
+            # Updates already received still go to the workers
+            await app.update_queue.put(None)
+            await forwarder
+        if workers is not None:
+            await workers.close()
+        if app.running:
+            await app.stop()
+        await shutdown_bot(app)
+        await app.shutdown()
+
+async def receive_updates(application, channel):
+    """Worker: queue the updates the leader routes here until it closes the channel"""
+    while True:
+        message = await channel.receive()
+        if message is None:
+            return
+        await application.update_queue.put(Update.de_json(message["update"], application.bot))
+
+async def report_reminders(reminders, completed, leaderboards):
+    """Worker: send the shard's reminders, goals done today and group standings to the leader, then say it's loaded"""
+    users = list(store.users())
+    for start_index in range(0, len(users), RELOAD_CHUNK_SIZE):
+        chunk = users[start_index:start_index + RELOAD_CHUNK_SIZE]
+        for user_id, user_data in chunk:
+            if user_data.get('chat_id'):
+                for key, minute, payload, zone in user_reminders(user_id, user_data):
+                    reminders.add_loaded(key, minute, payload, zone)
+                for key, until in completed_reminders(user_id, user_data):
+                    completed.set(key, until)
+        for user_id, groups, standing in leaderboard_standings(chunk):
+            leaderboards.set_standing(user_id, groups, standing)
+        await reminders.flush()
+        await completed.flush()
+        await leaderboards.flush()
+    await reminders.channel.send({"op": "loaded"})
+
+async def run_worker():
+    """Multi-process mode: handle the updates for shard SHARD until the leader closes the channel"""
+    channel = await Channel.open(socket.socket(fileno=int(os.environ["IPC_FD"])))
+    # Ctrl+C reaches the whole process group; the leader decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    
+    app = build_application(ApplicationBuilder().token(os.environ["BOT_TOKEN"]).base_url(BOT_API_URL))
+    reminders = RemoteReminders(app.bot_data["reminders"].timezone, channel)
+    app.bot_data["reminders"] = reminders
+    completed = RemoteCompletedGoals(channel)
+    app.bot_data["completed_goals"] = completed
+    leaderboards = RemoteLeaderboards(channel)
+    app.bot_data["leaderboards"] = leaderboards
+    await load_store()
+    
+    server = HttpServer(host="127.0.0.1", port=PORT + 1 + SHARD)
+    server.route("GET", "/metrics", metrics_endpoint)
+    await app.initialize()
+    try:
+        await app.start()
+        await server.start()
+        await report_reminders(reminders, completed, leaderboards)
+        logger.info("✅ Worker %s ready with %s users", SHARD, len(store))
+        done, pending = await asyncio.wait(
+            {asyncio.create_task(receive_updates(app, channel)), asyncio.create_task(stop.wait())},
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+    finally:
+        logger.info("🛑 Stopping worker %s...", SHARD)
+        await server.close()
+        if app.running:
+            await app.stop()
+        await reminders.flush()
+        await completed.flush()
+        await leaderboards.flush()
+        await shutdown_bot(app)
+        await app.shutdown()
+        await channel.close()
+
+def build_application(builder):
+    """The bot's Application, built from a configured ApplicationBuilder, with its handlers and services.
+
+    The send queue starts right away, so this has to run on the event loop.
+    """
+    persistence = SqlitePersistence(
+        CONVERSATION_FILE, update_interval=CONVERSATION_SAVE_INTERVAL, max_age=CONVERSATION_MAX_AGE_DAYS * 86400
+    )
+    app = builder.concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES)).persistence(persistence).build()
+
+    # Reminders go out through a rate-limited queue
+    send_queue = SendQueue(
+        app.bot,
+        global_rate=SEND_RATE_GLOBAL,
+        per_chat_rate=SEND_RATE_PER_CHAT,
+        max_retries=SEND_MAX_RETRIES
+    )
+    send_queue.start()
+    app.bot_data["send_queue"] = send_queue
+    
+    # Check-in keyboards are edited at most once per interval, and only when they changed
+    app.bot_data["message_editor"] = MessageEditor(app.bot, interval=CHECKIN_EDIT_INTERVAL)
+    
+    # All reminders live on one wheel that wakes once a minute, in UTC minutes
+    # whatever zone each user is in; it is filled in the background by
+    # start_reminders() once updates start
+    app.bot_data["reminders"] = ReminderWheel(
+        pytz.utc, partial(dispatch_reminders, app),
+        catch_up_minutes=REMINDER_CATCH_UP_MINUTES,
+        catch_up_limit=REMINDER_CATCH_UP_LIMIT
+    )
+    app.bot_data["delivery_lag"] = DeliveryLag(slo=REMINDER_LAG_SLO)
+    # Goals with a reminder that are already done today; their reminders aren't sent
+    app.bot_data["completed_goals"] = CompletedGoals()
+    # Group rankings, updated on every check-in of a member
+    app.bot_data["leaderboards"] = Leaderboards()
+    register_gauges(app)
+    # Command handlers
+    logger.info("🔧 Adding command handlers...")
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("help", help_command))
+    app.add_handler(CommandHandler("checkin", checkin))
+    app.add_handler(CommandHandler("progress", progress))
+    app.add_handler(CommandHandler("debug", debug_reminders))
+    app.add_handler(CommandHandler("test_reminder", test_reminder))
+    app.add_handler(CommandHandler("timezone", set_timezone))
+    app.add_handler(CommandHandler("join", join_group))
+    app.add_handler(CommandHandler("leave", leave_group))
+    app.add_handler(CommandHandler("leaderboard", leaderboard))
+    
+    # Goals conversation
+    goals_handler = ConversationHandler(
+        entry_points=[CommandHandler("goals", goals_start)],
+        states={
+            ADDING_GOALS: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, add_goal),
+                CommandHandler("done", done_adding_goals)
+            ]
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+        per_message=False,
+        name="goals",
+        persistent=True
+    )
+    app.add_handler(goals_handler)
+    
+    # Reminders conversation - MUST include callback handler in entry points AND states
+    reminders_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler("reminders", reminders_menu),
+            CallbackQueryHandler(button_callback, pattern=REMIND_PATTERN)
+        ],
+        states={
+            SETTING_REMINDER_TIME: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, save_goal_reminder),
+                CallbackQueryHandler(button_callback, pattern=REMIND_PATTERN)
+            ]
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+        per_message=False,
+        allow_reentry=True,
+        name="reminders",
+        persistent=True
+    )
+    app.add_handler(reminders_handler)
+    
+    # Button callbacks - exclude reminder buttons to avoid conflicts
+    app.add_handler(CallbackQueryHandler(button_callback, pattern=NOT_REMIND_PATTERN))
+    return app
+
 async def main():
     """Start the bot"""
     try:
@@ -633,70 +1485,27 @@ async def main():
             return
 
         logger.info("🚀 Starting bot initialization...")
-        app = ApplicationBuilder().token(token).build()
-
-        # Scheduler setup
-        logger.info("📅 Setting up scheduler...")
-        scheduler = AsyncIOScheduler(timezone=pytz.timezone('Asia/Kolkata'))
-        scheduler.start()
-        app.bot_data["scheduler"] = scheduler
-        
-        # Reload existing reminders
-        logger.info("🔄 Reloading existing reminders...")
-        await reload_all_reminders(app)
-
-        # Command handlers
-        logger.info("🔧 Adding command handlers...")
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(CommandHandler("help", help_command))
-        app.add_handler(CommandHandler("checkin", checkin))
-        app.add_handler(CommandHandler("progress", progress))
-        app.add_handler(CommandHandler("debug", debug_reminders))
-        app.add_handler(CommandHandler("test_reminder", test_reminder))
-        
-        # Goals conversation
-        goals_handler = ConversationHandler(
-            entry_points=[CommandHandler("goals", goals_start)],
-            states={
-                ADDING_GOALS: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, add_goal),
-                    CommandHandler("done", done_adding_goals)
-                ]
-            },
-            fallbacks=[CommandHandler("cancel", cancel)],
-            per_message=False
+        app = build_application(
+            ApplicationBuilder()
+            .token(token)
+            .base_url(BOT_API_URL)
+            .get_updates_request(FirstPollRequest(updates_ready, connection_pool_size=1))
         )
-        app.add_handler(goals_handler)
-        
-        # Reminders conversation - MUST include callback handler in entry points AND states
-        reminders_handler = ConversationHandler(
-            entry_points=[
-                CommandHandler("reminders", reminders_menu),
-                CallbackQueryHandler(button_callback, pattern="^remind_")
-            ],
-            states={
-                SETTING_REMINDER_TIME: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, save_goal_reminder),
-                    CallbackQueryHandler(button_callback, pattern="^remind_")
-                ]
-            },
-            fallbacks=[CommandHandler("cancel", cancel)],
-            per_message=False,
-            allow_reentry=True
-        )
-        app.add_handler(reminders_handler)
-        
-        # Button callbacks - exclude remind_ buttons to avoid conflicts
-        app.add_handler(CallbackQueryHandler(button_callback, pattern="^(?!remind_).*$"))
 
-        logger.info("✅ Bot is running and ready!")
-        logger.info(f"📊 Scheduler has {len(scheduler.get_jobs())} jobs loaded")
-        await app.run_polling(drop_pending_updates=True)
+        if WORKERS > 1:
+            # Each worker loads its own shard; make sure the data is split this many ways
+            with startup.phase("data split"):
+                await split_into_shards(STORAGE_BACKEND, GOAL_FILE, SQLITE_FILE, CHECKIN_LOG, WORKERS, CHECKIN_ARCHIVE)
+        else:
+            # Load user data once; handlers work on the in-memory copy
+            with startup.phase("data load"):
+                await load_store()
+
+        await serve(app)
         
     except Exception as e:
-        logger.error(f"❌ Error starting bot: {e}", exc_info=True)
+        logger.error("❌ Error starting bot: %s", e, exc_info=True)
         raise
 
 if __name__ == "__main__":
-    nest_asyncio.apply()
-    asyncio.run(main())
+    asyncio.run(run_worker() if SHARD is not None else main())
@@ -0,0 +1,255 @@
+import sys
+import base64
+from array import array
+from datetime import date
+
+COMPACT_VERSION = 1
+
+# Smallest array type that holds a day's mask for a given number of goals;
+# past 64 goals the masks fall back to a plain list of ints
+MASK_TYPECODES = ((8, "B"), (16, "H"), (32, "I"), (64, "Q"))
+
+
+def day_ordinal(day):
+    """'YYYY-MM-DD' -> proleptic Gregorian ordinal"""
+    return date.fromisoformat(day).toordinal()
+
+
+def day_string(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+def mask_storage(goal_count):
+    """Empty container for day masks wide enough for goal_count goals"""
+    for bits, typecode in MASK_TYPECODES:
+        if goal_count <= bits:
+            return array(typecode)
+    return []
+
+
+class CheckinHistory:
+    """A user's check-ins as one goal bitmask per day.
+
+    Goals are numbered in the order they were first checked; bit i of
+    days[n] is set when goals[i] was completed on day base + n. Goals
+    explicitly toggled off are kept in the parallel `off` masks so the legacy
+    {date: {goal: bool}} form round-trips exactly. Both are typed arrays (one
+    byte per day for up to 8 goals), widened as goals are added.
+    """
+
+    __slots__ = ("goals", "_goal_bits", "base", "days", "off")
+
+    def __init__(self):
+        self.goals = []
+        self._goal_bits = {}  # goal -> bit
+        self.base = None
+        self.days = mask_storage(0)
+        self.off = mask_storage(0)
+
+    # --- single-day access ---
+
+    def _bit(self, goal, create=False):
+        bit = self._goal_bits.get(goal)
+        if bit is None and create:
+            bit = 1 << len(self.goals)
+            self.goals.append(goal)
+            self._goal_bits[goal] = bit
+            wider = mask_storage(len(self.goals))
+            if getattr(wider, "typecode", None) != getattr(self.days, "typecode", None):
+                self.days = self._copy_masks(self.days)
+                self.off = self._copy_masks(self.off)
+        return bit
+
+    def _copy_masks(self, masks, pad=0):
+        copy = mask_storage(len(self.goals))
+        copy.extend([0] * pad)
+        copy.extend(iter(masks))
+        return copy
+
+    def _index(self, ordinal, create=False):
+        if self.base is None:
+            if not create:
+                return None
+            self.base = ordinal
+        index = ordinal - self.base
+        if index < 0:
+            if not create:
+                return None
+            # Rare: a day before the first one we have; shift everything right
+            self.days = self._copy_masks(self.days, pad=-index)
+            self.off = self._copy_masks(self.off, pad=-index)
+            self.base = ordinal
+            index = 0
+        if index >= len(self.days):
+            if not create:
+                return None
+            padding = [0] * (index + 1 - len(self.days))
+            self.days.extend(padding)
+            self.off.extend(padding)
+        return index
+
+    def get(self, ordinal, goal):
+        """Whether goal was completed on the day"""
+        bit = self._goal_bits.get(goal)
+        index = self._index(ordinal)
+        return bit is not None and index is not None and bool(self.days[index] & bit)
+
+    def set(self, ordinal, goal, done):
+        """Mark goal done/not done on the day; returns the previous value"""
+        bit = self._bit(goal, create=True)
+        index = self._index(ordinal, create=True)
+        was_done = bool(self.days[index] & bit)
+        if done:
+            self.days[index] |= bit
+            self.off[index] &= ~bit
+        else:
+            self.days[index] &= ~bit
+            self.off[index] |= bit
+        return was_done
+
+    def done_mask(self, ordinal):
+        index = self._index(ordinal)
+        return self.days[index] if index is not None else 0
+
+    def completed_count(self, ordinal):
+        """Number of goals completed on the day"""
+        return self.done_mask(ordinal).bit_count()
+
+    def bit_for(self, goal):
+        """The goal's bit in day masks, or 0 if it was never checked"""
+        return self._goal_bits.get(goal, 0)
+
+    # --- iteration ---
+
+    def iter_days(self):
+        """(ordinal, {goal: done}) for every day with a check-in, oldest first"""
+        for index, (mask, off) in enumerate(zip(self.days, self.off)):
+            seen = mask | off
+            if not seen:
+                continue
+            entries = {}
+            for i, goal in enumerate(self.goals):
+                bit = 1 << i
+                if seen & bit:
+                    entries[goal] = bool(mask & bit)
+            yield self.base + index, entries
+
+    def iter_done(self):
+        """(ordinal, goal) for every completed goal"""
+        goals = self.goals
+        for index, mask in enumerate(self.days):
+            i = 0
+            while mask:
+                if mask & 1:
+                    yield self.base + index, goals[i]
+                mask >>= 1
+                i += 1
+
+    # --- splitting and merging ---
+
+    def split_before(self, ordinal):
+        """Move the days before `ordinal` out into a new history and return it"""
+        old = CheckinHistory()
+        if self.base is None or ordinal <= self.base:
+            return old
+        count = min(ordinal - self.base, len(self.days))
+        old.goals = list(self.goals)
+        old._goal_bits = dict(self._goal_bits)
+        old.base = self.base
+        old.days, self.days = self.days[:count], self.days[count:]
+        old.off, self.off = self.off[:count], self.off[count:]
+        self.base = ordinal if len(self.days) else None
+        return old
+
+    def update(self, other):
+        """Apply every check-in in `other` on top of this history; returns self"""
+        for ordinal, entries in other.iter_days():
+            for goal, done in entries.items():
+                self.set(ordinal, goal, done)
+        return self
+
+    def copy(self):
+        copy = CheckinHistory()
+        copy.goals = list(self.goals)
+        copy._goal_bits = dict(self._goal_bits)
+        copy.base = self.base
+        copy.days = self.days[:]
+        copy.off = self.off[:]
+        return copy
+
+    def rename_goals(self, mapping):
+        """Re-key goals in place (old -> new); bits are unchanged"""
+        self.goals = [mapping.get(goal, goal) for goal in self.goals]
+        self._goal_bits = {goal: 1 << i for i, goal in enumerate(self.goals)}
+
+    def day_count(self):
+        """Days with any check-in"""
+        return sum(1 for mask, off in zip(self.days, self.off) if mask or off)
+
+    def is_empty(self):
+        return not any(self.days) and not any(self.off)
+
+    # --- conversions ---
+
+    @classmethod
+    def from_legacy(cls, checkins):
+        """Build from the {date: {goal: bool}} schema (days without entries are dropped)"""
+        history = cls()
+        for day in sorted(checkins):
+            ordinal = day_ordinal(day)
+            for goal, done in checkins[day].items():
+                history.set(ordinal, goal, bool(done))
+        return history
+
+    def to_legacy(self):
+        """The {date: {goal: bool}} schema"""
+        return {day_string(ordinal): entries for ordinal, entries in self.iter_days()}
+
+    @staticmethod
+    def _encode_masks(masks):
+        """Little-endian base64 for typed arrays, a plain list past 64 goals"""
+        if not isinstance(masks, array):
+            return list(masks)
+        if sys.byteorder != "little":
+            masks = array(masks.typecode, masks)
+            masks.byteswap()
+        return base64.b64encode(masks.tobytes()).decode("ascii")
+
+    def _decode_masks(self, encoded):
+        masks = mask_storage(len(self.goals))
+        if isinstance(encoded, str):
+            masks.frombytes(base64.b64decode(encoded))
+            if sys.byteorder != "little":
+                masks.byteswap()
+        else:
+            masks.extend(encoded)
+        return masks
+
+    def to_compact(self):
+        """JSON-ready compact form"""
+        return {
+            "v": COMPACT_VERSION,
+            "goals": list(self.goals),
+            "base": self.base,
+            "days": self._encode_masks(self.days),
+            "off": self._encode_masks(self.off)
+        }
+
+    @classmethod
+    def from_compact(cls, data):
+        history = cls()
+        history.goals = list(data["goals"])
+        history._goal_bits = {goal: 1 << i for i, goal in enumerate(history.goals)}
+        history.base = data["base"]
+        history.days = history._decode_masks(data["days"])
+        history.off = history._decode_masks(data["off"])
+        return history
+
+    @classmethod
+    def load(cls, data):
+        """Accept either the compact form or the legacy schema"""
+        if isinstance(data, cls):
+            return data
+        if isinstance(data, dict) and data.get("v") == COMPACT_VERSION:
+            return cls.from_compact(data)
+        return cls.from_legacy(data or {})
@@ -0,0 +1,27 @@
+"""Where the bot keeps its data, shared by bot.py and the offline tools (dataset.py).
+
+Values come from the environment, with a .env file loaded first as bot.py
+does, so every entry point sees the same files.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# File to store goals and check-ins
+GOAL_FILE = "goals.json"
+# Storage engine: "json" (GOAL_FILE) or "sqlite" (SQLITE_FILE)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+SQLITE_FILE = os.environ.get("SQLITE_FILE", "goals.sqlite3")
+# Append-only log of check-in toggles, compacted into storage periodically
+CHECKIN_LOG = os.environ.get("CHECKIN_LOG", "checkins.log")
+# Check-ins older than about CHECKIN_HOT_DAYS (back to the start of that month)
+# move to compressed files in CHECKIN_ARCHIVE, read only by long-range views
+# and exports; 0 (the default) keeps all history in the live data
+CHECKIN_HOT_DAYS = int(os.environ.get("CHECKIN_HOT_DAYS", "0"))
+CHECKIN_ARCHIVE = os.environ.get("CHECKIN_ARCHIVE", "archive")
+
+# Multi-process mode (see shards.py): WORKERS > 1 runs that many user-sharded
+# worker processes under this one; SHARD is set in each worker's environment
+WORKERS = int(os.environ.get("WORKERS", "1"))
+SHARD = int(os.environ["SHARD"]) if "SHARD" in os.environ else None
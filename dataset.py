@@ -0,0 +1,470 @@
+"""Streaming export and import of check-in history, for analytics and migrations.
+
+    python dataset.py export [-o FILE] [--format ndjson|csv] [--user ID ...] [--since DAY] [--until DAY]
+    python dataset.py import FILE [--format ndjson|csv] [--user ID ...] [--since DAY] [--until DAY]
+
+Each row is one user, goal and day: user_id, goal_id, goal (the goal's
+name), day (YYYY-MM-DD) and done. NDJSON has one object per line; CSV has a
+header row and done as 1/0. FILE "-" (the default for export) is
+stdout/stdin; otherwise the format follows the file's extension. --user
+(repeatable) and --since/--until (inclusive) filter the rows either way.
+
+The data set is the one bot.py would use, from the same settings in
+config.py (STORAGE_BACKEND, SQLITE_FILE, CHECKIN_LOG, CHECKIN_ARCHIVE, WORKERS). Stop
+the bot first: an import rewrites its files underneath it.
+
+Export walks the live data a record (goals.json) or a row (SQLite) at a
+time and then the archive a bucket at a time, with check-ins still in the
+log applied on top. Import stages its rows in a temporary SQLite file, then
+merges them a user at a time: goals.json is rewritten record by record,
+SQLite gets per-user upserts. Either way memory stays flat however large
+the data is; only the check-in log, which compaction keeps short, is read
+whole.
+
+Imported goals are matched to the user's goals by name. New names keep
+their goal_id when the user doesn't have that ID yet and get the next free
+one otherwise. Users the import creates get the imported goals as their
+goal list.
+"""
+import io
+import os
+import csv
+import sys
+import json
+import sqlite3
+import logging
+import argparse
+from datetime import date
+from checkins import day_ordinal, day_string
+from config import GOAL_FILE, STORAGE_BACKEND, SQLITE_FILE, CHECKIN_LOG, CHECKIN_ARCHIVE, WORKERS
+from goals import goal_id, goal_names, migrate_goal_ids
+from shards import shard_of, shard_path
+from storage import CheckinArchive, CheckinLog, JsonFileBackend, SqliteBackend, new_user_record
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("user_id", "goal_id", "goal", "day", "done")
+FORMATS = ("ndjson", "csv")
+# Rows staged per statement on import; users (or ten times as many check-ins) written per transaction
+IMPORT_BATCH = 1000
+
+
+class DataSet:
+    """One shard's data files; kind is the backend whose file holds its live data"""
+
+    __slots__ = ("index", "kind", "json_path", "sqlite_path", "log_path", "archive_path")
+
+    def __init__(self, index, shards):
+        self.index = index
+        self.json_path = shard_path(GOAL_FILE, index, shards)
+        self.sqlite_path = shard_path(SQLITE_FILE, index, shards)
+        self.log_path = shard_path(CHECKIN_LOG, index, shards)
+        self.archive_path = shard_path(CHECKIN_ARCHIVE, index, shards)
+        # As at bot startup, a goals.json not yet migrated to SQLite is still the live data
+        sqlite = STORAGE_BACKEND.lower() == "sqlite" and (os.path.exists(self.sqlite_path) or not os.path.exists(self.json_path))
+        self.kind = "sqlite" if sqlite else "json"
+
+
+# === Export ===
+
+def pending_checkins(log_path, users=None):
+    """({user_id: {(day, goal ID): done}}, users who cleared their history) from the check-in log"""
+    pending, cleared = {}, set()
+    for user_id, day, goal, done in CheckinLog(log_path).replay():
+        if users is not None and user_id not in users:
+            continue
+        if day is None:
+            pending[user_id] = {}
+            cleared.add(user_id)
+        else:
+            pending.setdefault(user_id, {})[(day, goal)] = done
+    return pending, cleared
+
+
+def history_rows(user_id, history, names, first, last, skip):
+    """Rows of a CheckinHistory between the first and last ordinals, leaving out (day, goal ID) pairs in skip"""
+    if history.base is None:
+        return
+    goals = [(1 << i, gid, names.get(gid)) for i, gid in enumerate(history.goals)]
+    start = max(first - history.base, 0)
+    end = min(last - history.base + 1, len(history.days))
+    for index in range(start, end):
+        mask = history.days[index]
+        seen = mask | history.off[index]
+        if not seen:
+            continue
+        day = day_string(history.base + index)
+        for bit, gid, name in goals:
+            if seen & bit and (not skip or (day, gid) not in skip):
+                yield user_id, gid, name, day, bool(mask & bit)
+
+
+class GoalNameIndex:
+    """{goal ID: name} per user, spilled to a temporary SQLite file while goals.json is read.
+
+    The archive has no goal names; this keeps them at hand for its pass
+    without holding every user's goals in memory.
+    """
+
+    def __init__(self):
+        self._conn = sqlite3.connect("")  # private on-disk database, deleted on close
+        self._conn.execute("CREATE TABLE names (user_id TEXT, goal_id TEXT, name TEXT, PRIMARY KEY (user_id, goal_id))")
+
+    def add(self, user_id, names):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO names VALUES (?, ?, ?)", [(user_id, gid, name) for gid, name in names.items()]
+        )
+
+    def get(self, user_id):
+        return dict(self._conn.execute("SELECT goal_id, name FROM names WHERE user_id = ?", (user_id,)))
+
+    def close(self):
+        self._conn.close()
+
+
+def export_rows(data_set, users=None, since=None, until=None):
+    """Rows for one shard's data set: live check-ins by user, then archived ones, then any still in the log"""
+    first = day_ordinal(since) if since else 1
+    last = day_ordinal(until) if until else date.max.toordinal()
+    pending, cleared = pending_checkins(data_set.log_path, users)
+    before = None
+    archive = CheckinArchive(data_set.archive_path)
+    if os.path.isdir(data_set.archive_path):
+        before = archive.read_index()
+    read_archive = before is not None and first < before
+
+    backend = name_index = None
+    try:
+        if data_set.kind == "sqlite":
+            if os.path.exists(data_set.sqlite_path):
+                backend = SqliteBackend(data_set.sqlite_path)
+                for user_id, gid, name, day, done in backend.iter_checkins(users, since, until):
+                    if user_id not in cleared and (day, gid) not in pending.get(user_id, ()):
+                        yield user_id, gid, name, day, done
+            names_of = backend.goal_names if backend is not None else lambda user_id: {}
+        else:
+            name_index = GoalNameIndex() if read_archive else None
+            logged_names = {}
+            for user_id, record in JsonFileBackend(data_set.json_path).iter_records():
+                if users is not None and user_id not in users:
+                    continue
+                migrate_goal_ids(record)
+                names = goal_names(record)
+                if name_index is not None:
+                    name_index.add(user_id, names)
+                if user_id in pending:
+                    logged_names[user_id] = names
+                if user_id not in cleared:
+                    yield from history_rows(user_id, record["checkins"], names, first, last, pending.get(user_id, {}))
+            names_of = name_index.get if name_index is not None else lambda user_id: logged_names.get(user_id, {})
+
+        if read_archive:
+            for user_id, history in archive.iter_histories(users):
+                if user_id not in cleared:
+                    yield from history_rows(user_id, history, names_of(user_id), first, last, pending.get(user_id, {}))
+        for user_id, logged in pending.items():
+            names = names_of(user_id)
+            for (day, gid), done in sorted(logged.items()):
+                if first <= day_ordinal(day) <= last:
+                    yield user_id, gid, names.get(gid), day, done
+    finally:
+        if backend is not None:
+            backend.disconnect()
+        if name_index is not None:
+            name_index.close()
+
+
+def _ndjson_prefix(user_id, gid, name):
+    return json.dumps({"user_id": user_id, "goal_id": gid, "goal": name}, ensure_ascii=False)[:-1] + ", "
+
+
+def _csv_prefix(user_id, gid, name):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow((user_id, gid, name or "", ""))
+    return buffer.getvalue()[:-2]  # "user_id,goal_id,goal," without the line end
+
+
+def write_rows(rows, f, fmt):
+    """Write rows as NDJSON or CSV; returns how many"""
+    if fmt == "csv":
+        f.write(",".join(FIELDS) + "\r\n")
+        encode_prefix, done_values, line = _csv_prefix, ("0", "1"), "{}{},{}\r\n"
+    else:
+        encode_prefix, done_values, line = _ndjson_prefix, ("false", "true"), '{}"day": "{}", "done": {}}}\n'
+    # Rows come grouped by user, so a user's goals are encoded once rather than per day
+    prefixes = {}
+    count = 0
+    for user_id, gid, name, day, done in rows:
+        prefix = prefixes.get((user_id, gid, name))
+        if prefix is None:
+            if len(prefixes) > 1000:
+                prefixes.clear()
+            prefix = prefixes[(user_id, gid, name)] = encode_prefix(user_id, gid, name)
+        f.write(line.format(prefix, day, done_values[done]))
+        count += 1
+    return count
+
+
+# === Import ===
+
+def parse_done(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes"):
+        return True
+    if text in ("0", "false", "no"):
+        return False
+    raise ValueError(f"done should be true/false or 1/0, not {value!r}")
+
+
+def read_rows(f, fmt):
+    """(user_id, goal_id, goal, day, done) from NDJSON or CSV; goal_id or goal may be empty, not both"""
+    if fmt == "csv":
+        lines = enumerate(csv.DictReader(f), 2)
+    else:
+        lines = ((number, json.loads(text)) for number, text in enumerate(f, 1) if text.strip())
+    for number, row in lines:
+        try:
+            user_id = str(row.get("user_id") or "").strip()
+            gid = str(row.get("goal_id") or "").strip()
+            name = str(row.get("goal") or "")
+            if not user_id:
+                raise ValueError("user_id is missing")
+            if not gid and not name:
+                raise ValueError("goal_id and goal are both missing")
+            day = date.fromisoformat(str(row.get("day"))).isoformat()
+            done = parse_done(row.get("done", True))
+        except (ValueError, AttributeError) as e:
+            raise ValueError(f"Line {number}: {e}") from None
+        yield user_id, gid, name, day, done
+
+
+class Staging:
+    """Imported rows in a temporary SQLite file, so they can be taken a user at a time in any order"""
+
+    def __init__(self, shards):
+        self.shards = shards
+        self._conn = sqlite3.connect("")
+        self._conn.execute(
+            "CREATE TABLE rows (shard INTEGER, user_id TEXT, day TEXT, goal TEXT, goal_id TEXT, done INTEGER, "
+            "PRIMARY KEY (shard, user_id, day, goal, goal_id)) WITHOUT ROWID"
+        )
+
+    def add(self, rows):
+        """Stage the rows (later duplicates win); returns how many were read"""
+        count = 0
+        batch = []
+        last_user = shard = None
+        for user_id, gid, name, day, done in rows:
+            if user_id != last_user:
+                last_user, shard = user_id, shard_of(user_id, self.shards)
+            batch.append((shard, user_id, day, name, gid, int(done)))
+            if len(batch) >= IMPORT_BATCH:
+                count += self._insert(batch)
+        return count + self._insert(batch)
+
+    def _insert(self, batch):
+        self._conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?)", batch)
+        count = len(batch)
+        batch.clear()
+        return count
+
+    def users(self, shard):
+        return (user_id for user_id, in self._conn.execute(
+            "SELECT DISTINCT user_id FROM rows WHERE shard = ?", (shard,)
+        ))
+
+    def __contains__(self, key):
+        return self._conn.execute("SELECT 1 FROM rows WHERE shard = ? AND user_id = ? LIMIT 1", key).fetchone() is not None
+
+    def goals(self, shard, user_id):
+        """Distinct (goal, goal_id) pairs of a user's rows"""
+        return self._conn.execute(
+            "SELECT DISTINCT goal, goal_id FROM rows WHERE shard = ? AND user_id = ?", (shard, user_id)
+        ).fetchall()
+
+    def rows(self, shard, user_id):
+        """(day, goal, goal_id, done) of a user's rows, oldest first"""
+        return self._conn.execute(
+            "SELECT day, goal, goal_id, done FROM rows WHERE shard = ? AND user_id = ? ORDER BY day", (shard, user_id)
+        ).fetchall()
+
+    def drop(self, shard, user_id):
+        self._conn.execute("DELETE FROM rows WHERE shard = ? AND user_id = ?", (shard, user_id))
+
+    def close(self):
+        self._conn.close()
+
+
+def _id_order(pair):
+    name, gid = pair
+    try:
+        return (0, int(gid, 36), name)
+    except ValueError:
+        return (1, 0, name)
+
+
+def merge_goals(record, goals, created):
+    """{(goal, goal_id): the record's goal ID} for imported goals, registering new names in the record"""
+    registry = record.setdefault("goal_ids", {})
+    taken = set(registry.values())
+    ids = {}
+    for name, gid in sorted(goals, key=_id_order):
+        if not name:
+            target = gid
+        elif name in registry:
+            target = registry[name]
+        elif gid and gid not in taken:
+            target = registry[name] = gid
+        else:
+            target = goal_id(record, name)
+        taken.add(target)
+        ids[(name, gid)] = target
+    if created:
+        record["goals"] = list(dict.fromkeys(name for name, gid in sorted(goals, key=_id_order) if name))
+    return ids
+
+
+def merged_ops(staging, shard, user_id, record, created):
+    """Check-in operations (user_id, day, goal ID, done) that apply a user's staged rows to their record"""
+    ids = merge_goals(record, staging.goals(shard, user_id), created)
+    return [(user_id, day, ids[(name, gid)], bool(done)) for day, name, gid, done in staging.rows(shard, user_id)]
+
+
+def import_json(staging, data_set):
+    """Rewrite the shard's goals.json record by record with the staged rows merged in; returns users changed"""
+    shard = data_set.index
+    backend = JsonFileBackend(data_set.json_path)
+    changed = 0
+
+    def records():
+        nonlocal changed
+        for user_id, record in backend.iter_records():
+            if (shard, user_id) in staging:
+                migrate_goal_ids(record)
+                for _, day, gid, done in merged_ops(staging, shard, user_id, record, False):
+                    record["checkins"].set(day_ordinal(day), gid, done)
+                staging.drop(shard, user_id)
+                changed += 1
+            yield user_id, record
+        for user_id in staging.users(shard):
+            record = new_user_record()
+            for _, day, gid, done in merged_ops(staging, shard, user_id, record, True):
+                record["checkins"].set(day_ordinal(day), gid, done)
+            changed += 1
+            yield user_id, record
+
+    backend.write_records(records())
+    return changed
+
+
+def import_sqlite(staging, data_set):
+    """Upsert the staged rows into the shard's SQLite database, a batch of users per transaction; returns users changed"""
+    shard = data_set.index
+    backend = SqliteBackend(data_set.sqlite_path)
+    changed = 0
+    try:
+        records, ops = [], []
+        for user_id in staging.users(shard):
+            record = backend.load_profile(user_id)
+            created = record is None
+            if created:
+                record = new_user_record()
+            ops.extend(merged_ops(staging, shard, user_id, record, created))
+            records.append((user_id, record))
+            if len(records) >= IMPORT_BATCH or len(ops) >= IMPORT_BATCH * 10:
+                backend.write_records(records, ops)
+                changed += len(records)
+                records, ops = [], []
+        backend.write_records(records, ops)
+        changed += len(records)
+    finally:
+        backend.disconnect()
+    return changed
+
+
+def import_rows(rows, shards):
+    """Merge rows into every shard's data set; returns (rows read, users changed)"""
+    data_sets = [DataSet(index, shards) for index in range(shards)]
+    for data_set in data_sets:
+        # Logged check-ins are replayed over the live data at startup and would undo imported ones
+        if CheckinLog(data_set.log_path).replay():
+            raise ValueError(f"{data_set.log_path} has check-ins not yet compacted; start and stop the bot once first")
+    staging = Staging(shards)
+    try:
+        count = staging.add(rows)
+        changed = 0
+        for data_set in data_sets:
+            changed += (import_sqlite if data_set.kind == "sqlite" else import_json)(staging, data_set)
+    finally:
+        staging.close()
+    return count, changed
+
+
+# === Command line ===
+
+def parse_day(text):
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD day: {text!r}") from None
+
+
+def file_format(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def filtered(rows, users, since, until):
+    for row in rows:
+        user_id, _, _, day, _ = row
+        if (users is None or user_id in users) and (not since or day >= since) and (not until or day <= until):
+            yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import check-in history, one row per user, goal and day")
+    commands = parser.add_subparsers(dest="command", required=True)
+    exporting = commands.add_parser("export", help="write check-ins to a file (stdout by default)")
+    exporting.add_argument("-o", "--output", default="-", help="file to write, or - for stdout")
+    importing = commands.add_parser("import", help="merge check-ins from a file into the data")
+    importing.add_argument("file", help="file to read, or - for stdin")
+    for command in (exporting, importing):
+        command.add_argument("--format", choices=FORMATS, help="default: from the file extension, else ndjson")
+        command.add_argument("--user", action="append", dest="users", metavar="ID", help="only this user (repeatable)")
+        command.add_argument("--since", type=parse_day, metavar="YYYY-MM-DD", help="only days from this one on")
+        command.add_argument("--until", type=parse_day, metavar="YYYY-MM-DD", help="only days up to this one")
+    args = parser.parse_args(argv)
+    users = set(args.users) if args.users else None
+
+    if args.command == "export":
+        fmt = file_format(args.output, args.format)
+        shards = range(WORKERS) if users is None else sorted({shard_of(user_id, WORKERS) for user_id in users})
+        rows = (row for index in shards for row in export_rows(DataSet(index, WORKERS), users, args.since, args.until))
+        if args.output == "-":
+            count = write_rows(rows, sys.stdout, fmt)
+        else:
+            with open(args.output, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+                count = write_rows(rows, f, fmt)
+        logger.info("📤 Exported %s check-ins", count)
+        return 0
+
+    fmt = file_format(args.file, args.format)
+    try:
+        if args.file == "-":
+            count, changed = import_rows(filtered(read_rows(sys.stdin, fmt), users, args.since, args.until), WORKERS)
+        else:
+            with open(args.file, "r", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+                count, changed = import_rows(filtered(read_rows(f, fmt), users, args.since, args.until), WORKERS)
+    except (ValueError, OSError) as e:
+        logger.error("❌ Import failed: %s", e)
+        return 1
+    logger.info("📥 Imported %s check-ins for %s users", count, changed)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Stable goal IDs and the callback_data that refers to them.
+
+Every goal name a user has had gets a short ID ("1", "2", ... "a", ...) in
+the record's goal_ids map ({name: id}). IDs are never reused, so buttons in
+old messages can't land on a different goal, and check-ins, reminders and
+scheduler keys are all keyed by ID rather than by name.
+
+Callback data is "<action>:<goal id>" (e.g. "c:3"), well inside Telegram's
+64-byte limit whatever the goal is called. Buttons sent before IDs existed
+("checkin_<name>", "remind_<name>") still decode.
+"""
+
+CHECKIN = "c"
+REMIND = "r"
+ACTIONS = (CHECKIN, REMIND)
+
+# Prefixes of callback data sent before goal IDs, by action
+LEGACY_PREFIXES = {CHECKIN: "checkin_", REMIND: "remind_"}
+
+# CallbackQueryHandler patterns: reminder buttons belong to the reminders
+# conversation, everything else to the general button handler
+_REMIND_PREFIXES = f"({REMIND}:|{LEGACY_PREFIXES[REMIND]})"
+REMIND_PATTERN = f"^{_REMIND_PREFIXES}"
+NOT_REMIND_PATTERN = f"^(?!{_REMIND_PREFIXES}).*$"
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _base36(number):
+    encoded = ""
+    while number:
+        number, digit = divmod(number, 36)
+        encoded = DIGITS[digit] + encoded
+    return encoded or "0"
+
+
+def goal_id(record, name):
+    """The ID for a goal name, assigning the next free one if the name is new"""
+    registry = record.setdefault("goal_ids", {})
+    existing = registry.get(name)
+    if existing is None:
+        # IDs are dense unless an import kept IDs from elsewhere
+        taken = set(registry.values())
+        number = len(registry) + 1
+        while _base36(number) in taken:
+            number += 1
+        existing = registry[name] = _base36(number)
+    return existing
+
+
+def goal_names(record):
+    """{id: name} for every goal the user has had"""
+    return {gid: name for name, gid in record.get("goal_ids", {}).items()}
+
+
+def current_goal_ids(record):
+    """(id, name) for the user's current goals, in order"""
+    return [(goal_id(record, name), name) for name in record["goals"]]
+
+
+def migrate_goal_ids(record):
+    """Re-key a record's reminders and check-ins from goal names to IDs.
+
+    Records written before goal IDs have no goal_ids map; every name they
+    mention (current goals, reminders, check-in history) gets an ID. Returns
+    True if the record changed.
+    """
+    if record.get("goal_ids"):
+        return False
+    history = record["checkins"]
+    names = [*record.get("goals", []), *record.get("reminders", {}), *history.goals]
+    if not names:
+        record.setdefault("goal_ids", {})
+        return False
+    for name in names:
+        goal_id(record, name)
+    registry = record["goal_ids"]
+    record["reminders"] = {registry[name]: time_str for name, time_str in record.get("reminders", {}).items()}
+    history.rename_goals(registry)
+    return True
+
+
+def encode_callback(action, gid):
+    return f"{action}:{gid}"
+
+
+def decode_callback(data):
+    """(action, goal ref, legacy) for goal buttons, or None for anything else.
+
+    The ref is a goal ID, or the goal name for legacy buttons.
+    """
+    if len(data) > 2 and data[1] == ":" and data[0] in ACTIONS:
+        return data[0], data[2:], False
+    for action, prefix in LEGACY_PREFIXES.items():
+        if data.startswith(prefix):
+            return action, data[len(prefix):], True
+    return None
+
+
+def resolve_goal(record, ref, legacy):
+    """Goal ID a decoded callback refers to, or None if it isn't one of the user's current goals.
+
+    Buttons in old messages can still name a goal that has since been
+    removed; its ID stays in goal_ids, but it mustn't be checked in again.
+    """
+    gid = record.get("goal_ids", {}).get(ref) if legacy else ref
+    return gid if any(gid == current for current, _ in current_goal_ids(record)) else None
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers  # lower-cased names
+        self.body = body
+
+
+class Response:
+    __slots__ = ("status", "body", "content_type", "headers")
+
+    def __init__(self, status=200, body=b"", content_type="text/plain; charset=utf-8", headers=None):
+        self.status = status
+        self.body = body.encode() if isinstance(body, str) else body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class HttpServer:
+    """Small HTTP/1.1 server on the running event loop.
+
+    Routes map (method, path) to `async handler(request) -> Response`.
+    Connections are kept alive between requests (Telegram reuses them for
+    webhook deliveries); bodies need a Content-Length and are capped at
+    max_body bytes. There is no TLS: run it behind the host's proxy.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, max_body=1 << 20, idle_timeout=75.0):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self._routes = {}  # (method, path) -> handler
+        self._server = None
+        self._connections = set()
+
+    def route(self, method, path, handler):
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("🌐 HTTP server listening on %s:%s", self.host, self.port)
+
+    async def close(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except HttpError as e:
+                    await self._write(writer, Response(e.status, HTTPStatus(e.status).phrase), keep_alive=False)
+                    return
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                if request is None:
+                    return
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers["connection"] = "close"
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(411)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HttpError(400)
+        if length > self.max_body:
+            raise HttpError(413)
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, url.query, headers, body)
+
+    async def _dispatch(self, request):
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            allowed = any(path == request.path for _, path in self._routes)
+            status = 405 if allowed else 404
+            return Response(status, HTTPStatus(status).phrase)
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error("❌ Error handling %s %s: %s", request.method, request.path, e, exc_info=True)
+            return Response(500, "Internal Server Error")
+
+    @staticmethod
+    async def _write(writer, response, keep_alive):
+        status = HTTPStatus(response.status)
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        head.extend(f"{name}: {value}" for name, value in response.headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+        await writer.drain()
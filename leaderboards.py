@@ -0,0 +1,166 @@
+"""Group leaderboards: members of a group chat ranked by streak, then 7-day completion.
+
+A member's Standing is what their score is derived from: their latest run
+of active days and how many goals they completed on each of the last 7
+days, as ordinals in the member's own timezone. It doesn't depend on the
+date it's read on, so a standing reported yesterday still scores correctly
+today, as long as it's scored against the member's own date.
+
+Members of a group can be in different zones, so a board is ranked for a
+set of dates, one per zone on it ({zone name: today's ordinal there}).
+Each group keeps its members' sort keys in a sorted list for those dates.
+Check-in toggles replace a member's key (a bisect and an insert), a query
+for the top K is a slice, and the first query after midnight in any of the
+zones re-sorts the group once, since streaks end and the 7-day window
+moves at midnight.
+"""
+from collections import Counter
+from bisect import bisect_left, insort
+
+WEEK = 7
+
+
+class Standing:
+    __slots__ = ("goals", "run_start", "run_end", "recent_end", "recent", "zone")
+
+    def __init__(self, goals, run_start, run_end, recent_end, recent, zone=None):
+        self.goals = goals
+        self.run_start = run_start  # latest run of active days, as ordinals (None if none)
+        self.run_end = run_end
+        self.recent_end = recent_end  # ordinal of the last day in `recent`
+        self.recent = tuple(recent)  # goals completed on each of the WEEK days up to recent_end
+        self.zone = zone  # the member's timezone name (None for the default), whose days these are
+
+    @classmethod
+    def from_stats(cls, stats, goals, today, zone=None):
+        """Standing from a user's UserStats on the `today` ordinal (their date in `zone`)"""
+        run = stats.latest_run()
+        start, end = run if run is not None else (None, None)
+        return cls(goals, start, end, today, stats.done_counts(today - WEEK + 1, today), zone)
+
+    def to_list(self):
+        return [self.goals, self.run_start, self.run_end, self.recent_end, list(self.recent), self.zone]
+
+    @classmethod
+    def from_list(cls, data):
+        return cls(*data)
+
+    def streak(self, today):
+        """Length of the latest run if it includes today (0 until something is done today, as in /progress)"""
+        if self.run_end is None or self.run_end < today:
+            return 0
+        return self.run_end - self.run_start + 1
+
+    def week_done(self, today):
+        """Goals completed over the WEEK days ending today"""
+        shift = max(today - self.recent_end, 0)
+        return sum(self.recent[shift:]) if shift < WEEK else 0
+
+    def week_percent(self, today):
+        possible = self.goals * WEEK
+        return min(100, self.week_done(today) * 100 // possible) if possible else 0
+
+
+def sort_key(user_id, name, standing, today):
+    return (-standing.streak(today), -standing.week_percent(today), name.casefold(), user_id)
+
+
+class GroupBoard:
+    """One group's members, sorted by their scores on `days` (each member's date in their zone)"""
+
+    def __init__(self):
+        self.members = {}  # user_id -> (name, Standing)
+        self.days = None  # zone name -> ordinal the ranking is for
+        self._zones = Counter()  # zone name -> members in it
+        self._ranking = []  # sorted sort keys; the last item is the user_id
+        self._keys = {}  # user_id -> its key in _ranking
+
+    def zones(self):
+        """The zone names (None for the default) of the members, to work out `days` for"""
+        return list(self._zones)
+
+    def _sort(self, days):
+        self.days = days
+        self._keys = {
+            user_id: sort_key(user_id, name, standing, days[standing.zone])
+            for user_id, (name, standing) in self.members.items()
+        }
+        self._ranking = sorted(self._keys.values())
+
+    def _unrank(self, user_id):
+        key = self._keys.pop(user_id, None)
+        if key is not None:
+            del self._ranking[bisect_left(self._ranking, key)]
+
+    def put(self, user_id, name, standing):
+        self.remove(user_id)
+        self.members[user_id] = (name, standing)
+        self._zones[standing.zone] += 1
+        if self.days is None:
+            return
+        if standing.zone not in self.days:
+            # A zone the ranking has no date for; sort again on the next query
+            self.days = None
+            return
+        key = sort_key(user_id, name, standing, self.days[standing.zone])
+        self._keys[user_id] = key
+        insort(self._ranking, key)
+
+    def remove(self, user_id):
+        self._unrank(user_id)
+        member = self.members.pop(user_id, None)
+        if member is not None:
+            zone = member[1].zone
+            self._zones[zone] -= 1
+            if not self._zones[zone]:
+                del self._zones[zone]
+
+    def top(self, days, k):
+        """(user_id, name, Standing) of the first k members"""
+        if self.days != days:
+            self._sort(days)
+        return [(key[-1], *self.members[key[-1]]) for key in self._ranking[:k]]
+
+    def rank(self, user_id, days):
+        """1-based position of a member, or None"""
+        if self.days != days:
+            self._sort(days)
+        key = self._keys.get(user_id)
+        return bisect_left(self._ranking, key) + 1 if key is not None else None
+
+    def __len__(self):
+        return len(self.members)
+
+
+class Leaderboards:
+    """Every group's board, and which groups each user is on"""
+
+    def __init__(self):
+        self._boards = {}  # group chat id -> GroupBoard
+        self._groups = {}  # user_id -> set of group chat ids
+
+    def set_standing(self, user_id, groups, standing):
+        """Put a user on the boards of `groups` ({chat id: name shown}) and off any others"""
+        user_id = str(user_id)
+        groups = {str(chat_id): name for chat_id, name in groups.items()}
+        for chat_id in self._groups.get(user_id, set()) - groups.keys():
+            board = self._boards[chat_id]
+            board.remove(user_id)
+            if not board:
+                del self._boards[chat_id]
+        for chat_id, name in groups.items():
+            board = self._boards.get(chat_id)
+            if board is None:
+                board = self._boards[chat_id] = GroupBoard()
+            board.put(user_id, name, standing)
+        if groups:
+            self._groups[user_id] = set(groups)
+        else:
+            self._groups.pop(user_id, None)
+
+    def board(self, chat_id):
+        """A group's GroupBoard, or None if nobody has joined it"""
+        return self._boards.get(str(chat_id))
+
+    def __len__(self):
+        return len(self._boards)
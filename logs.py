@@ -0,0 +1,122 @@
+"""Logging that stays off the event loop.
+
+setup() puts a single QueueHandler on the root logger. A record is built and
+queued on the calling thread, and everything else happens on a QueueListener
+thread: %-formatting of the message (so call sites pass arguments rather
+than f-strings), the formatter, and the write to stderr. Caller, thread and
+process details aren't collected. Output is the usual
+text line or one JSON object per line (LOG_FORMAT=json).
+
+Per-event INFO/DEBUG lines (a send, a tap, a reload) are rate limited per
+call site: each message template gets `burst` lines per `interval` seconds
+and the rest are counted, not queued; the next line that gets through
+reports how many were suppressed. Warnings and errors are never limited.
+"""
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "suppressed"}
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets `burst` records per message template through every `interval` seconds, below WARNING"""
+
+    def __init__(self, burst=20, interval=10.0, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        self._windows = {}  # (logger name, template) -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = self.clock()
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = [now, 0, 0]
+        elif now - window[0] >= self.interval:
+            window[0], window[1] = now, 0
+        if window[1] >= self.burst:
+            window[2] += 1
+            return False
+        window[1] += 1
+        if window[2]:
+            record.suppressed, window[2] = window[2], 0
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock prepare() merges the arguments into the message on the
+    calling thread; here the record is queued as it is. Arguments are
+    formatted a moment later, so they should not be mutated after logging.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; `extra` fields are included as keys"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup(level=logging.INFO, fmt="text", burst=20, interval=10.0, stream=None):
+    """Route all logging through a queue to a listener thread; returns the listener.
+
+    The listener is stopped (and the queue drained) at exit.
+    """
+    # Record fields neither format uses; skipping them makes each record
+    # cheaper to build (see "Optimization" in the logging HOWTO)
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(RateLimitFilter(burst, interval))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
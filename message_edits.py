@@ -0,0 +1,117 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from telegram.error import RetryAfter, BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class TrackedMessage:
+    __slots__ = ("state", "last_edit", "task", "render")
+
+    def __init__(self):
+        self.state = None
+        self.last_edit = float("-inf")
+        self.task = None
+        self.render = None
+
+
+class MessageEditor:
+    """Throttled, diff-aware edits of messages whose content follows user data.
+
+    A view is described by render(), which returns (state, text, reply_markup)
+    where state is any comparable summary of what the message shows. The
+    editor remembers the state last shown in each message and skips edits
+    that wouldn't change it. The first request for an idle message is edited
+    right away; requests within `interval` seconds of the last edit are
+    merged into one edit at the end of the window, rendered from the data as
+    it is by then.
+
+    The most recent max_tracked messages are remembered.
+    """
+
+    def __init__(self, bot, interval=1.0, max_tracked=10000):
+        self.bot = bot
+        self.interval = interval
+        self.max_tracked = max_tracked
+        self._messages = OrderedDict()  # (chat_id, message_id) -> TrackedMessage
+        self.edits_sent = 0
+        self.edits_skipped = 0  # nothing changed since the last edit
+        self.requests_merged = 0  # folded into an edit that was already scheduled
+
+    def _tracked(self, key):
+        tracked = self._messages.get(key)
+        if tracked is None:
+            tracked = self._messages[key] = TrackedMessage()
+            while len(self._messages) > self.max_tracked:
+                oldest_key, oldest = next(iter(self._messages.items()))
+                if oldest.task is not None:
+                    break
+                del self._messages[oldest_key]
+        else:
+            self._messages.move_to_end(key)
+        return tracked
+
+    def shown(self, chat_id, message_id, state):
+        """Record what a freshly sent message shows"""
+        self._tracked((chat_id, message_id)).state = state
+
+    async def request(self, chat_id, message_id, render):
+        """Bring a message up to date with render(), now or at the end of the current window"""
+        key = (chat_id, message_id)
+        tracked = self._tracked(key)
+        tracked.render = render
+        if tracked.task is not None:
+            self.requests_merged += 1
+            return
+        delay = tracked.last_edit + self.interval - time.monotonic()
+        if delay <= 0:
+            await self._edit(key, tracked)
+        else:
+            tracked.task = asyncio.get_running_loop().create_task(self._edit_later(key, tracked, delay))
+
+    def forget(self, chat_id, message_id):
+        """Drop a message (e.g. replaced by other content); cancels any scheduled edit"""
+        tracked = self._messages.pop((chat_id, message_id), None)
+        if tracked is not None and tracked.task is not None:
+            tracked.task.cancel()
+
+    async def _edit_later(self, key, tracked, delay):
+        await asyncio.sleep(delay)
+        tracked.task = None
+        await self._edit(key, tracked)
+
+    async def _edit(self, key, tracked):
+        state, text, reply_markup = tracked.render()
+        if state == tracked.state:
+            self.edits_skipped += 1
+            return
+        tracked.last_edit = time.monotonic()
+        chat_id, message_id = key
+        try:
+            await self.bot.edit_message_text(
+                text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup
+            )
+        except RetryAfter as e:
+            logger.warning("⏳ Rate limited editing %s, retrying in %ss", key, e.retry_after)
+            tracked.task = asyncio.get_running_loop().create_task(self._edit_later(key, tracked, e.retry_after))
+            return
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning("❌ Could not edit message %s: %s", key, e)
+                return
+        except Exception as e:
+            logger.error("❌ Could not edit message %s: %s", key, e)
+            return
+        tracked.state = state
+        self.edits_sent += 1
+
+    async def close(self):
+        """Send edits that are still waiting for their window"""
+        pending = [(key, tracked) for key, tracked in self._messages.items() if tracked.task is not None]
+        for key, tracked in pending:
+            tracked.task.cancel()
+            tracked.task = None
+        for key, tracked in pending:
+            await self._edit(key, tracked)
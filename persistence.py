@@ -0,0 +1,219 @@
+"""Conversation states and context.user_data kept across restarts.
+
+PTB hands a persistence every changed conversation state and the
+user_data of every user who sent an update, once per update_interval.
+SqlitePersistence writes what actually changed in each round in one
+transaction, as JSON rows: one per conversation in progress and one per
+user with non-empty user_data (deleted once the data is empty again).
+
+Conversation states are loaded at startup, but only users in the middle
+of a conversation have one. user_data is loaded per user, the first time
+a handler runs for them; startup only reads which users have a row. Rows
+not touched for max_age seconds are dropped on startup.
+
+Every process of a multi-process run shares the one file (SQLite's locks
+keep their writes apart), so a change in WORKERS doesn't strand anyone's
+conversation on another shard.
+"""
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+"""
+
+
+class SqlitePersistence(BasePersistence):
+    """Persistence for ConversationHandler states and user_data (no chat, bot or callback data)"""
+
+    def __init__(self, path, update_interval=10.0, max_age=7 * 86400):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.path = path
+        self.max_age = max_age
+        self._conn = None
+        self._rows = {}  # user_id -> JSON of their user_data row ("" until it's read)
+        self._loaded = set()  # users whose user_data is live in the application
+        self._users = {}  # user_id -> JSON to write (None deletes the row)
+        self._states = {}  # (name, key) -> state to write (None deletes the row)
+        self._writing = None  # task writing the queued changes
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(PERSISTENCE_SCHEMA)
+            if self.max_age:
+                cutoff = time.time() - self.max_age
+                with conn:
+                    conn.execute("DELETE FROM user_data WHERE updated < ?", (cutoff,))
+                    conn.execute("DELETE FROM conversations WHERE updated < ?", (cutoff,))
+            self._conn = conn
+        return self._conn
+
+    def _stored_user_ids(self):
+        return {user_id for user_id, in self._connect().execute("SELECT user_id FROM user_data")}
+
+    def _read_user(self, user_id):
+        row = self._connect().execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def _read_conversations(self, name):
+        rows = self._connect().execute("SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    def _write_sync(self, users, states):
+        now = time.time()
+        with self._connect() as conn:
+            for user_id, data in users.items():
+                if data is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO user_data (user_id, data, updated) VALUES (?, ?, ?)",
+                        (user_id, data, now)
+                    )
+                else:
+                    conn.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+            for (name, key), state in states.items():
+                if state is None:
+                    conn.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, key))
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO conversations (name, key, state, updated) VALUES (?, ?, ?, ?)",
+                        (name, key, json.dumps(state), now)
+                    )
+
+    def _queue_write(self):
+        if self._writing is None or self._writing.done():
+            self._writing = asyncio.get_running_loop().create_task(self._write_queued())
+
+    async def _write_queued(self):
+        # Runs after the rest of this round of update_*() calls has queued its changes
+        await asyncio.sleep(0)
+        users, self._users = self._users, {}
+        states, self._states = self._states, {}
+        if not users and not states:
+            return
+        try:
+            await asyncio.to_thread(self._write_sync, users, states)
+            logger.debug("💾 Saved conversation data for %s users and %s conversations", len(users), len(states))
+        except (sqlite3.Error, OSError) as e:
+            logger.error("❌ Failed to save conversation data: %s", e)
+            # Keep anything newer that was queued meanwhile; retried on the next round
+            self._users = {**users, **self._users}
+            self._states = {**states, **self._states}
+
+    # === Loading ===
+
+    async def get_user_data(self):
+        """Only which users have stored data; refresh_user_data() reads each one's when first needed"""
+        self._rows = dict.fromkeys(await asyncio.to_thread(self._stored_user_ids), "")
+        if self._rows:
+            logger.info("💬 %s users have conversation data to pick up", len(self._rows))
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        if user_id in self._loaded:
+            return
+        self._loaded.add(user_id)
+        if self._rows.get(user_id) != "":
+            return
+        stored = await asyncio.to_thread(self._read_user, user_id)
+        if stored is None:
+            del self._rows[user_id]
+            return
+        self._rows[user_id] = stored
+        for key, value in json.loads(stored).items():
+            user_data.setdefault(key, value)
+
+    async def get_conversations(self, name):
+        conversations = await asyncio.to_thread(self._read_conversations, name)
+        if conversations:
+            logger.info("💬 Resuming %s '%s' conversations", len(conversations), name)
+        return conversations
+
+    # === Saving ===
+
+    async def update_user_data(self, user_id, data):
+        # Data of a user whose stored row was never read would overwrite it with a blank
+        if user_id not in self._loaded:
+            return
+        data = json.dumps(data) if data else None
+        if data == self._rows.get(user_id):
+            return
+        if data is None:
+            del self._rows[user_id]
+        else:
+            self._rows[user_id] = data
+        self._users[user_id] = data
+        self._queue_write()
+
+    async def drop_user_data(self, user_id):
+        self._loaded.add(user_id)
+        if self._rows.pop(user_id, None) is not None:
+            self._users[user_id] = None
+            self._queue_write()
+
+    async def update_conversation(self, name, key, new_state):
+        self._states[(name, json.dumps(list(key)))] = new_state
+        self._queue_write()
+
+    async def flush(self):
+        """Write whatever is queued and close the database"""
+        if self._writing is not None:
+            await self._writing
+        if self._users or self._states:
+            self._writing = None
+            self._queue_write()
+            await self._writing
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+    # === Not stored ===
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
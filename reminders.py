@@ -0,0 +1,393 @@
+import heapq
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from metrics import Counter, Histogram
+from timezones import utc_offset_minutes, next_transition, local_run, format_offset
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+REMINDERS_CAUGHT_UP = Counter("bot_reminders_caught_up_total", "Reminders sent after their minute had passed")
+REMINDERS_MISSED = Counter("bot_reminders_missed_total", "Reminders dropped because they were past the catch-up window")
+REMINDER_LAG_SECONDS = Histogram(
+    "bot_reminder_lag_seconds", "Time from a reminder's scheduled minute to its message being sent",
+    buckets=(0.5, 1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+
+
+def minute_of_day(hour, minute):
+    """Bucket index for a HH:MM time"""
+    return hour * 60 + minute
+
+
+def parse_time(time_str):
+    """'HH:MM' -> minute of day"""
+    hour, minute = map(int, time_str.split(":"))
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError("Time out of range")
+    return minute_of_day(hour, minute)
+
+
+class ReminderWheel:
+    """Daily reminders bucketed by minute of day.
+
+    Each reminder has a key (user_id, goal) and a payload handed back to
+    the dispatcher when its minute comes round. add(), remove() and
+    minute_for() are O(1), and keys_for()/remove_all() are O(that user's
+    reminders); tick() is meant to run once a minute and hands the whole
+    bucket for that minute to dispatch(due, payloads) in one call, where due
+    is the aware datetime of the minute the reminders were scheduled for.
+
+    Minutes the tick didn't run for (an event-loop stall, or downtime since
+    the tick passed to resume()) are caught up: their reminders are sent late
+    if they are at most catch_up_minutes old, oldest first and no more than
+    catch_up_limit per minute on top of the current bucket. Whatever doesn't
+    fit waits for the next tick; whatever ages out of the window is dropped
+    and counted as missed.
+
+    Reminders can be loaded while the wheel is already ticking: between
+    begin_loading() and end_loading(), add_loaded() notices reminders whose
+    minute was ticked (or caught up) before they arrived and dispatch_late()
+    sends them under the same policy.
+
+    A reminder added with a zone fires at its minute of the day in that
+    zone. The wheel should then tick in UTC: the reminder is bucketed at the
+    zone's current UTC offset, and when a zone's offset changes (DST) all of
+    its reminders move to their new buckets in one go on the next tick, so
+    the per-minute cost doesn't depend on how many zones there are.
+    """
+
+    def __init__(self, timezone, dispatch, catch_up_minutes=60, catch_up_limit=1500):
+        self.timezone = timezone
+        self.dispatch = dispatch
+        # A full day back would reach the current minute's bucket again
+        self.catch_up_minutes = min(catch_up_minutes, MINUTES_PER_DAY - 1)
+        self.catch_up_limit = catch_up_limit
+        self._buckets = [dict() for _ in range(MINUTES_PER_DAY)]
+        self._minute_of = {}  # key -> minute
+        self._user_keys = {}  # key[0] -> tuple of that user's keys (users have a handful at most)
+        self._last_tick = None  # due datetime of the last minute ticked
+        self._loading = False
+        self._ticked_while_loading = {}  # minute -> due datetime it was ticked for
+        self._overdue = []  # (due, payload) waiting to be caught up
+        self._budget = catch_up_limit  # overdue reminders that may still go out this minute
+        self._local = {}  # key -> (zone, local minute) for reminders added with a zone
+        self._zones = {}  # zone -> keys of its reminders
+        self._offsets = {}  # zone -> UTC offset in minutes its reminders are bucketed at
+        self._transitions = []  # heap of (next offset change, zone name, zone)
+
+    @property
+    def last_tick(self):
+        return self._last_tick
+
+    def resume(self, last_tick):
+        """Catch up from a tick before a restart; call before the first tick()"""
+        if last_tick is not None and self._last_tick is None:
+            self._last_tick = last_tick.astimezone(self.timezone).replace(second=0, microsecond=0)
+
+    def add(self, key, minute, payload, zone=None):
+        """Schedule (or move) a reminder at a minute of the day in `zone` (in the wheel's timezone if None)"""
+        self.remove(key)
+        if zone is not None:
+            self._local[key] = (zone, minute)
+            self._zones.setdefault(zone, set()).add(key)
+            minute = (minute - self._offset(zone)) % MINUTES_PER_DAY
+        self._buckets[minute][key] = payload
+        self._minute_of[key] = minute
+        keys = self._user_keys.get(key[0])
+        self._user_keys[key[0]] = (key,) if keys is None else keys + (key,)
+
+    def add_loaded(self, key, minute, payload, zone=None):
+        """add() for the startup load; remembers reminders whose minute already passed during loading"""
+        self.add(key, minute, payload, zone)
+        minute = self._minute_of[key]
+        if self._loading:
+            due = self._ticked_while_loading.get(minute)
+            if due is not None:
+                self._overdue.append((due, payload))
+
+    def begin_loading(self):
+        self._loading = True
+        self._ticked_while_loading = {}
+
+    async def dispatch_late(self):
+        """Send reminders whose minute has passed, as far as the catch-up window and limit allow"""
+        if not self._overdue:
+            return
+        now = self._last_tick or self._current_minute()
+        self._overdue.sort(key=lambda item: item[0])
+        oldest = self.timezone.normalize(now - timedelta(minutes=self.catch_up_minutes))
+        fresh = [item for item in self._overdue if item[0] >= oldest]
+        expired = len(self._overdue) - len(fresh)
+        if expired:
+            REMINDERS_MISSED.inc(expired)
+            logger.warning("⚠️ Dropped %s reminders more than %s min late", expired, self.catch_up_minutes)
+        budget = max(self._budget, 0)
+        late, self._overdue = fresh[:budget], fresh[budget:]
+        self._budget -= len(late)
+        if not late:
+            return
+        logger.info("⏰ Sending %s reminders that came due while they couldn't be sent", len(late))
+        if self._overdue:
+            logger.info("⏳ %s more late reminders deferred to the next minute", len(self._overdue))
+        REMINDERS_CAUGHT_UP.inc(len(late))
+        batch_due, batch = late[0][0], []
+        for due, payload in late:
+            if due != batch_due:
+                await self.dispatch(batch_due, batch)
+                batch_due, batch = due, []
+            batch.append(payload)
+        await self.dispatch(batch_due, batch)
+
+    async def end_loading(self):
+        await self.dispatch_late()
+        self._loading = False
+        self._ticked_while_loading = {}
+
+    def remove(self, key):
+        """Unschedule a reminder; returns False if it wasn't scheduled"""
+        minute = self._minute_of.pop(key, None)
+        if minute is None:
+            return False
+        del self._buckets[minute][key]
+        keys = self._user_keys.pop(key[0])
+        if len(keys) > 1:
+            self._user_keys[key[0]] = tuple(other for other in keys if other != key)
+        local = self._local.pop(key, None)
+        if local is not None:
+            keys = self._zones[local[0]]
+            keys.discard(key)
+            if not keys:
+                del self._zones[local[0]]
+        return True
+
+    def remove_all(self, user):
+        """Unschedule every reminder whose key starts with `user`; returns their keys"""
+        keys = self._user_keys.get(user, ())
+        for key in keys:
+            self.remove(key)
+        return list(keys)
+
+    def keys_for(self, user):
+        """Keys of the reminders scheduled for `user` (key[0])"""
+        return list(self._user_keys.get(user, ()))
+
+    def minute_for(self, key):
+        """Minute of day a reminder fires at, in the wheel's timezone, or None"""
+        return self._minute_of.get(key)
+
+    def next_run(self, key, now=None):
+        """Next datetime a reminder fires at (in its own zone, if it was added with one), or None"""
+        minute = self._minute_of.get(key)
+        if minute is None:
+            return None
+        now = now or datetime.now(self.timezone)
+        local = self._local.get(key)
+        if local is not None:
+            return local_run(*local, now)
+        run = now.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+        if run <= now:
+            run = self.timezone.normalize(run + timedelta(days=1))
+        return run
+
+    def __len__(self):
+        return len(self._minute_of)
+
+    def __contains__(self, key):
+        return key in self._minute_of
+
+    def _current_minute(self):
+        return datetime.now(self.timezone).replace(second=0, microsecond=0)
+
+    def _offset(self, zone):
+        """UTC offset a zone's reminders are bucketed at; a zone seen for the first time starts being tracked"""
+        offset = self._offsets.get(zone)
+        if offset is None:
+            now = self._last_tick or self._current_minute()
+            offset = self._offsets[zone] = utc_offset_minutes(zone, now)
+            self._watch(zone, now)
+        return offset
+
+    def _watch(self, zone, now):
+        transition = next_transition(zone, now)
+        if transition is not None:
+            heapq.heappush(self._transitions, (transition, zone.zone, zone))
+
+    def _apply_transitions(self, current):
+        """Move the reminders of every zone whose UTC offset has changed by `current` to their new buckets"""
+        while self._transitions and self._transitions[0][0] <= current:
+            _, _, zone = heapq.heappop(self._transitions)
+            offset = utc_offset_minutes(zone, current)
+            shift = offset - self._offsets[zone]
+            self._offsets[zone] = offset
+            self._watch(zone, current)
+            keys = self._zones.get(zone, ())
+            if not shift or not keys:
+                continue
+            for key in keys:
+                minute = self._minute_of[key]
+                moved = (minute - shift) % MINUTES_PER_DAY
+                self._buckets[moved][key] = self._buckets[minute].pop(key)
+                self._minute_of[key] = moved
+            logger.info(
+                "🕰️ %s is now %s; moved its %s reminders by %+d min", zone.zone, format_offset(offset), len(keys), -shift
+            )
+
+    def _skipped_minutes(self, current):
+        """Due datetimes of the minutes between the last tick and current that are still worth catching up"""
+        if self._last_tick is None:
+            return []
+        skipped = int((current - self._last_tick).total_seconds() // 60) - 1
+        if skipped <= 0:
+            return []
+        window = min(skipped, self.catch_up_minutes)
+        if skipped > window:
+            # Only reminders already on the wheel can be counted
+            lost = sum(
+                len(self._buckets[(minute_of_day(current.hour, current.minute) - back) % MINUTES_PER_DAY])
+                for back in range(window + 1, min(skipped, MINUTES_PER_DAY - 1) + 1)
+            )
+            if lost:
+                REMINDERS_MISSED.inc(lost)
+            logger.warning("⚠️ Reminder tick skipped %s minutes; %s reminders are past catch-up", skipped, lost)
+        return [self.timezone.normalize(current - timedelta(minutes=back)) for back in range(window, 0, -1)]
+
+    async def tick(self):
+        """Dispatch the bucket for the current minute (once per minute) and catch up on missed ones"""
+        current = self._current_minute()
+        if self._last_tick is not None and current <= self._last_tick:
+            return
+        self._apply_transitions(current)
+        skipped = self._skipped_minutes(current)
+        self._last_tick = current
+        self._budget = self.catch_up_limit
+        for due in skipped:
+            minute = minute_of_day(due.hour, due.minute)
+            if self._loading:
+                self._ticked_while_loading[minute] = due
+            self._overdue.extend((due, payload) for payload in self._buckets[minute].values())
+        minute = minute_of_day(current.hour, current.minute)
+        if self._loading:
+            self._ticked_while_loading[minute] = current
+        bucket = self._buckets[minute]
+        if bucket:
+            payloads = list(bucket.values())
+            logger.info("🔔 Dispatching %s reminders for %02d:%02d", len(payloads), current.hour, current.minute)
+            await self.dispatch(current, payloads)
+        await self.dispatch_late()
+
+
+class CompletedGoals:
+    """Reminder keys whose goal is already done on the user's current day.
+
+    Each entry holds the timestamp that day ends at in the user's zone, so
+    the check at dispatch time is a dict lookup and a comparison whatever
+    zone the user is in. An entry read after its day is over is dropped.
+    """
+
+    def __init__(self):
+        self._until = {}  # key -> end of the day the goal was done on (timestamp)
+
+    def set(self, key, until):
+        """The goal is done until `until`, or not done if None"""
+        if until is None:
+            self._until.pop(key, None)
+        else:
+            self._until[key] = until
+
+    def done(self, key, now):
+        """Whether the goal is done at the timestamp `now`"""
+        until = self._until.get(key)
+        if until is None:
+            return False
+        if now < until:
+            return True
+        del self._until[key]
+        return False
+
+    def __len__(self):
+        return len(self._until)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class MinuteDelivery:
+    __slots__ = ("pending", "lags", "failed")
+
+    def __init__(self):
+        self.pending = 0
+        self.lags = []  # seconds from due to sent, one per reminder
+        self.failed = 0
+
+    def summary(self):
+        """Counts and lag percentiles for one due minute"""
+        lags = sorted(self.lags)
+        result = {"sent": len(lags), "failed": self.failed, "pending": self.pending}
+        if lags:
+            result.update(p50=percentile(lags, 0.5), p95=percentile(lags, 0.95), max=lags[-1])
+        return result
+
+
+class DeliveryLag:
+    """How late reminders went out, grouped by the minute they were due.
+
+    dispatch code calls expect() with the reminders it hands to the send
+    queue, and done() as each message is sent or given up on. Once every
+    reminder for a minute is accounted for its lag percentiles are logged,
+    with a warning if p95 is over the `slo` in seconds. The last `keep`
+    minutes stay available to recent().
+    """
+
+    def __init__(self, slo=60.0, keep=60):
+        self.slo = slo
+        self.keep = keep
+        self._minutes = OrderedDict()  # due datetime -> MinuteDelivery
+
+    def expect(self, due, count):
+        delivery = self._minutes.get(due)
+        if delivery is None:
+            delivery = self._minutes[due] = MinuteDelivery()
+            while len(self._minutes) > self.keep:
+                self._minutes.popitem(last=False)
+        delivery.pending += count
+
+    def done(self, due, count, sent, sent_at=None):
+        """count reminders for due were sent (at sent_at, default now) or failed"""
+        if sent:
+            lag = max(0.0, (sent_at or datetime.now(due.tzinfo)).timestamp() - due.timestamp())
+            for _ in range(count):
+                REMINDER_LAG_SECONDS.observe(lag)
+        delivery = self._minutes.get(due)
+        if delivery is None:
+            return  # too old to still be tracked
+        delivery.pending -= count
+        if sent:
+            delivery.lags.extend([lag] * count)
+        else:
+            delivery.failed += count
+        if delivery.pending <= 0:
+            self._report(due, delivery.summary())
+
+    def _report(self, due, summary):
+        if not summary["sent"]:
+            logger.warning("⏱️ Reminders due %02d:%02d: all %s failed", due.hour, due.minute, summary["failed"])
+            return
+        template = "⏱️ Reminders due %02d:%02d: %s sent, %s failed, lag p50 %.1fs p95 %.1fs max %.1fs"
+        args = (
+            due.hour, due.minute, summary["sent"], summary["failed"], summary["p50"], summary["p95"], summary["max"]
+        )
+        if summary["p95"] > self.slo:
+            logger.warning(template + " (over the %gs SLO)", *args, self.slo)
+        else:
+            logger.info(template, *args)
+
+    def recent(self, minutes=5):
+        """(due, summary) for the most recent due minutes, newest first"""
+        items = sorted(self._minutes.items(), key=lambda item: item[0])[-minutes:]
+        return [(due, delivery.summary()) for due, delivery in reversed(items)]
@@ -0,0 +1,217 @@
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import deque
+from telegram.error import RetryAfter, BadRequest, TimedOut, NetworkError
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# result: sent, retried (another attempt queued), failed (not retried or out of attempts), dropped (shutdown)
+MESSAGES = Counter("bot_send_queue_messages_total", "Outgoing queued messages by outcome", ("result",))
+SENT = MESSAGES.labels("sent")
+RETRIED = MESSAGES.labels("retried")
+FAILED = MESSAGES.labels("failed")
+DROPPED = MESSAGES.labels("dropped")
+
+
+class TokenBucket:
+    """Allows `rate` events per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = None
+
+    def _refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class OutgoingMessage:
+    __slots__ = ("chat_id", "text", "kwargs", "attempts", "not_before", "on_done")
+
+    def __init__(self, chat_id, text, kwargs, on_done=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class SendQueue:
+    """Outbound message queue that stays inside Telegram's rate limits.
+
+    Messages wait in per-chat FIFOs. The dispatcher releases at most
+    global_rate messages per second overall and per_chat_rate per chat,
+    keeps up to max_in_flight requests open, and retries a message up to
+    max_retries times: after the server's RetryAfter delay (which also pauses
+    the whole queue) or with exponential backoff on network errors.
+    Other Telegram errors (blocked bot, bad chat) are not retried.
+    """
+
+    def __init__(self, bot, global_rate=25.0, per_chat_rate=1.0, max_retries=3, max_in_flight=30):
+        self.bot = bot
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, capacity=1)
+        self._chat_interval = 1.0 / per_chat_rate
+        self._pending = {}  # chat_id -> deque of OutgoingMessage
+        self._ready = []  # heap of (ready_at, seq, chat_id), one entry per chat in _pending
+        self._chat_next = {}  # chat_id -> earliest time the next message may go out
+        self._paused_until = 0.0
+        self._seq = itertools.count()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._in_flight = set()
+
+    def __len__(self):
+        return sum(len(messages) for messages in self._pending.values())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, chat_id, text, on_done=None, **kwargs):
+        """Queue a message for sending; on_done(sent) is called once it is sent or given up on"""
+        self._enqueue(OutgoingMessage(chat_id, text, kwargs, on_done))
+
+    def _enqueue(self, message, front=False):
+        messages = self._pending.get(message.chat_id)
+        if messages is None:
+            messages = self._pending[message.chat_id] = deque()
+            loop_time = asyncio.get_running_loop().time()
+            ready_at = max(self._chat_next.get(message.chat_id, 0.0), message.not_before, loop_time)
+            heapq.heappush(self._ready, (ready_at, next(self._seq), message.chat_id))
+        if front:
+            messages.appendleft(message)
+        else:
+            messages.append(message)
+        self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            try:
+                message = await self._next_message(loop)
+            except BaseException:
+                self._slots.release()
+                raise
+            task = loop.create_task(self._send(message))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _next_message(self, loop):
+        """Wait until some chat may send and both rate limits allow it, then take its next message"""
+        while True:
+            self._wakeup.clear()
+            if not self._ready:
+                await self._wakeup.wait()
+                continue
+            ready_at, _, chat_id = self._ready[0]
+            head = self._pending[chat_id][0]
+            if head.not_before > ready_at:
+                # A retry is waiting on its own backoff; re-slot the chat
+                heapq.heapreplace(self._ready, (head.not_before, next(self._seq), chat_id))
+                continue
+            now = loop.time()
+            delay = max(ready_at - now, self._paused_until - now, self._global.wait_time(now))
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._ready)
+            messages = self._pending[chat_id]
+            message = messages.popleft()
+            self._global.take(now)
+            self._chat_next[chat_id] = now + self._chat_interval
+            if messages:
+                heapq.heappush(self._ready, (now + self._chat_interval, next(self._seq), chat_id))
+            else:
+                del self._pending[chat_id]
+            self._forget_idle_chats(now)
+            return message
+
+    def _forget_idle_chats(self, now):
+        # Per-chat timestamps only matter while they are in the future
+        if len(self._chat_next) > 4 * (len(self._pending) + 1024):
+            self._chat_next = {c: t for c, t in self._chat_next.items() if t > now or c in self._pending}
+
+    async def _send(self, message):
+        loop = asyncio.get_running_loop()
+        try:
+            message.attempts += 1
+            await self.bot.send_message(chat_id=message.chat_id, text=message.text, **message.kwargs)
+            SENT.inc()
+            logger.info("✅ Message sent to chat %s", message.chat_id)
+            self._finish(message, True)
+        except RetryAfter as e:
+            retry_after = float(e.retry_after)
+            self._paused_until = max(self._paused_until, loop.time() + retry_after)
+            self._retry(message, retry_after, e)
+        except BadRequest as e:
+            FAILED.inc()
+            logger.error("❌ Error sending message to chat %s: %s", message.chat_id, e)
+            self._finish(message, False)
+        except (TimedOut, NetworkError) as e:
+            self._retry(message, 2 ** message.attempts, e)
+        except Exception as e:
+            FAILED.inc()
+            logger.error("❌ Error sending message to chat %s: %s", message.chat_id, e)
+            self._finish(message, False)
+        finally:
+            self._slots.release()
+
+    def _retry(self, message, delay, error):
+        if message.attempts > self.max_retries:
+            FAILED.inc()
+            logger.error("❌ Giving up on chat %s after %s attempts: %s", message.chat_id, message.attempts, error)
+            self._finish(message, False)
+            return
+        logger.warning("⏳ Retrying chat %s in %.1fs: %s", message.chat_id, delay, error)
+        RETRIED.inc()
+        message.not_before = asyncio.get_running_loop().time() + delay
+        self._enqueue(message, front=True)
+
+    @staticmethod
+    def _finish(message, sent):
+        if message.on_done is not None:
+            try:
+                message.on_done(sent)
+            except Exception as e:
+                logger.error("❌ Error in send callback for chat %s: %s", message.chat_id, e)
+
+    async def close(self):
+        """Stop sending; anything still queued is dropped"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        dropped = len(self)
+        if dropped:
+            DROPPED.inc(dropped)
+            logger.warning("⚠️ Dropping %s unsent messages on shutdown", dropped)
+            for messages in self._pending.values():
+                for message in messages:
+                    self._finish(message, False)
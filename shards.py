@@ -0,0 +1,241 @@
+"""Multi-process mode: user-sharded worker processes under one leader.
+
+With WORKERS > 1 the process started by the platform becomes the leader. It
+receives updates (polling or webhook) and routes each one to the worker that
+owns the sender's shard, and it is the only process that schedules and sends
+reminders. Each worker owns the data files of its shard, runs the handlers,
+and reports reminder, check-in and leaderboard changes back to the leader,
+which also answers /leaderboard, as a group's members can be on any shard.
+
+Leader and workers talk over a socketpair per worker, with length-prefixed
+JSON frames, so the whole setup runs on one machine without extra services.
+"""
+import os
+import sys
+import json
+import zlib
+import socket
+import asyncio
+import logging
+from reminders import ReminderWheel
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = 4
+MAX_FRAME = 64 << 20
+
+
+def shard_of(user_id, shards):
+    """Shard index for a user; stable across processes and restarts"""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+def shard_path(path, index, shards):
+    """'goals.json' -> 'goals.2-of-4.json' (the suffix stays last); one shard uses the path itself"""
+    if shards == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{index}-of-{shards}{ext}"
+
+
+class Channel:
+    """Length-prefixed JSON messages over a stream socket"""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(cls, sock):
+        reader, writer = await asyncio.open_unix_connection(sock=sock, limit=MAX_FRAME)
+        return cls(reader, writer)
+
+    async def send(self, message):
+        data = json.dumps(message, separators=(",", ":")).encode()
+        self._writer.write(len(data).to_bytes(FRAME_HEADER, "big") + data)
+        await self._writer.drain()
+
+    async def receive(self):
+        """The next message, or None once the other side has closed"""
+        try:
+            size = int.from_bytes(await self._reader.readexactly(FRAME_HEADER), "big")
+            if size > MAX_FRAME:
+                raise ValueError(f"Frame of {size} bytes is over the limit")
+            return json.loads(await self._reader.readexactly(size))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class Worker:
+    __slots__ = ("index", "process", "channel", "loaded", "reader")
+
+    def __init__(self, index, process, channel):
+        self.index = index
+        self.process = process
+        self.channel = channel
+        self.loaded = asyncio.Event()
+        self.reader = None
+
+
+class WorkerPool:
+    """Starts `count` copies of `script` as shard workers and relays messages.
+
+    Each worker gets SHARD, WORKERS and IPC_FD (its end of the socketpair)
+    in its environment. Messages from workers go to on_message(index,
+    message); a worker that exits while the pool is running calls
+    on_exit(index, returncode).
+    """
+
+    def __init__(self, count, script, on_message, on_exit):
+        self.count = count
+        self.script = script
+        self.on_message = on_message
+        self.on_exit = on_exit
+        self.workers = []
+        self._closing = False
+
+    async def start(self):
+        for index in range(self.count):
+            parent, child = socket.socketpair()
+            env = dict(os.environ, SHARD=str(index), WORKERS=str(self.count), IPC_FD=str(child.fileno()))
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, self.script, env=env, pass_fds=(child.fileno(),)
+            )
+            child.close()
+            worker = Worker(index, process, await Channel.open(parent))
+            worker.reader = asyncio.get_running_loop().create_task(self._read(worker))
+            self.workers.append(worker)
+            logger.info("👷 Started worker %s (pid %s)", index, process.pid)
+
+    async def _read(self, worker):
+        while True:
+            message = await worker.channel.receive()
+            if message is None:
+                break
+            if message.get("op") == "loaded":
+                worker.loaded.set()
+            try:
+                await self.on_message(worker.index, message)
+            except Exception as e:
+                logger.error("❌ Error handling message from worker %s: %s", worker.index, e, exc_info=True)
+        returncode = await worker.process.wait()
+        if not self._closing:
+            self.on_exit(worker.index, returncode)
+
+    async def wait_loaded(self):
+        await asyncio.gather(*(worker.loaded.wait() for worker in self.workers))
+
+    async def route(self, user_key, message):
+        """Send a message to the worker owning user_key (worker 0 for None)"""
+        index = shard_of(user_key, self.count) if user_key is not None else 0
+        await self.workers[index].channel.send(message)
+
+    async def close(self, timeout=30.0):
+        """Close the channels, which tells workers to finish up, and wait for them to exit"""
+        self._closing = True
+        for worker in self.workers:
+            await worker.channel.close()
+        for worker in self.workers:
+            try:
+                await asyncio.wait_for(worker.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("⚠️ Worker %s didn't exit in %.0fs; killing it", worker.index, timeout)
+                worker.process.kill()
+                await worker.process.wait()
+            if worker.reader is not None:
+                await worker.reader
+
+
+class LeaderLink:
+    """Sends a worker's changes to the leader without making the caller wait"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self._sends = set()
+
+    def _send(self, message):
+        task = asyncio.get_running_loop().create_task(self.channel.send(message))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def flush(self):
+        """Wait until every change so far has been handed to the leader"""
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+
+
+class RemoteReminders(LeaderLink):
+    """A worker's stand-in for the reminder wheel.
+
+    Handlers schedule and unschedule through it as they would on the wheel;
+    changes are kept in a local wheel (which never ticks) so reads such as
+    next_run() still work, and are sent to the leader, which owns the real
+    one.
+    """
+
+    def __init__(self, timezone, channel):
+        super().__init__(channel)
+        self.timezone = timezone
+        self._local = ReminderWheel(timezone, dispatch=None)
+
+    def add(self, key, minute, payload, zone=None):
+        self._local.add(key, minute, payload, zone)
+        self._send({
+            "op": "add", "key": list(key), "minute": minute, "payload": list(payload),
+            "zone": zone.zone if zone is not None else None
+        })
+
+    def add_loaded(self, key, minute, payload, zone=None):
+        self.add(key, minute, payload, zone)
+
+    def remove(self, key):
+        removed = self._local.remove(key)
+        if removed:
+            self._send({"op": "remove", "key": list(key)})
+        return removed
+
+    def remove_all(self, user):
+        keys = self._local.keys_for(user)
+        for key in keys:
+            self.remove(key)
+        return keys
+
+    def keys_for(self, user):
+        return self._local.keys_for(user)
+
+    def minute_for(self, key):
+        return self._local.minute_for(key)
+
+    def next_run(self, key, now=None):
+        return self._local.next_run(key, now)
+
+    def __len__(self):
+        return len(self._local)
+
+    def __contains__(self, key):
+        return key in self._local
+
+
+class RemoteCompletedGoals(LeaderLink):
+    """A worker's stand-in for the goals done today, which the leader checks before sending reminders"""
+
+    def set(self, key, until):
+        self._send({"op": "done", "key": list(key), "until": until})
+
+
+class RemoteLeaderboards(LeaderLink):
+    """A worker's stand-in for the group leaderboards, which the leader keeps.
+
+    Standings are sent on; the leader answers /leaderboard itself, since a
+    group's members can be on any shard.
+    """
+
+    def set_standing(self, user_id, groups, standing):
+        self._send({"op": "standing", "user": str(user_id), "groups": groups, "standing": standing.to_list()})
@@ -0,0 +1,66 @@
+import time
+import logging
+from contextlib import contextmanager
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Records when each startup phase began and how long it took.
+
+    Phases may overlap (reminders load in the background while polling
+    starts), so each one is reported with its own offset from process start.
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.phases = []  # (name, began, duration)
+        self._open = {}
+        self.reported = False
+
+    def record(self, name, began, ended):
+        self.phases.append((name, began - self.started, ended - began))
+
+    def begin(self, name):
+        self._open[name] = time.perf_counter()
+
+    def end(self, name):
+        began = self._open.pop(name, None)
+        if began is not None:
+            self.record(name, began, time.perf_counter())
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def done(self, *names):
+        """True once every named phase has been recorded"""
+        recorded = {name for name, _, _ in self.phases}
+        return all(name in recorded for name in names)
+
+    def report(self):
+        lines = ["⏱️ Startup timing:"]
+        for name, offset, duration in sorted(self.phases, key=lambda p: p[1]):
+            lines.append(f"  {name}: {duration * 1000:.1f} ms (started at +{offset * 1000:.1f} ms)")
+        lines.append(f"  total: {(time.perf_counter() - self.started) * 1000:.1f} ms")
+        logger.info("\n".join(lines))
+        self.reported = True
+
+
+class FirstPollRequest(HTTPXRequest):
+    """getUpdates transport that calls on_first_poll() when the first poll goes out"""
+
+    def __init__(self, on_first_poll, **kwargs):
+        super().__init__(**kwargs)
+        self._on_first_poll = on_first_poll
+
+    async def do_request(self, url, method, *args, **kwargs):
+        if self._on_first_poll is not None and url.endswith("/getUpdates"):
+            callback, self._on_first_poll = self._on_first_poll, None
+            callback()
+        return await super().do_request(url, method, *args, **kwargs)
@@ -0,0 +1,255 @@
+import sys
+from array import array
+from bisect import bisect_right, insort
+from datetime import date
+from functools import lru_cache
+
+# Longest rolling window kept per goal
+ROLLING_DAYS = 30
+
+
+class UserStats:
+    """Check-in aggregates for one user, updated on every toggle.
+
+    A day is active when at least one goal was completed on it. Active days
+    are kept as runs of consecutive days, so the current streak (the run
+    ending today), the longest streak and the last active day are O(1) to
+    read. Completed days of the last ROLLING_DAYS days are kept per goal for
+    the 7/30-day counts; older entries are dropped lazily as the window
+    moves forward.
+
+    Days before an archive cutoff aren't in the live history. For those,
+    the archive supplies the longest streak, the streak running up to the
+    cutoff and the last active day, and updates to them are ignored.
+    """
+
+    def __init__(self, today):
+        self._done_count = {}  # ordinal -> goals completed that day
+        self._run_end = {}  # run start -> run end
+        self._run_start = {}  # run end -> run start
+        self._starts = []  # sorted run starts
+        self._longest = 0
+        self._recent = {}  # goal -> set of ordinals completed in the window
+        self._horizon = today - ROLLING_DAYS + 1
+        self._floor = None  # first day not in the archive
+        self._archived_longest = 0
+        self._archived_last = None
+
+    @classmethod
+    def from_checkins(cls, history, today, archived=None):
+        """Build from a CheckinHistory; archived is (cutoff, longest streak, run up to the cutoff, last active)"""
+        stats = cls(today)
+        if archived is not None:
+            before, longest, run, last = archived
+            stats._floor = before
+            stats._archived_longest = stats._longest = longest
+            stats._archived_last = last
+            if run:
+                stats._add_run(before - run, before - 1)
+        for ordinal, goal in history.iter_done():
+            stats.update(ordinal, goal, False, True)
+        return stats
+
+    # --- updates ---
+
+    def update(self, ordinal, goal, was_done, done):
+        """Apply one goal's completion changing from was_done to done on a day"""
+        if bool(was_done) == bool(done) or (self._floor is not None and ordinal < self._floor):
+            return
+        if done:
+            if ordinal >= self._horizon:
+                self._recent.setdefault(goal, set()).add(ordinal)
+            count = self._done_count.get(ordinal, 0) + 1
+            self._done_count[ordinal] = count
+            if count == 1:
+                self._activate(ordinal)
+        else:
+            recent = self._recent.get(goal)
+            if recent is not None:
+                recent.discard(ordinal)
+            count = self._done_count.get(ordinal, 0) - 1
+            if count > 0:
+                self._done_count[ordinal] = count
+            else:
+                self._done_count.pop(ordinal, None)
+                self._deactivate(ordinal)
+
+    def _add_run(self, start, end):
+        self._run_end[start] = end
+        self._run_start[end] = start
+        insort(self._starts, start)
+        self._longest = max(self._longest, end - start + 1)
+
+    def _drop_run(self, start):
+        end = self._run_end.pop(start)
+        del self._run_start[end]
+        del self._starts[bisect_right(self._starts, start) - 1]
+        return end
+
+    def _activate(self, ordinal):
+        start, end = ordinal, ordinal
+        if ordinal - 1 in self._run_start:
+            start = self._run_start[ordinal - 1]
+            self._drop_run(start)
+        if ordinal + 1 in self._run_end:
+            end = self._drop_run(ordinal + 1)
+        self._add_run(start, end)
+
+    def _deactivate(self, ordinal):
+        index = bisect_right(self._starts, ordinal) - 1
+        if index < 0:
+            return
+        start = self._starts[index]
+        if ordinal > self._run_end[start]:
+            return
+        end = self._drop_run(start)
+        if start < ordinal:
+            self._add_run(start, ordinal - 1)
+        if ordinal < end:
+            self._add_run(ordinal + 1, end)
+        if end - start + 1 == self._longest:
+            longest = max((e - s + 1 for s, e in self._run_end.items()), default=0)
+            self._longest = max(longest, self._archived_longest)
+
+    # --- queries ---
+
+    def _advance(self, today):
+        horizon = today - ROLLING_DAYS + 1
+        if horizon <= self._horizon:
+            return
+        self._horizon = horizon
+        for days in self._recent.values():
+            stale = [d for d in days if d < horizon]
+            for d in stale:
+                days.discard(d)
+
+    def current_streak(self, today):
+        """Consecutive active days ending today (0 if nothing is done today yet)"""
+        start = self._run_start.get(today)
+        return today - start + 1 if start is not None else 0
+
+    def longest_streak(self):
+        return self._longest
+
+    def last_active(self):
+        """Most recent day with a completed goal, or None"""
+        if not self._starts:
+            return date.fromordinal(self._archived_last) if self._archived_last else None
+        return date.fromordinal(self._run_end[self._starts[-1]])
+
+    def latest_run(self):
+        """(first, last) ordinal of the most recent run of active days, or None"""
+        if not self._starts:
+            return None
+        start = self._starts[-1]
+        return start, self._run_end[start]
+
+    def done_counts(self, first, last):
+        """Goals completed on each day from first to last"""
+        return [self._done_count.get(ordinal, 0) for ordinal in range(first, last + 1)]
+
+    def done(self, goal, ordinal, today):
+        """Whether a goal was completed on a day within the rolling window"""
+        self._advance(today)
+        return ordinal in self._recent.get(goal, ())
+
+    def completed_in(self, goal, days, today):
+        """How many of the last `days` days (up to ROLLING_DAYS) the goal was completed"""
+        self._advance(today)
+        first = today - days + 1
+        return sum(1 for d in self._recent.get(goal, ()) if first <= d <= today)
+
+
+# bytes.translate tables: BIT_PLANES[i][b] is bit i of the byte b
+BIT_PLANES = [bytes((b >> i) & 1 for b in range(256)) for i in range(8)]
+
+
+@lru_cache(maxsize=256)
+def masked_popcounts(mask):
+    """bytes.translate table: entry b is the number of bits b shares with mask"""
+    return bytes((b & mask).bit_count() for b in range(256))
+
+
+def window_bytes(history, first, days):
+    """The history's day masks for `days` days from ordinal `first`, little-endian and zero-padded.
+
+    Returns (data, width) with `width` bytes per day.
+    """
+    masks = history.days
+    typed = isinstance(masks, array)
+    width = masks.itemsize if typed else (len(history.goals) + 7) // 8
+    if history.base is None:
+        return bytes(days * width), width
+    lo = first - history.base
+    chunk = masks[max(lo, 0):max(lo + days, 0)]
+    if typed:
+        if sys.byteorder != "little":
+            chunk.byteswap()
+        data = chunk.tobytes()
+    else:
+        data = b"".join(mask.to_bytes(width, "little") for mask in chunk)
+    front = min(max(-lo, 0), days)
+    back = days - front - len(chunk)
+    return bytes(front * width) + data + bytes(back * width), width
+
+
+class GoalMatrix:
+    """Which goals were completed on which days of a window, as a goal × day matrix.
+
+    Each goal's row is a bytes object with a 0/1 byte per day, cut out of
+    the history's day masks by bytes.translate. Counts, weekday splits and
+    per-day totals are then bytes.count, slicing and big-int sums, which
+    run in C, rather than a lookup per goal per day. Row order follows
+    `goals`.
+    """
+
+    def __init__(self, history, goals, first, days):
+        self.first = first
+        self.days = days
+        self.goals = list(goals)
+        self._data, self._width = window_bytes(history, first, days)
+        self._goal_mask = 0
+        self.rows = []
+        for goal in self.goals:
+            bit = history.bit_for(goal)
+            if not bit:
+                self.rows.append(bytes(days))
+                continue
+            self._goal_mask |= bit
+            index = bit.bit_length() - 1
+            self.rows.append(self._data[index // 8::self._width].translate(BIT_PLANES[index % 8]))
+
+    def completed(self):
+        """Days each goal was completed, in row order"""
+        return [row.count(1) for row in self.rows]
+
+    def _weekday_offsets(self):
+        """Offset of the first Monday, Tuesday, ... in the window"""
+        first_weekday = date.fromordinal(self.first).weekday()
+        return [(weekday - first_weekday) % 7 for weekday in range(7)]
+
+    def weekday_days(self):
+        """How many Mondays, Tuesdays, ... the window has"""
+        return [len(range(offset, self.days, 7)) for offset in self._weekday_offsets()]
+
+    def weekday_completed(self):
+        """Completions of all goals together on Mondays, Tuesdays, ..."""
+        return [sum(row[offset::7].count(1) for row in self.rows) for offset in self._weekday_offsets()]
+
+    def daily_totals(self):
+        """Goals completed on each day of the window"""
+        if self._width > 8:
+            # Past 64 goals a byte per day could overflow; add the days up one by one
+            lanes = [self._data[lane::self._width] for lane in range(self._width)]
+            return [
+                sum(masked_popcounts((self._goal_mask >> (8 * lane)) & 0xFF)[b] for lane, b in enumerate(day))
+                for day in zip(*lanes)
+            ]
+        # Up to 8 lanes of up to 8 goals: per-lane counts summed byte-wise never carry
+        total = 0
+        for lane in range(self._width):
+            lane_mask = (self._goal_mask >> (8 * lane)) & 0xFF
+            if lane_mask:
+                counts = self._data[lane::self._width].translate(masked_popcounts(lane_mask))
+                total += int.from_bytes(counts, "little")
+        return total.to_bytes(self.days, "little")
@@ -0,0 +1,1239 @@
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import shutil
+import sqlite3
+import asyncio
+import tempfile
+import logging
+import aiofiles
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from stats import UserStats, ROLLING_DAYS
+from checkins import CheckinHistory, day_ordinal, day_string
+from goals import migrate_goal_ids
+from metrics import Counter, Gauge, Histogram
+from shards import shard_of, shard_path
+
+logger = logging.getLogger(__name__)
+
+STORE_LOAD_SECONDS = Gauge("bot_store_load_seconds", "Time the startup load of all user data took")
+STORE_LOAD_BYTES = Gauge("bot_store_load_bytes", "Size of the JSON document read at startup")
+STORE_FLUSH_SECONDS = Histogram("bot_store_flush_seconds", "Time taken by each write-back of changed user data")
+STORE_FLUSH_BYTES = Counter("bot_store_flush_bytes_total", "Bytes written by JSON snapshot flushes")
+STORE_LAST_FLUSH_BYTES = Gauge("bot_store_last_flush_bytes", "Size of the most recent JSON snapshot")
+STORE_FLUSH_FAILURES = Counter("bot_store_flush_failures_total", "Write-backs that failed and were re-queued")
+CHECKIN_LOG_BYTES = Counter("bot_checkin_log_bytes_total", "Bytes appended to the check-in log")
+ARCHIVE_SECONDS = Gauge("bot_checkin_archive_seconds", "Time the last move of old check-ins into the archive took")
+ARCHIVE_DAYS = Counter("bot_checkin_archive_days_total", "User-days of check-ins moved into the archive")
+ARCHIVE_READS = Counter("bot_checkin_archive_reads_total", "Archive files read")
+
+
+def new_user_record():
+    """Empty data for a user we haven't seen before"""
+    return {
+        "goals": [],
+        "goal_ids": {},  # goal name -> stable goal ID
+        "checkins": CheckinHistory(),  # day -> goal ID bitmask
+        "reminders": {},  # goal ID -> time
+        "chat_id": None,  # Store chat_id for reminders
+        "groups": {},  # group chat id -> name shown on its leaderboard
+        "timezone": None  # IANA zone name; None for the bot's default
+    }
+
+
+def encode_record_value(value):
+    """json.dumps default= hook for values that aren't plain JSON"""
+    if isinstance(value, CheckinHistory):
+        return value.to_compact()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def decode_records(data):
+    """Turn freshly parsed user records into their in-memory form"""
+    for record in data.values():
+        record["checkins"] = CheckinHistory.load(record.get("checkins"))
+    return data
+
+
+@contextmanager
+def atomic_file(path, mode="w"):
+    """A temp file next to path, fsync'd and renamed over it if the block exits cleanly (else removed)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_atomic(path, contents):
+    """Write contents (str or bytes) to path via a temp file + rename so readers never see a partial file"""
+    with atomic_file(path, "wb" if isinstance(contents, bytes) else "w") as f:
+        f.write(contents)
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_object(f, chunk_size=1 << 16):
+    """(key, value) pairs of the top-level JSON object in a text file, parsed as the file is read.
+
+    Only the value being parsed is held in memory, so a goals.json or
+    archive bucket of any size can be walked record by record.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    state, key = "open", None  # open -> first|key -> colon -> value -> next -> key ...
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if state == "open":
+                if char != "{":
+                    raise ValueError("Expected a JSON object")
+                state, pos = "first", pos + 1
+                continue
+            if state in ("first", "next") and char == "}":
+                return
+            if state in ("next", "colon"):
+                if char != ("," if state == "next" else ":"):
+                    raise ValueError(f"Malformed JSON object near offset {pos}")
+                state, pos = "key" if state == "next" else "value", pos + 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # A value reaching the end of the buffer (or a number not followed by , or }) may continue in the next chunk
+            if end is not None and (eof or end < len(buffer) and (state != "value" or buffer[end] in " \t\n\r,}")):
+                if state == "value":
+                    yield key, item
+                    state = "next"
+                elif isinstance(item, str):
+                    key, state = item, "colon"
+                else:
+                    raise ValueError(f"Expected a key near offset {pos}")
+                pos = end
+                continue
+        elif state == "open" and eof:
+            return  # empty file
+        if eof:
+            raise ValueError("Truncated JSON object")
+        # Read at least as much again as is pending, so a huge value isn't re-parsed per chunk
+        chunk = f.read(max(chunk_size, len(buffer) - pos))
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+# === Backends ===
+
+class StorageBackend:
+    """Where UserStore keeps its data between restarts.
+
+    load_all() returns {user_id: record}. save() receives the full in-memory
+    data, the ids of users whose goals/reminders/chat_id changed, and the
+    check-in operations made since the last save, in order. A check-in
+    operation is (user_id, day, goal, done); day=None clears all of that
+    user's check-ins. Backends persist whichever of these suits them.
+
+    trim_checkins() drops stored check-ins before a day once they are in the
+    archive. Backends that write whole snapshots needn't do anything: the
+    users concerned are saved again right after.
+    """
+
+    async def load_all(self):
+        raise NotImplementedError
+
+    async def save(self, data, dirty_users, checkin_ops):
+        raise NotImplementedError
+
+    async def trim_checkins(self, before_day):
+        pass
+
+    async def close(self):
+        pass
+
+
+class JsonFileBackend(StorageBackend):
+    """All users in a single JSON document, rewritten atomically on save"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fragments = {}  # user_id -> '"user_id": {...}' as last saved
+
+    async def load_all(self):
+        self._fragments = {}
+        try:
+            async with aiofiles.open(self.path, "r") as f:
+                contents = await f.read()
+        except FileNotFoundError:
+            return {}
+        STORE_LOAD_BYTES.set(len(contents))
+        # Files written before the compact encoding hold legacy check-ins; both load
+        data = decode_records(json.loads(contents)) if contents.strip() else {}
+        # Nothing mutates the records before load() returns, so encode them off the loop
+        self._fragments = await asyncio.to_thread(self._encode_all, data)
+        return data
+
+    @staticmethod
+    def _fragment(user_id, record):
+        return f"{json.dumps(user_id)}: {json.dumps(record, default=encode_record_value)}"
+
+    @classmethod
+    def _encode_all(cls, data):
+        return {user_id: cls._fragment(user_id, record) for user_id, record in data.items()}
+
+    async def save(self, data, dirty_users, checkin_ops):
+        # Re-encode only the changed users on the loop so the snapshot is consistent;
+        # joining and writing the whole document happens off the loop
+        fragments = self._fragments
+        changed = set(dirty_users)
+        changed.update(op[0] for op in checkin_ops)
+        for user_id in changed:
+            record = data.get(user_id)
+            if record is None:
+                fragments.pop(user_id, None)
+            else:
+                fragments[user_id] = self._fragment(user_id, record)
+        if len(fragments) != len(data):
+            # Users added or dropped without being reported; resync them
+            for user_id in [user_id for user_id in fragments if user_id not in data]:
+                del fragments[user_id]
+            for user_id, record in data.items():
+                if user_id not in fragments:
+                    fragments[user_id] = self._fragment(user_id, record)
+        return await asyncio.to_thread(self._write, list(fragments.values()))
+
+    def _write(self, fragments):
+        contents = "{" + ", ".join(fragments) + "}"
+        write_atomic(self.path, contents)
+        return len(contents)
+
+    # --- record at a time, for offline tools (blocking) ---
+
+    def iter_records(self):
+        """(user_id, record) for every user in the file, read one record at a time"""
+        try:
+            f = open(self.path, "r")
+        except FileNotFoundError:
+            return
+        with f:
+            for user_id, record in iter_json_object(f):
+                record["checkins"] = CheckinHistory.load(record.get("checkins"))
+                yield user_id, record
+
+    def write_records(self, records):
+        """Replace the file with the (user_id, record) pairs, writing one record at a time"""
+        with atomic_file(self.path) as f:
+            f.write("{")
+            separator = ""
+            for user_id, record in records:
+                f.write(separator + self._fragment(user_id, record))
+                separator = ", "
+            f.write("}")
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    chat_id INTEGER,
+    timezone TEXT
+);
+CREATE TABLE IF NOT EXISTS goals (
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checkins (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    goal TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    PRIMARY KEY (user_id, day, goal)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reminders (
+    user_id TEXT NOT NULL,
+    goal TEXT NOT NULL,
+    time TEXT NOT NULL,
+    PRIMARY KEY (user_id, goal)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS goal_ids (
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    goal_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS group_members (
+    user_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (user_id, chat_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_reminders_time ON reminders (time);
+"""
+
+# Columns added to tables after their first release, added to older databases on open
+SQLITE_ADDED_COLUMNS = (("users", "timezone", "TEXT"),)
+
+
+class SqliteBackend(StorageBackend):
+    """Users, goals, check-ins, reminders and group memberships in indexed SQLite tables (WAL mode).
+
+    A check-in toggle becomes a single-row upsert; a profile change rewrites
+    only that user's users/goals/reminders rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SQLITE_SCHEMA)
+            for table, column, kind in SQLITE_ADDED_COLUMNS:
+                if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            self._conn = conn
+        return self._conn
+
+    def _load_all_sync(self):
+        conn = self._connect()
+        data = {}
+        for user_id, chat_id, timezone in conn.execute("SELECT user_id, chat_id, timezone FROM users"):
+            record = new_user_record()
+            record["chat_id"] = chat_id
+            record["timezone"] = timezone
+            data[user_id] = record
+        for user_id, name in conn.execute("SELECT user_id, name FROM goals ORDER BY user_id, position"):
+            data.setdefault(user_id, new_user_record())["goals"].append(name)
+        for user_id, day, goal, done in conn.execute(
+            "SELECT user_id, day, goal, done FROM checkins ORDER BY user_id, day"
+        ):
+            checkins = data.setdefault(user_id, new_user_record())["checkins"]
+            checkins.set(day_ordinal(day), goal, bool(done))
+        for user_id, goal, time_str in conn.execute("SELECT user_id, goal, time FROM reminders"):
+            data.setdefault(user_id, new_user_record())["reminders"][goal] = time_str
+        for user_id, name, goal_id in conn.execute("SELECT user_id, name, goal_id FROM goal_ids"):
+            data.setdefault(user_id, new_user_record())["goal_ids"][name] = goal_id
+        for user_id, chat_id, name in conn.execute("SELECT user_id, chat_id, name FROM group_members"):
+            data.setdefault(user_id, new_user_record())["groups"][chat_id] = name
+        return data
+
+    async def load_all(self):
+        return await asyncio.to_thread(self._load_all_sync)
+
+    def _save_sync(self, profiles, checkin_ops):
+        conn = self._connect()
+        with conn:
+            for user_id, chat_id, timezone, goals, goal_ids, reminders, groups in profiles:
+                conn.execute(
+                    "INSERT INTO users (user_id, chat_id, timezone) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET chat_id = excluded.chat_id, timezone = excluded.timezone",
+                    (user_id, chat_id, timezone)
+                )
+                conn.execute("DELETE FROM goals WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO goals (user_id, position, name) VALUES (?, ?, ?)",
+                    [(user_id, i, name) for i, name in enumerate(goals)]
+                )
+                conn.execute("DELETE FROM reminders WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO reminders (user_id, goal, time) VALUES (?, ?, ?)",
+                    [(user_id, goal, time_str) for goal, time_str in reminders]
+                )
+                conn.execute("DELETE FROM goal_ids WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO goal_ids (user_id, name, goal_id) VALUES (?, ?, ?)",
+                    [(user_id, name, goal_id) for name, goal_id in goal_ids]
+                )
+                conn.execute("DELETE FROM group_members WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO group_members (user_id, chat_id, name) VALUES (?, ?, ?)",
+                    [(user_id, group, name) for group, name in groups]
+                )
+            for user_id, day, goal, done in checkin_ops:
+                if day is None:
+                    conn.execute("DELETE FROM checkins WHERE user_id = ?", (user_id,))
+                else:
+                    conn.execute(
+                        "INSERT INTO checkins (user_id, day, goal, done) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(user_id, day, goal) DO UPDATE SET done = excluded.done",
+                        (user_id, day, goal, int(done))
+                    )
+
+    @staticmethod
+    def _profile(user_id, record):
+        return (
+            user_id,
+            record.get("chat_id"),
+            record.get("timezone"),
+            list(record.get("goals", [])),
+            list(record.get("goal_ids", {}).items()),
+            list(record.get("reminders", {}).items()),
+            list(record.get("groups", {}).items())
+        )
+
+    async def save(self, data, dirty_users, checkin_ops):
+        # Copy the rows out on the loop; the thread never touches live records
+        profiles = [self._profile(user_id, data[user_id]) for user_id in dirty_users if user_id in data]
+        await asyncio.to_thread(self._save_sync, profiles, list(checkin_ops))
+        return None
+
+    # --- user at a time, for offline tools (blocking) ---
+
+    def iter_checkins(self, users=None, since=None, until=None):
+        """(user_id, goal ID, goal name or None, day, done) for stored check-ins, by user then day.
+
+        users is a collection of user ids; since and until are inclusive
+        'YYYY-MM-DD' days. Rows are streamed from the database.
+        """
+        query = (
+            "SELECT c.user_id, c.goal, g.name, c.day, c.done FROM checkins c "
+            "LEFT JOIN goal_ids g ON g.user_id = c.user_id AND g.goal_id = c.goal "
+            "WHERE c.day >= ? AND c.day <= ?"
+        )
+        params = [since or "", until or "9999-12-31"]
+        if users is not None:
+            query += " AND c.user_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(sorted(users)))
+        for user_id, goal, name, day, done in self._connect().execute(query + " ORDER BY c.user_id, c.day", params):
+            yield user_id, goal, name, day, bool(done)
+
+    def goal_names(self, user_id):
+        """{goal ID: name} for every goal the user has had"""
+        rows = self._connect().execute("SELECT goal_id, name FROM goal_ids WHERE user_id = ?", (user_id,))
+        return dict(rows)
+
+    def load_profile(self, user_id):
+        """A user's record without check-ins, or None if they have never been saved"""
+        conn = self._connect()
+        row = conn.execute("SELECT chat_id, timezone FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        record = new_user_record()
+        record["chat_id"], record["timezone"] = row
+        record["goals"] = [name for name, in conn.execute(
+            "SELECT name FROM goals WHERE user_id = ? ORDER BY position", (user_id,)
+        )]
+        record["reminders"] = dict(conn.execute("SELECT goal, time FROM reminders WHERE user_id = ?", (user_id,)))
+        record["goal_ids"] = dict(conn.execute("SELECT name, goal_id FROM goal_ids WHERE user_id = ?", (user_id,)))
+        record["groups"] = dict(conn.execute("SELECT chat_id, name FROM group_members WHERE user_id = ?", (user_id,)))
+        return record
+
+    def write_records(self, records, checkin_ops):
+        """Save the (user_id, record) pairs' profiles and the check-in operations in one transaction"""
+        self._save_sync([self._profile(user_id, record) for user_id, record in records], checkin_ops)
+
+    def _trim_sync(self, before_day):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM checkins WHERE day < ?", (before_day,))
+
+    async def trim_checkins(self, before_day):
+        await asyncio.to_thread(self._trim_sync, before_day)
+
+    def disconnect(self):
+        """Blocking close(), for offline tools"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            conn.close()
+
+    async def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+
+def open_backend(kind, json_path, sqlite_path):
+    """Build the backend selected by STORAGE_BACKEND ("json" or "sqlite")"""
+    kind = (kind or "json").lower()
+    if kind == "json":
+        return JsonFileBackend(json_path)
+    if kind == "sqlite":
+        return SqliteBackend(sqlite_path)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def iter_checkin_ops(user_id, record):
+    """Yield the check-in operations that recreate a record's check-ins"""
+    for ordinal, goals in record["checkins"].iter_days():
+        day = day_string(ordinal)
+        for goal, done in goals.items():
+            yield (user_id, day, goal, done)
+
+
+async def migrate_json_to_sqlite(json_path, sqlite_path):
+    """One-shot copy of an existing goals.json into a SQLite database"""
+    data = await JsonFileBackend(json_path).load_all()
+    backend = SqliteBackend(sqlite_path)
+    try:
+        ops = [op for user_id, record in data.items() for op in iter_checkin_ops(user_id, record)]
+        await backend.save(data, set(data), ops)
+    finally:
+        await backend.close()
+    logger.info("📦 Migrated %s users from %s to %s", len(data), json_path, sqlite_path)
+    return len(data)
+
+
+# === Check-in Log ===
+
+class CheckinLog:
+    """Append-only log of check-in operations, fsync'd in groups.
+
+    Operations are buffered and written to the active segment file every
+    commit_delay seconds with a single fsync. rotate() seals the active
+    segment so a snapshot can be taken; once the snapshot is safely written
+    the sealed segments are deleted with discard(). Segments still on disk at
+    startup hold operations newer than the snapshot and are replayed.
+    """
+
+    def __init__(self, path, commit_delay=0.2):
+        self.path = path
+        self.commit_delay = commit_delay
+        self._seq = 1
+        self._buffer = []
+        self._commit_task = None
+        self._write_lock = asyncio.Lock()
+
+    def _segment_path(self, seq):
+        return f"{self.path}.{seq}"
+
+    def _segments(self):
+        """Sequence numbers of segment files on disk, oldest first"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + "."
+        found = []
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name[len(prefix):].isdigit():
+                found.append(int(name[len(prefix):]))
+        return sorted(found)
+
+    def replay(self):
+        """Read every operation left on disk, in order"""
+        ops = []
+        segments = self._segments()
+        for seq in segments:
+            with open(self._segment_path(seq), "r") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # torn write from a crash; nothing after it was acknowledged
+                    user_id, day, goal, done = json.loads(line)
+                    ops.append((user_id, day, goal, done))
+        if segments:
+            self._seq = segments[-1] + 1
+        return ops
+
+    def append(self, op):
+        """Queue an operation for the next group commit"""
+        self._buffer.append(json.dumps(op) + "\n")
+        if self._commit_task is None or self._commit_task.done():
+            self._commit_task = asyncio.get_running_loop().create_task(self._delayed_commit())
+
+    async def _delayed_commit(self):
+        await asyncio.sleep(self.commit_delay)
+        self._commit_task = None
+        try:
+            await asyncio.shield(self._commit(self._seq, self._take_buffer()))
+        except Exception as e:
+            logger.error("❌ Error writing check-in log: %s", e)
+
+    def _take_buffer(self):
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    async def _commit(self, seq, lines):
+        if not lines:
+            return
+        contents = "".join(lines)
+        async with self._write_lock:
+            await asyncio.to_thread(self._write_sync, self._segment_path(seq), contents)
+        CHECKIN_LOG_BYTES.inc(len(contents))
+
+    @staticmethod
+    def _write_sync(path, contents):
+        with open(path, "a") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def rotate(self):
+        """Seal the active segment; later appends go to a new one. Returns the sealed seq"""
+        seq, lines = self._seq, self._take_buffer()
+        self._seq += 1
+        await self._commit(seq, lines)
+        return seq
+
+    def discard(self, upto_seq):
+        """Delete sealed segments whose operations are now in the snapshot"""
+        for seq in self._segments():
+            if seq <= upto_seq:
+                os.unlink(self._segment_path(seq))
+
+    async def close(self):
+        """Write out anything still buffered"""
+        task = self._commit_task
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self._commit(self._seq, self._take_buffer())
+
+
+# === Check-in Archive ===
+
+ARCHIVE_BUCKETS = 64
+
+
+def retention_cutoff(today, hot_days):
+    """First day kept in the live data: the start of the month hot_days back, or None when hot_days is 0.
+
+    Rounding to a month means the archive is only rewritten monthly. At
+    least ROLLING_DAYS stay live so the rolling counts never need it.
+    """
+    if hot_days <= 0:
+        return None
+    return (today - timedelta(days=max(hot_days, ROLLING_DAYS))).replace(day=1).toordinal()
+
+
+def summarize_archived(history, before):
+    """(longest streak, streak running up to `before`, last active ordinal) of archived days"""
+    longest = run = 0
+    last = None
+    for index, mask in enumerate(history.days):
+        if mask:
+            run += 1
+            longest = max(longest, run)
+            last = index
+        else:
+            run = 0
+    if history.base is None or history.base + len(history.days) != before:
+        run = 0
+    return longest, run, history.base + last if last is not None else None
+
+
+class CheckinArchive:
+    """Check-in days older than the retention cutoff, kept out of the live data.
+
+    Users are hashed into `buckets` gzip'd JSON files under the `path`
+    directory, each holding its users' archived histories in compact form.
+    index.json has the cutoff and, per user, what UserStats needs about the
+    archived days (longest streak, streak up to the cutoff, last active
+    day); only the index is read at startup. A user's archived history is
+    read from its bucket when asked for, with the last few buckets cached.
+
+    Buckets are replaced atomically before the index, so a crash in between
+    leaves the days in both the archive and the live data, and the next
+    add() merges them again.
+    """
+
+    def __init__(self, path, buckets=ARCHIVE_BUCKETS, cache_size=4):
+        self.path = path
+        self.buckets = buckets
+        self.cache_size = cache_size
+        self.before = None  # ordinal of the cutoff; everything earlier is here
+        self._summaries = {}  # user_id -> (longest, run, last)
+        self._cache = OrderedDict()  # bucket -> {user_id: compact history}
+        self._lock = asyncio.Lock()
+
+    def _index_path(self):
+        return os.path.join(self.path, "index.json")
+
+    def _bucket_path(self, index):
+        return os.path.join(self.path, f"checkins.{index:02d}.json.gz")
+
+    def bucket_of(self, user_id):
+        return shard_of(user_id, self.buckets)
+
+    def summary(self, user_id):
+        """(cutoff, longest, run, last) for UserStats, or None if the user has nothing archived"""
+        summary = self._summaries.get(str(user_id))
+        return (self.before, *summary) if summary is not None else None
+
+    def __contains__(self, user_id):
+        return str(user_id) in self._summaries
+
+    def __len__(self):
+        return len(self._summaries)
+
+    # --- files (run in a thread, under _lock) ---
+
+    def _load_index(self):
+        try:
+            with open(self._index_path()) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        self.before = day_ordinal(index["before"])
+        self._summaries = {user_id: tuple(summary) for user_id, summary in index["users"].items()}
+
+    def _write_index(self, before, summaries):
+        index = {"before": day_string(before), "users": summaries}
+        write_atomic(self._index_path(), json.dumps(index, separators=(",", ":")))
+
+    def _read_bucket(self, index, cache=True):
+        users = self._cache.get(index)
+        if users is not None:
+            self._cache.move_to_end(index)
+            return users
+        try:
+            with gzip.open(self._bucket_path(index), "rt") as f:
+                users = json.load(f)
+            ARCHIVE_READS.inc()
+        except FileNotFoundError:
+            users = {}
+        if cache:
+            self._cache_bucket(index, users)
+        return users
+
+    def _cache_bucket(self, index, users):
+        self._cache[index] = users
+        self._cache.move_to_end(index)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _write_bucket(self, index, users):
+        path = self._bucket_path(index)
+        if users:
+            contents = json.dumps(users, separators=(",", ":"), default=encode_record_value)
+            write_atomic(path, gzip.compress(contents.encode(), compresslevel=6))
+        elif os.path.exists(path):
+            os.unlink(path)
+        self._cache_bucket(index, users)
+
+    def _add(self, parts, before):
+        os.makedirs(self.path, exist_ok=True)
+        summaries = dict(self._summaries)
+        if before != self.before:
+            # Runs ended at the old cutoff; they're re-measured for users with new days below
+            summaries = {user_id: (longest, 0, last) for user_id, (longest, run, last) in summaries.items()}
+        by_bucket = {}
+        for user_id, part in parts.items():
+            by_bucket.setdefault(self.bucket_of(user_id), {})[user_id] = part
+        for index, bucket_parts in by_bucket.items():
+            users = dict(self._read_bucket(index))
+            for user_id, part in bucket_parts.items():
+                history = CheckinHistory.load(users[user_id]).update(part) if user_id in users else part
+                users[user_id] = history.to_compact()
+                summaries[user_id] = summarize_archived(history, before)
+            self._write_bucket(index, users)
+        self._write_index(before, summaries)
+        self.before, self._summaries = before, summaries
+        return sum(part.day_count() for part in parts.values())
+
+    def _remove(self, user_id):
+        index = self.bucket_of(user_id)
+        users = dict(self._read_bucket(index))
+        if users.pop(user_id, None) is not None:
+            self._write_bucket(index, users)
+        if self.before is not None:
+            self._write_index(self.before, self._summaries)
+
+    def _history(self, user_id):
+        compact = self._read_bucket(self.bucket_of(user_id)).get(user_id)
+        return CheckinHistory.from_compact(compact) if compact is not None else None
+
+    def _read_all(self):
+        histories = {}
+        for index in range(self.buckets):
+            for user_id, compact in self._read_bucket(index, cache=False).items():
+                histories[user_id] = CheckinHistory.from_compact(compact)
+        return histories
+
+    def _write_all(self, before, histories):
+        os.makedirs(self.path, exist_ok=True)
+        by_bucket = {index: {} for index in range(self.buckets)}
+        for user_id, history in histories.items():
+            by_bucket[self.bucket_of(user_id)][user_id] = history
+        for index, users in by_bucket.items():
+            self._write_bucket(index, users)
+        self._cache.clear()
+        summaries = {user_id: summarize_archived(history, before) for user_id, history in histories.items()}
+        self._write_index(before, summaries)
+        self.before, self._summaries = before, summaries
+
+    # --- offline tools (blocking, no lock: the bot mustn't be running) ---
+
+    def read_index(self):
+        """Load the index; returns the cutoff ordinal, or None if nothing is archived"""
+        self._load_index()
+        return self.before
+
+    def iter_histories(self, users=None):
+        """(user_id, CheckinHistory) of archived users (only `users` if given), streamed from the bucket files"""
+        buckets = sorted({self.bucket_of(user_id) for user_id in users}) if users is not None else range(self.buckets)
+        for index in buckets:
+            try:
+                f = gzip.open(self._bucket_path(index), "rt")
+            except FileNotFoundError:
+                continue
+            ARCHIVE_READS.inc()
+            with f:
+                for user_id, compact in iter_json_object(f):
+                    if users is None or user_id in users:
+                        yield user_id, CheckinHistory.from_compact(compact)
+
+    # --- async API ---
+
+    async def load(self):
+        """Read the index; bucket files are left until needed"""
+        async with self._lock:
+            await asyncio.to_thread(self._load_index)
+
+    async def add(self, parts, before):
+        """Merge {user_id: CheckinHistory} of days before the `before` ordinal into the archive; returns the days added"""
+        async with self._lock:
+            return await asyncio.to_thread(self._add, parts, before)
+
+    async def remove(self, user_id):
+        """Drop a user's archived history"""
+        user_id = str(user_id)
+        # Forgotten straight away so stats built meanwhile don't use it
+        self._summaries.pop(user_id, None)
+        async with self._lock:
+            await asyncio.to_thread(self._remove, user_id)
+
+    async def history(self, user_id):
+        """A user's archived CheckinHistory (a fresh copy), or None"""
+        user_id = str(user_id)
+        if user_id not in self._summaries:
+            return None
+        async with self._lock:
+            return await asyncio.to_thread(self._history, user_id)
+
+    async def read_all(self):
+        """(cutoff, {user_id: CheckinHistory}) for everything archived, bypassing the cache"""
+        async with self._lock:
+            await asyncio.to_thread(self._load_index)
+            return self.before, await asyncio.to_thread(self._read_all)
+
+    async def write_all(self, before, histories):
+        """Replace the whole archive"""
+        async with self._lock:
+            await asyncio.to_thread(self._write_all, before, histories)
+
+
+# === User Store ===
+
+class UserStore:
+    """Resident copy of all user data with write-behind persistence.
+
+    The backend is read once by load(). Handlers read and mutate the in-memory
+    records; goal, reminder and chat_id changes are reported with mark_dirty()
+    and written back together after flush_delay seconds.
+
+    Check-in changes go through set_checkin()/clear_checkins(). With a
+    CheckinLog they are appended to the log and only folded into the backend
+    by the compaction task every compact_interval seconds (or after
+    compact_after operations), so a toggle costs one small log record.
+    Without a log they are written with the next batched flush.
+
+    stats() returns per-user check-in aggregates (streaks, rolling counts),
+    built from the history on first use and kept up to date by every
+    check-in change afterwards.
+
+    With a CheckinArchive and hot_days > 0, check-in days from before
+    retention_cutoff() are moved into the archive (checked every
+    archive_interval seconds), so the live data only holds recent history.
+    full_history() reads a user's archived days back in when they're needed.
+    """
+
+    def __init__(self, backend, log=None, flush_delay=2.0, compact_interval=60.0, compact_after=10000,
+                 archive=None, hot_days=0, archive_interval=3600.0):
+        self.backend = backend
+        self.log = log
+        self.flush_delay = flush_delay
+        self.compact_interval = compact_interval
+        self.compact_after = compact_after
+        self.archive = archive
+        self.hot_days = hot_days
+        self.archive_interval = archive_interval
+        self._data = {}
+        self._dirty = set()
+        self._checkin_ops = []
+        self._stats = {}  # user_id -> UserStats
+        self._flush_task = None
+        self._compact_task = None
+        self._archive_task = None
+        self._archive_removals = set()
+        self._flush_lock = asyncio.Lock()
+
+    async def load(self):
+        """Read all users from the backend, replay the check-in log on top and start compaction"""
+        started = time.perf_counter()
+        self._data = await self.backend.load_all()
+        STORE_LOAD_SECONDS.set(time.perf_counter() - started)
+        self._stats.clear()
+        self._dirty.clear()
+        self._checkin_ops.clear()
+        logger.info("📂 Loaded %s users from %s", len(self._data), type(self.backend).__name__)
+        if self.archive is not None:
+            await self.archive.load()
+        if self.log is not None:
+            ops = await asyncio.to_thread(self.log.replay)
+            for op in ops:
+                self._apply_checkin_op(op)
+            # Replayed operations reach the backend with the next compaction
+            self._checkin_ops.extend(ops)
+            if ops:
+                logger.info("📜 Replayed %s check-ins from %s", len(ops), self.log.path)
+        await self._migrate_goal_ids()
+        if self.log is not None:
+            self._compact_task = asyncio.get_running_loop().create_task(self._compact_periodically())
+        if self.archive is not None and self.hot_days > 0:
+            self._archive_task = asyncio.get_running_loop().create_task(self._archive_periodically())
+
+    async def _migrate_goal_ids(self):
+        """Re-key records written before goal IDs and persist them straight away.
+
+        This runs after the log replay so check-ins logged by name are
+        re-keyed too, and flushes before anything new is logged by ID.
+        """
+        migrated = [user_id for user_id, record in self._data.items() if migrate_goal_ids(record)]
+        if not migrated:
+            return
+        for user_id in migrated:
+            self._rewrite_checkins(user_id)
+            self.mark_dirty(user_id)
+        await self.flush()
+        logger.info("🏷️ Migrated %s users to goal IDs", len(migrated))
+
+    def _rewrite_checkins(self, user_id):
+        """Queue operations that replace a user's stored check-ins with the in-memory ones"""
+        self._stats.pop(user_id, None)
+        self._forget_archived(user_id)
+        self._record_checkin_op((user_id, None, None, None))
+        for op in iter_checkin_ops(user_id, self._data[user_id]):
+            self._record_checkin_op(op)
+
+    def _apply_checkin_op(self, op):
+        user_id, day, goal, done = op
+        record = self.get(user_id)
+        if day is None:
+            record["checkins"] = CheckinHistory()
+            self._stats.pop(user_id, None)
+            return
+        ordinal = day_ordinal(day)
+        was_done = record["checkins"].set(ordinal, goal, done)
+        stats = self._stats.get(user_id)
+        if stats is not None:
+            stats.update(ordinal, goal, was_done, done)
+
+    def _record_checkin_op(self, op):
+        self._checkin_ops.append(op)
+        if self.log is None:
+            self._schedule_flush()
+            return
+        self.log.append(op)
+        if len(self._checkin_ops) >= self.compact_after:
+            self._schedule_flush()
+
+    def get(self, user_id):
+        """Return the live record for a user, creating it if needed"""
+        key = str(user_id)
+        record = self._data.get(key)
+        if record is None:
+            record = new_user_record()
+            self._data[key] = record
+            self.mark_dirty(key)
+        return record
+
+    def put(self, user_id, record):
+        """Store a user's record and queue its goals, reminders and chat_id for writing"""
+        key = str(user_id)
+        if self._data.get(key) is not record:
+            # A replacement record brings its own check-ins
+            record["checkins"] = CheckinHistory.load(record.get("checkins"))
+            migrate_goal_ids(record)
+            self._data[key] = record
+            self._rewrite_checkins(key)
+        self.mark_dirty(key)
+
+    def set_checkin(self, user_id, day, goal, done):
+        """Record whether a goal was completed on a day"""
+        op = (str(user_id), day, goal, done)
+        self._apply_checkin_op(op)
+        self._record_checkin_op(op)
+
+    def clear_checkins(self, user_id):
+        """Drop all of a user's check-in history, archived days included"""
+        op = (str(user_id), None, None, None)
+        self._apply_checkin_op(op)
+        self._record_checkin_op(op)
+        self._forget_archived(op[0])
+
+    def _forget_archived(self, user_id):
+        if self.archive is None or user_id not in self.archive:
+            return
+        task = asyncio.get_running_loop().create_task(self.archive.remove(user_id))
+        self._archive_removals.add(task)
+        task.add_done_callback(self._archive_removals.discard)
+
+    def stats(self, user_id, today):
+        """Check-in aggregates for a user; today is a date"""
+        key = str(user_id)
+        stats = self._stats.get(key)
+        if stats is None:
+            archived = self.archive.summary(key) if self.archive is not None else None
+            stats = UserStats.from_checkins(self.get(key)["checkins"], today.toordinal(), archived)
+            self._stats[key] = stats
+        return stats
+
+    async def full_history(self, user_id, since=None):
+        """A copy of a user's check-in history, reading archived days if there are any.
+
+        With `since` (an ordinal), the archive is only read if the days from
+        then on reach into it.
+        """
+        key = str(user_id)
+        archived = None
+        if self.archive is not None and (since is None or self.archive.before is None or since < self.archive.before):
+            archived = await self.archive.history(key)
+        live = self.get(key)["checkins"]
+        return archived.update(live) if archived is not None else live.copy()
+
+    def users(self):
+        """Iterate over (user_id, record) pairs"""
+        return self._data.items()
+
+    def __len__(self):
+        return len(self._data)
+
+    def mark_dirty(self, user_id):
+        """Queue a user's goals, reminders and chat_id for the next batched write"""
+        self._dirty.add(str(user_id))
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        # Changes made while this batch is being written start a new timer
+        self._flush_task = None
+        try:
+            # Shielded so close() cancelling the timer can't interrupt a write in progress
+            await asyncio.shield(self.flush())
+        except Exception as e:
+            logger.error("❌ Error flushing user data: %s", e)
+
+    async def _compact_periodically(self):
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            if not self._checkin_ops:
+                continue
+            try:
+                await asyncio.shield(self.flush())
+            except Exception as e:
+                logger.error("❌ Error compacting check-in log: %s", e)
+
+    async def _archive_periodically(self):
+        while True:
+            try:
+                await asyncio.shield(self.archive_checkins())
+            except Exception as e:
+                logger.error("❌ Error archiving old check-ins: %s", e, exc_info=True)
+            await asyncio.sleep(self.archive_interval)
+
+    async def archive_checkins(self, today=None):
+        """Move check-in days before the retention cutoff into the archive; returns the users moved.
+
+        Runs under the flush lock, so no snapshot is taken between the days
+        leaving the live data and reaching the archive. They are only
+        deleted from the backend once the archive has them. `today` defaults
+        to the UTC date, so the server's timezone doesn't decide which days
+        move; users' own dates are at most a day off, well inside the cutoff.
+        """
+        before = retention_cutoff(today or datetime.now(timezone.utc).date(), self.hot_days)
+        if before is None or self.archive is None:
+            return 0
+        # Queued changes to the days moving out reach the backend before they're trimmed
+        await self.flush()
+        async with self._flush_lock:
+            started = time.perf_counter()
+            parts = {}
+            for user_id, record in self._data.items():
+                part = record["checkins"].split_before(before)
+                if not part.is_empty():
+                    parts[user_id] = part
+            if not parts and (not len(self.archive) or self.archive.before >= before):
+                return 0
+            try:
+                days = await self.archive.add(parts, before)
+            except BaseException:
+                for user_id, part in parts.items():
+                    record = self._data[user_id]
+                    record["checkins"] = part.update(record["checkins"])
+                raise
+            await self.backend.trim_checkins(day_string(before))
+            for user_id in parts:
+                self._stats.pop(user_id, None)
+                self._dirty.add(user_id)
+            ARCHIVE_DAYS.inc(days)
+            ARCHIVE_SECONDS.set(time.perf_counter() - started)
+        if parts:
+            await self.flush()
+        logger.info("🗄️ Archived %s days of check-ins from %s users (before %s)", days, len(parts), day_string(before))
+        return len(parts)
+
+    async def flush(self):
+        """Write everything that changed since the last write and compact the check-in log"""
+        async with self._flush_lock:
+            if not self._dirty and not self._checkin_ops:
+                return
+            dirty, self._dirty = self._dirty, set()
+            ops, self._checkin_ops = self._checkin_ops, []
+            started = time.perf_counter()
+            try:
+                # Seal the log at the same point the snapshot is taken
+                sealed = await self.log.rotate() if self.log is not None else None
+                written = await self.backend.save(self._data, dirty, ops)
+            except Exception:
+                # Put the batch back in front of anything queued meanwhile
+                self._dirty |= dirty
+                self._checkin_ops[:0] = ops
+                STORE_FLUSH_FAILURES.inc()
+                raise
+            STORE_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            if written is not None:
+                STORE_FLUSH_BYTES.inc(written)
+                STORE_LAST_FLUSH_BYTES.set(written)
+            if sealed is not None:
+                await asyncio.to_thread(self.log.discard, sealed)
+            logger.debug("💾 Flushed %s users, %s check-ins (%s bytes)", len(dirty), len(ops), written)
+
+    async def close(self):
+        """Stop background tasks, write any outstanding changes and release the backend"""
+        for task in (self._flush_task, self._compact_task, self._archive_task):
+            if task is not None and not task.done() and task is not asyncio.current_task():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self._archive_removals:
+            await asyncio.gather(*self._archive_removals, return_exceptions=True)
+        await self.flush()
+        if self.log is not None:
+            await self.log.close()
+        await self.backend.close()
+
+
+# === Sharding ===
+
+def _shard_sources(kind, json_path, sqlite_path, log_path, archive_path, shards):
+    """(json, sqlite, log, archive) paths of existing data that isn't in the layout for `shards`"""
+    paths = (json_path, sqlite_path, log_path, archive_path)
+    sources = []
+    if shards > 1 and (any(os.path.exists(path) for path in (json_path, sqlite_path)) or CheckinLog(log_path)._segments()):
+        sources.append(paths)
+    data_path = sqlite_path if kind == "sqlite" else json_path
+    root, ext = os.path.splitext(data_path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"\.(\d+)-of-(\d+)" + re.escape(ext) + "$")
+    counts = set()
+    for name in os.listdir(os.path.dirname(os.path.abspath(data_path))):
+        match = pattern.match(name)
+        if match and int(match.group(2)) != shards:
+            counts.add(int(match.group(2)))
+    for count in sorted(counts):
+        sources.extend(
+            tuple(shard_path(path, index, count) if path else path for path in paths)
+            for index in range(count)
+        )
+    return sources
+
+
+async def split_into_shards(kind, json_path, sqlite_path, log_path, shards, archive_path=None):
+    """Spread existing user data over the files of `shards` worker shards.
+
+    Sources are the unsharded files and shard files left by a different
+    WORKERS count; with shards=1 the shard files are merged back into the
+    unsharded ones. Each is loaded with its check-in log replayed and
+    compacted, the users are written to the shard that owns them, and the
+    sources' data files are then renamed with a ".resharded" suffix. Nothing
+    happens when there are no sources, or when every target shard already
+    exists. Returns the number of users moved.
+
+    Check-in archives under archive_path are split the same way; the
+    sources' archive directories are renamed like their data files.
+    """
+    kind = (kind or "json").lower()
+    data_path = sqlite_path if kind == "sqlite" else json_path
+    sources = _shard_sources(kind, json_path, sqlite_path, log_path, archive_path, shards)
+    if not sources:
+        return 0
+    if all(os.path.exists(shard_path(data_path, index, shards)) for index in range(shards)):
+        logger.warning("⚠️ Shards for %s workers exist; ignoring %s", shards, [source[0] for source in sources])
+        return 0
+
+    users = {}
+    archived = {}
+    before = None
+    for source_json, source_sqlite, source_log, source_archive in sources:
+        # goals.json that was never migrated to SQLite is read as JSON
+        source_kind = "sqlite" if kind == "sqlite" and os.path.exists(source_sqlite) else "json"
+        store = UserStore(open_backend(source_kind, source_json, source_sqlite), log=CheckinLog(source_log))
+        await store.load()
+        await store.close()
+        users.update(store.users())
+        if source_archive and os.path.isdir(source_archive):
+            source_before, histories = await CheckinArchive(source_archive).read_all()
+            archived.update(histories)
+            if source_before is not None:
+                before = max(before or source_before, source_before)
+
+    for index in range(shards):
+        shard = {user_id: record for user_id, record in users.items() if shard_of(user_id, shards) == index}
+        if before is not None:
+            # Sources may have been archived up to different days; bring them all to the latest
+            shard_archive = {user_id: history for user_id, history in archived.items() if user_id in shard}
+            for user_id, record in shard.items():
+                part = record["checkins"].split_before(before)
+                if not part.is_empty():
+                    old = shard_archive.get(user_id)
+                    shard_archive[user_id] = old.update(part) if old is not None else part
+            await CheckinArchive(shard_path(archive_path, index, shards)).write_all(before, shard_archive)
+        backend = open_backend(kind, shard_path(json_path, index, shards), shard_path(sqlite_path, index, shards))
+        try:
+            ops = [op for user_id, record in shard.items() for op in iter_checkin_ops(user_id, record)]
+            await backend.save(shard, set(shard), ops)
+        finally:
+            await backend.close()
+
+    for source in sources:
+        for path in source[:2]:
+            if os.path.exists(path):
+                os.replace(path, path + ".resharded")
+        if source[3] and os.path.isdir(source[3]):
+            shutil.rmtree(source[3] + ".resharded", ignore_errors=True)
+            os.replace(source[3], source[3] + ".resharded")
+    logger.info("🔀 Split %s users from %s data sets into %s shards", len(users), len(sources), shards)
+    return len(users)
+
+
+if __name__ == "__main__":
+    # python storage.py goals.json goals.sqlite3
+    logging.basicConfig(level=logging.INFO)
+    source = sys.argv[1] if len(sys.argv) > 1 else "goals.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "goals.sqlite3"
+    asyncio.run(migrate_json_to_sqlite(source, target))
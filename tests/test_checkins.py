@@ -0,0 +1,110 @@
+"""CheckinHistory against a plain {(day, goal): done} reference."""
+import json
+import random
+from array import array
+
+import pytest
+
+from checkins import CheckinHistory, day_ordinal, day_string
+
+START = day_ordinal("2026-01-01")
+
+
+def random_history(seed, goal_count, days=60, toggles=600):
+    """A history and the reference dict built from the same random toggles (days in any order)"""
+    rng = random.Random(seed)
+    goals = [f"goal {i}" for i in range(goal_count)]
+    history = CheckinHistory()
+    reference = {}
+    for _ in range(toggles):
+        key = (START + rng.randrange(-10, days), rng.choice(goals))
+        done = rng.random() < 0.7
+        was_done = history.set(*key, done)
+        assert was_done == reference.get(key, False)
+        reference[key] = done
+    return history, reference
+
+
+def legacy_of(reference):
+    legacy = {}
+    for (ordinal, goal), done in reference.items():
+        legacy.setdefault(day_string(ordinal), {})[goal] = done
+    return legacy
+
+
+def assert_matches(history, reference):
+    for (ordinal, goal), done in reference.items():
+        assert history.get(ordinal, goal) == done
+    assert history.to_legacy() == legacy_of(reference)
+    assert sorted(history.iter_done()) == sorted(key for key, done in reference.items() if done)
+    for ordinal in {ordinal for ordinal, _ in reference}:
+        assert history.completed_count(ordinal) == sum(
+            done for (day, _), done in reference.items() if day == ordinal
+        )
+    assert history.day_count() == len({ordinal for ordinal, _ in reference})
+
+
+GOAL_COUNTS = (1, 8, 9, 16, 17, 33, 64, 65, 80)
+
+
+@pytest.mark.parametrize("goal_count", GOAL_COUNTS)
+def test_set_and_read_back(goal_count):
+    history, reference = random_history(goal_count, goal_count)
+    assert_matches(history, reference)
+
+
+@pytest.mark.parametrize("goal_count", GOAL_COUNTS)
+def test_compact_round_trip(goal_count):
+    history, reference = random_history(goal_count, goal_count)
+    restored = CheckinHistory.load(json.loads(json.dumps(history.to_compact())))
+    assert_matches(restored, reference)
+    assert restored.to_compact() == history.to_compact()
+
+
+@pytest.mark.parametrize("goal_count", GOAL_COUNTS)
+def test_legacy_round_trip(goal_count):
+    history, reference = random_history(goal_count, goal_count)
+    legacy = json.loads(json.dumps(history.to_legacy()))
+    restored = CheckinHistory.load(legacy)
+    assert_matches(restored, reference)
+    assert restored.to_legacy() == legacy
+
+
+def test_masks_widen_past_8_and_64_goals():
+    history = CheckinHistory()
+    widths = {}
+    for i in range(70):
+        history.set(START + i % 5, f"goal {i}", True)
+        widths[i + 1] = getattr(history.days, "typecode", None)
+    assert widths[8] == "B" and widths[9] == "H" and widths[17] == "I" and widths[33] == "Q"
+    assert widths[64] == "Q" and widths[65] is None and not isinstance(history.days, array)
+    # Every check-in made at a narrower width survived the widening
+    assert sorted(history.iter_done()) == sorted((START + i % 5, f"goal {i}") for i in range(70))
+    assert history.done_mask(START) == sum(1 << i for i in range(0, 70, 5))
+
+
+def test_toggled_off_goals_round_trip_as_false():
+    history = CheckinHistory()
+    history.set(START, "read", True)
+    history.set(START, "read", False)
+    history.set(START + 1, "run", False)
+    assert history.to_legacy() == {"2026-01-01": {"read": False}, "2026-01-02": {"run": False}}
+    assert CheckinHistory.load(history.to_compact()).to_legacy() == history.to_legacy()
+    assert list(history.iter_done()) == []
+
+
+@pytest.mark.parametrize("goal_count", (3, 9, 65))
+def test_split_before_and_update(goal_count):
+    history, reference = random_history(goal_count + 100, goal_count)
+    cutoff = START + 20
+    old = history.split_before(cutoff)
+    assert_matches(old, {key: done for key, done in reference.items() if key[0] < cutoff})
+    assert_matches(history, {key: done for key, done in reference.items() if key[0] >= cutoff})
+    assert_matches(old.update(history), reference)
+
+
+def test_copy_is_independent():
+    history, reference = random_history(7, 5)
+    copy = history.copy()
+    copy.set(START + 500, "goal 0", True)
+    assert_matches(history, reference)
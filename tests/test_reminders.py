@@ -0,0 +1,170 @@
+"""ReminderWheel on a simulated clock, against brute-force local wall-clock matching."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from reminders import ReminderWheel, CompletedGoals, MINUTES_PER_DAY, parse_time
+from timezones import get_timezone
+
+
+class Clock:
+    """Stands in for the wheel's wall clock; tick() runs for whatever minute it's set to"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_wheel(now, **kwargs):
+    sent = []
+
+    async def dispatch(due, payloads):
+        sent.extend((due, payload) for payload in payloads)
+
+    wheel = ReminderWheel(pytz.utc, dispatch, **kwargs)
+    wheel._current_minute = clock = Clock(now)
+    return wheel, clock, sent
+
+
+def run_minutes(wheel, clock, start, minutes):
+    async def ticks():
+        for step in range(minutes):
+            clock.now = start + timedelta(minutes=step)
+            await wheel.tick()
+
+    asyncio.run(ticks())
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=pytz.utc)
+
+
+# Reminders at these local times, around and away from the hours the clocks change
+LOCAL_TIMES = ("00:00", "00:30", "00:59", "01:00", "01:30", "01:59", "02:00", "02:30", "03:00", "07:15", "12:00", "23:59")
+
+# (zone, the instant its UTC offset changes), spring and autumn 2026
+TRANSITIONS = [
+    ("Europe/London", utc(2026, 3, 29, 1)),
+    ("Europe/London", utc(2026, 10, 25, 1)),
+    ("America/New_York", utc(2026, 3, 8, 7)),
+    ("America/New_York", utc(2026, 11, 1, 6)),
+]
+
+
+@pytest.mark.parametrize("zone_name, transition", TRANSITIONS)
+def test_dst_transitions_match_local_wall_clock(zone_name, transition):
+    zone = get_timezone(zone_name)
+    start = transition - timedelta(days=2)
+    minutes = 4 * MINUTES_PER_DAY
+    wheel, clock, sent = make_wheel(start)
+    for text in LOCAL_TIMES:
+        wheel.add(("user", text), parse_time(text), text, zone)
+    # A UTC reminder alongside, which never moves
+    wheel.add(("utc", "06:00"), parse_time("06:00"), "utc 06:00")
+
+    run_minutes(wheel, clock, start, minutes)
+
+    expected = []
+    for step in range(minutes):
+        now = start + timedelta(minutes=step)
+        local = now.astimezone(zone).strftime("%H:%M")
+        if local in LOCAL_TIMES:
+            expected.append((now, local))
+        if now.strftime("%H:%M") == "06:00":
+            expected.append((now, "utc 06:00"))
+    assert sorted(sent) == sorted(expected)
+
+
+@pytest.mark.parametrize("zone_name, transition", TRANSITIONS)
+def test_reminders_added_after_a_transition_use_the_new_offset(zone_name, transition):
+    zone = get_timezone(zone_name)
+    start = transition + timedelta(hours=2)
+    wheel, clock, sent = make_wheel(start)
+    wheel.add(("user", "goal"), parse_time("09:00"), "goal", zone)
+    run_minutes(wheel, clock, start, MINUTES_PER_DAY)
+    assert [due.astimezone(zone).strftime("%H:%M") for due, _ in sent] == ["09:00"]
+    assert wheel.next_run(("user", "goal"), start) == sent[0][0]
+
+
+def test_add_move_remove_and_per_user_keys():
+    start = utc(2026, 5, 1, 8)
+    wheel, clock, sent = make_wheel(start)
+    wheel.add(("u1", 1), parse_time("08:01"), "first")
+    wheel.add(("u1", 2), parse_time("08:02"), "second")
+    wheel.add(("u2", 1), parse_time("08:02"), "other user")
+    wheel.add(("u1", 1), parse_time("08:03"), "first, moved")
+    assert len(wheel) == 3
+    assert sorted(wheel.keys_for("u1")) == [("u1", 1), ("u1", 2)]
+    assert wheel.minute_for(("u1", 1)) == parse_time("08:03")
+    assert wheel.remove(("u1", 2)) and not wheel.remove(("u1", 2))
+    assert wheel.keys_for("u1") == [("u1", 1)]
+    run_minutes(wheel, clock, start, 10)
+    assert [payload for _, payload in sent] == ["other user", "first, moved"]
+    assert sorted(wheel.remove_all("u1")) == [("u1", 1)]
+    assert wheel.keys_for("u1") == [] and ("u1", 1) not in wheel and len(wheel) == 1
+
+
+def test_skipped_minutes_are_caught_up_within_the_window():
+    start = utc(2026, 5, 1, 8)
+    wheel, clock, sent = make_wheel(start, catch_up_minutes=10)
+    for minute in range(1, 31):
+        wheel.add(("u", minute), parse_time("08:00") + minute, minute)
+    run_minutes(wheel, clock, start, 1)
+    # The loop stalls from 08:01 to 08:25: only the last 10 skipped minutes are still sent, late and in order
+    clock.now = start + timedelta(minutes=25)
+    asyncio.run(wheel.tick())
+    assert [payload for _, payload in sent] == [25] + list(range(15, 25))
+    assert all(due == start + timedelta(minutes=payload) for due, payload in sent)
+
+
+def test_catch_up_limit_defers_the_rest_to_the_next_minute():
+    start = utc(2026, 5, 1, 8)
+    wheel, clock, sent = make_wheel(start, catch_up_minutes=60, catch_up_limit=3)
+    for minute in range(1, 6):
+        wheel.add(("u", minute), parse_time("08:00") + minute, minute)
+    run_minutes(wheel, clock, start, 1)
+    clock.now = start + timedelta(minutes=10)
+    asyncio.run(wheel.tick())
+    assert [payload for _, payload in sent] == [1, 2, 3]
+    clock.now = start + timedelta(minutes=11)
+    asyncio.run(wheel.tick())
+    assert [payload for _, payload in sent] == [1, 2, 3, 4, 5]
+
+
+def test_resume_catches_up_from_before_a_restart():
+    start = utc(2026, 5, 1, 8)
+    wheel, clock, sent = make_wheel(start + timedelta(minutes=5))
+    wheel.add(("u", 1), parse_time("08:03"), "missed while down")
+    wheel.resume(start)
+    asyncio.run(wheel.tick())
+    assert sent == [(start + timedelta(minutes=3), "missed while down")]
+
+
+def test_completed_goals_expire_at_the_end_of_the_day():
+    completed = CompletedGoals()
+    completed.set(("u", 1), 1000.0)
+    assert completed.done(("u", 1), 999.0)
+    assert not completed.done(("u", 1), 1000.0)
+    assert len(completed) == 0
+    completed.set(("u", 2), 1000.0)
+    completed.set(("u", 2), None)
+    assert not completed.done(("u", 2), 0.0)
+
+
+def test_clearing_reminders_forgets_done_goals():
+    from types import SimpleNamespace
+    from bot import forget_completions
+
+    completed = CompletedGoals()
+    application = SimpleNamespace(bot_data={"completed_goals": completed})
+    completed.set(("7", 1), 1000.0)
+    completed.set(("7", 2), 1000.0)
+    completed.set(("8", 1), 1000.0)
+    forget_completions(application, 7, {"reminders": {1: "09:00", 2: "21:30"}})
+    assert not completed.done(("7", 1), 0.0)
+    assert not completed.done(("7", 2), 0.0)
+    assert completed.done(("8", 1), 0.0)
@@ -0,0 +1,141 @@
+"""Multi-process mode: a leader and two bot.py shard workers over socketpair IPC.
+
+The leader runs in the test process against fake_bot_api.py, with the
+workers as real child processes. Users go through /start, /goals and
+setting a reminder; the test checks that every user's data ends up in the
+shard their id hashes to, and that reminders reach the leader's wheel and
+are sent from there, once each.
+"""
+import os
+import json
+import socket
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytz
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+from fake_bot_api import TOKEN, FakeBotApi
+from load_test import message_update, callback_update
+from shards import WorkerPool, shard_of, shard_path
+
+WORKERS = 2
+USERS = [3_000_000 + i for i in range(8)]
+
+
+def reminders_sent(api):
+    """Chats sent a reminder message, once per message"""
+    return [chat_id for chat_id, text in api.sent if text.startswith("⏰ *Reminder:")]
+
+
+class RecordingBotApi(FakeBotApi):
+    """FakeBotApi that also keeps every (chat_id, text) sent with sendMessage"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def message(self, params):
+        result = super().message(params)
+        self.sent.append((result["chat"]["id"], result["text"]))
+        return result
+
+
+def free_port_block(count):
+    """A port p with p..p+count-1 free; workers serve /metrics on PORT + 1 + SHARD"""
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        try:
+            for port in range(base, base + count):
+                with socket.socket() as s:
+                    s.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+
+
+def session(user_id, update_ids):
+    """Updates that set up a goal with a reminder at 09:30, in order"""
+    first = next(update_ids)
+    yield message_update(first, user_id, "/start")
+    for text in ("/goals", f"Goal for {user_id}", "/done", "/reminders"):
+        yield message_update(next(update_ids), user_id, text)
+    yield callback_update(next(update_ids), user_id, first, "r:1")
+    yield message_update(next(update_ids), user_id, "09:30")
+
+
+async def wait_for(condition, timeout=60.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_two_workers_route_by_user_and_only_the_leader_sends_reminders(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("STORAGE_BACKEND", "WEBHOOK_URL", "SHARD", "IPC_FD"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("BOT_TOKEN", TOKEN)
+    monkeypatch.setenv("PORT", str(free_port_block(WORKERS + 1)))
+    monkeypatch.setenv("CHECKIN_HOT_DAYS", "0")
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    import bot
+
+    async def main():
+        api = RecordingBotApi()
+        server = api.server(port=0)
+        await server.start()
+        base_url = f"http://127.0.0.1:{server.port}/bot"
+        monkeypatch.setenv("BOT_API_URL", base_url)  # for the workers
+        app = bot.build_application(ApplicationBuilder().token(TOKEN).base_url(base_url))
+        await app.initialize()
+        exits = []
+        pool = WorkerPool(
+            WORKERS, os.path.abspath(bot.__file__), partial(bot.handle_worker_message, app),
+            lambda index, returncode: exits.append((index, returncode))
+        )
+        wheel = app.bot_data["reminders"]
+        try:
+            await pool.start()
+            await asyncio.wait_for(pool.wait_loaded(), 60)
+
+            # The leader forwards each update to the worker owning its user
+            forwarding = asyncio.create_task(bot.forward_updates(app, pool))
+            update_ids = iter(range(1, 1 << 30))
+            for user_id in USERS:
+                for data in session(user_id, update_ids):
+                    await app.update_queue.put(Update.de_json(data, app.bot))
+            await app.update_queue.put(None)
+            await forwarding
+            await wait_for(lambda: len(wheel) == len(USERS))
+            assert all(len(wheel.keys_for(str(user_id))) == 1 for user_id in USERS)
+
+            # Workers keep their reminders on a wheel that never ticks: nothing is sent until the leader ticks
+            await asyncio.sleep(0.5)
+            assert reminders_sent(api) == []
+            minute = wheel.minute_for(wheel.keys_for(str(USERS[0]))[0])
+            due = datetime.now(pytz.utc).replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+            wheel._current_minute = lambda: due
+            await wheel.tick()
+            await wait_for(lambda: len(reminders_sent(api)) >= len(USERS), 30)
+            await asyncio.sleep(0.5)
+            assert sorted(reminders_sent(api)) == sorted(USERS)
+        finally:
+            await pool.close()
+            await bot.shutdown_bot(app)
+            await app.shutdown()
+            await server.close()
+        assert exits == []
+
+    asyncio.run(main())
+
+    # Each worker wrote only the users whose id hashes to its shard
+    assert {shard_of(user_id, WORKERS) for user_id in USERS} == set(range(WORKERS))
+    for index in range(WORKERS):
+        with open(shard_path("goals.json", index, WORKERS)) as f:
+            stored = set(json.load(f))
+        assert stored == {str(user_id) for user_id in USERS if shard_of(user_id, WORKERS) == index}
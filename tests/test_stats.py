@@ -0,0 +1,142 @@
+"""UserStats and GoalMatrix against brute-force counts over a plain set of (day, goal) check-ins."""
+import random
+from datetime import date
+
+import pytest
+
+from checkins import CheckinHistory, day_ordinal
+from stats import GoalMatrix, UserStats, ROLLING_DAYS
+
+TODAY = day_ordinal("2026-06-15")
+
+
+def runs_of(done):
+    """Runs of consecutive active days as (first, last), oldest first"""
+    runs = []
+    for ordinal in sorted({ordinal for ordinal, _ in done}):
+        if runs and runs[-1][1] == ordinal - 1:
+            runs[-1][1] = ordinal
+        else:
+            runs.append([ordinal, ordinal])
+    return [tuple(run) for run in runs]
+
+
+def assert_stats_match(stats, done, goals, today=TODAY):
+    runs = runs_of(done)
+    current = next((last - first + 1 for first, last in runs if last == today), 0)
+    assert stats.current_streak(today) == current
+    assert stats.longest_streak() == max((last - first + 1 for first, last in runs), default=0)
+    assert stats.latest_run() == (runs[-1] if runs else None)
+    assert stats.last_active() == (date.fromordinal(runs[-1][1]) if runs else None)
+    assert stats.done_counts(today - 13, today) == [
+        sum(1 for ordinal, _ in done if ordinal == day) for day in range(today - 13, today + 1)
+    ]
+    for goal in goals:
+        for days in (7, ROLLING_DAYS):
+            assert stats.completed_in(goal, days, today) == sum(
+                1 for ordinal, g in done if g == goal and today - days < ordinal <= today
+            )
+        assert stats.done(goal, today - 1, today) == ((today - 1, goal) in done)
+
+
+def random_toggles(rng, goals, days, count):
+    for _ in range(count):
+        yield TODAY - rng.randrange(days), rng.choice(goals), rng.random() < 0.75
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_updates_match_brute_force(seed):
+    rng = random.Random(seed)
+    goals = [f"g{i}" for i in range(rng.randrange(1, 5))]
+    history = CheckinHistory()
+    stats = UserStats.from_checkins(history, TODAY)
+    done = set()
+    for step, (ordinal, goal, value) in enumerate(random_toggles(rng, goals, 45, 400)):
+        stats.update(ordinal, goal, history.set(ordinal, goal, value), value)
+        if value:
+            done.add((ordinal, goal))
+        else:
+            done.discard((ordinal, goal))
+        if step % 10 == 0:
+            assert_stats_match(stats, done, goals)
+    assert_stats_match(stats, done, goals)
+    # Built from scratch, the same history gives the same aggregates
+    assert_stats_match(UserStats.from_checkins(history, TODAY), done, goals)
+
+
+def test_longest_streak_shrinks_when_its_run_is_broken():
+    history = CheckinHistory()
+    stats = UserStats.from_checkins(history, TODAY)
+    for ordinal in range(TODAY - 9, TODAY + 1):
+        stats.update(ordinal, "g", history.set(ordinal, "g", True), True)
+    stats.update(TODAY - 7, "g", history.set(TODAY - 7, "g", False), False)
+    assert stats.longest_streak() == 7
+    assert stats.current_streak(TODAY) == 7
+    stats.update(TODAY, "g", history.set(TODAY, "g", False), False)
+    assert stats.current_streak(TODAY) == 0
+    assert stats.longest_streak() == 6
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_archived_summary_continues_the_live_history(seed):
+    rng = random.Random(seed)
+    goals = ["a", "b"]
+    history = CheckinHistory()
+    done = set()
+    for ordinal, goal, value in random_toggles(rng, goals, 60, 300):
+        history.set(ordinal, goal, value)
+        if value:
+            done.add((ordinal, goal))
+        else:
+            done.discard((ordinal, goal))
+    cutoff = TODAY - 30
+    history.split_before(cutoff)
+    archived_runs = runs_of({key for key in done if key[0] < cutoff})
+    archived = (
+        cutoff,
+        max((last - first + 1 for first, last in archived_runs), default=0),
+        next((last - first + 1 for first, last in archived_runs if last == cutoff - 1), 0),
+        archived_runs[-1][1] if archived_runs else None
+    )
+    stats = UserStats.from_checkins(history, TODAY, archived)
+    runs = runs_of(done)
+    assert stats.longest_streak() == max((last - first + 1 for first, last in runs), default=0)
+    assert stats.current_streak(TODAY) == next((last - first + 1 for first, last in runs if last == TODAY), 0)
+    assert stats.last_active() == (date.fromordinal(runs[-1][1]) if runs else None)
+
+
+@pytest.mark.parametrize("goal_count", (1, 5, 8, 9, 20, 64, 65, 75))
+@pytest.mark.parametrize("offset", (-40, -10, 0, 25, 80))
+def test_goal_matrix_matches_brute_force(goal_count, offset):
+    rng = random.Random(goal_count * 1000 + offset)
+    goals = [f"g{i}" for i in range(goal_count)]
+    history = CheckinHistory()
+    done = set()
+    for _ in range(goal_count * 40):
+        ordinal, goal = TODAY + rng.randrange(60), rng.choice(goals)
+        value = rng.random() < 0.8
+        history.set(ordinal, goal, value)
+        if value:
+            done.add((ordinal, goal))
+        else:
+            done.discard((ordinal, goal))
+    # A subset of the goals in another order, plus one that was never checked
+    shown = rng.sample(goals, max(1, goal_count // 2)) + ["never checked"]
+    first, days = TODAY + offset, 30
+    window = range(first, first + days)
+    matrix = GoalMatrix(history, shown, first, days)
+
+    assert matrix.completed() == [sum(1 for ordinal in window if (ordinal, goal) in done) for goal in shown]
+    assert list(matrix.daily_totals()) == [sum(1 for goal in shown if (ordinal, goal) in done) for ordinal in window]
+    weekdays = [date.fromordinal(ordinal).weekday() for ordinal in window]
+    assert matrix.weekday_days() == [weekdays.count(weekday) for weekday in range(7)]
+    assert matrix.weekday_completed() == [
+        sum(1 for ordinal in window for goal in shown if (ordinal, goal) in done and date.fromordinal(ordinal).weekday() == weekday)
+        for weekday in range(7)
+    ]
+
+
+def test_goal_matrix_of_an_empty_history():
+    matrix = GoalMatrix(CheckinHistory(), ["g"], TODAY, 7)
+    assert matrix.completed() == [0]
+    assert list(matrix.daily_totals()) == [0] * 7
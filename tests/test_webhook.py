@@ -0,0 +1,99 @@
+"""Webhook mode against a local fake Telegram sender.
+
+The sender posts updates to the bot's HttpServer the way Telegram does; the
+application behind the webhook talks to fake_bot_api.py instead of the Bot
+API.
+"""
+import asyncio
+import httpx
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from bot import health
+from fake_bot_api import TOKEN, FakeBotApi
+from http_server import HttpServer
+from load_test import message_update
+from user_locks import PerUserUpdateProcessor
+from webhook import telegram_webhook
+
+SECRET = "s3cret"
+PATH = "/telegram"
+
+
+def run_webhook(scenario):
+    """Run scenario(client, base_url, received) against a webhook server backed by a started Application"""
+    async def main():
+        api = FakeBotApi().server(port=0)
+        await api.start()
+        app = (
+            ApplicationBuilder().token(TOKEN).base_url(f"http://127.0.0.1:{api.port}/bot")
+            .concurrent_updates(PerUserUpdateProcessor(8)).build()
+        )
+        received = []
+        processed = asyncio.Event()
+
+        async def record(update, context):
+            received.append(update)
+            processed.set()
+
+        app.add_handler(MessageHandler(filters.ALL, record))
+        server = HttpServer(host="127.0.0.1", port=0)
+        server.route("GET", "/", health)
+        server.route("POST", PATH, telegram_webhook(app, SECRET))
+        await app.initialize()
+        await app.start()
+        await server.start()
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+                await scenario(client, received, processed)
+        finally:
+            await server.close()
+            await app.stop()
+            await app.shutdown()
+            await api.close()
+
+    asyncio.run(main())
+
+
+def post_update(client, update, secret=SECRET):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret is not None else {}
+    return client.post(PATH, json=update, headers=headers)
+
+
+def test_wrong_secret_is_refused():
+    async def scenario(client, received, processed):
+        assert (await post_update(client, message_update(1, 1001, "/start"), "wrong")).status_code == 403
+        assert (await post_update(client, message_update(2, 1001, "/start"), None)).status_code == 403
+        await asyncio.sleep(0.1)
+        assert received == []
+
+    run_webhook(scenario)
+
+
+def test_update_is_processed():
+    async def scenario(client, received, processed):
+        response = await post_update(client, message_update(7, 1001, "hello"))
+        assert response.status_code == 200
+        await asyncio.wait_for(processed.wait(), 5)
+        assert [(u.update_id, u.effective_user.id, u.effective_message.text) for u in received] == [(7, 1001, "hello")]
+
+    run_webhook(scenario)
+
+
+def test_malformed_update_is_rejected():
+    async def scenario(client, received, processed):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"}
+        assert (await client.post(PATH, content=b"{not json", headers=headers)).status_code == 400
+        assert received == []
+
+    run_webhook(scenario)
+
+
+def test_health_and_unknown_routes():
+    async def scenario(client, received, processed):
+        response = await client.get("/")
+        assert response.status_code == 200
+        assert response.text == "Bot is Alive!"
+        assert (await client.get("/nowhere")).status_code == 404
+        assert (await client.get(PATH)).status_code == 405
+
+    run_webhook(scenario)
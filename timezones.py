@@ -0,0 +1,94 @@
+"""Users' timezones: interned tz objects, UTC offsets and DST transitions.
+
+A user's zone is stored by IANA name ("Europe/London") in the record's
+"timezone" key; records without one use the bot's default zone. The
+reminder wheel ticks in UTC, so each zone only matters twice: for the UTC
+offset its reminders are bucketed at, and for the next instant that offset
+changes (see ReminderWheel).
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+import pytz
+
+# /timezone also understands these; pytz has no IST, and the rest are
+# common answers to "what's your timezone?"
+ALIASES = {
+    "ist": "Asia/Kolkata",
+    "india": "Asia/Kolkata",
+    "uk": "Europe/London",
+    "bst": "Europe/London",
+    "cet": "Europe/Paris",
+    "pst": "America/Los_Angeles",
+    "pdt": "America/Los_Angeles",
+    "est": "America/New_York",
+    "edt": "America/New_York",
+    "cst": "America/Chicago",
+    "mst": "America/Denver",
+    "jst": "Asia/Tokyo",
+    "aest": "Australia/Sydney",
+}
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """The tz object for a zone name; one shared object per zone, so zones can key dicts"""
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=1)
+def _zones_by_city():
+    """{lowercased last part of the name ("london"): zone name} for names only one zone ends in"""
+    cities = {}
+    for name in pytz.common_timezones:
+        city = name.rsplit("/", 1)[-1].lower()
+        cities[city] = name if city not in cities else None
+    return {city: name for city, name in cities.items() if name}
+
+
+def find_timezone(text):
+    """Zone name for what a user typed ("Europe/London", "london", "new york", "IST"), or None"""
+    text = text.strip()
+    if not text:
+        return None
+    lowered = text.lower()
+    if lowered in ALIASES:
+        return ALIASES[lowered]
+    try:
+        return get_timezone(text).zone
+    except pytz.UnknownTimeZoneError:
+        pass
+    return _zones_by_city().get(lowered.replace(" ", "_"))
+
+
+def utc_offset_minutes(zone, when):
+    """The zone's UTC offset at the aware datetime `when`, in minutes"""
+    return int(when.astimezone(zone).utcoffset().total_seconds()) // 60
+
+
+def format_offset(minutes):
+    """330 -> 'UTC+05:30'"""
+    hours, rest = divmod(abs(minutes), 60)
+    return f"UTC{'-' if minutes < 0 else '+'}{hours:02d}:{rest:02d}"
+
+
+def next_transition(zone, when):
+    """First instant after the aware datetime `when` the zone's UTC offset may change (aware, UTC), or None"""
+    transitions = getattr(zone, "_utc_transition_times", None)
+    if not transitions:
+        return None
+    index = bisect_right(transitions, when.astimezone(pytz.utc).replace(tzinfo=None))
+    if index == len(transitions):
+        return None
+    return pytz.utc.localize(transitions[index])
+
+
+def local_run(zone, minute, now):
+    """Next aware datetime at local minute of day `minute` in the zone, strictly after `now`"""
+    local = now.astimezone(zone)
+    day = local.date()
+    while True:
+        run = zone.localize(datetime(day.year, day.month, day.day, minute // 60, minute % 60))
+        if run > now:
+            return run
+        day += timedelta(days=1)
@@ -0,0 +1,76 @@
+import asyncio
+from contextlib import asynccontextmanager
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class UserLocks:
+    """One asyncio.Lock per user, dropped again once nobody holds or waits for it"""
+
+    def __init__(self):
+        self._locks = {}  # key -> [lock, users]
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+def update_user_key(update):
+    """The id updates are serialized on: the sender, or the chat for user-less updates"""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates from different users concurrently, one user's updates in order.
+
+    The lock covers the whole of Application.process_update, including the
+    ConversationHandler state lookup, so two quick taps from the same user
+    can't both read the same conversation state or user record.
+
+    The per-user lock is taken before a processing slot, so updates queued
+    behind their user's lock don't occupy slots: a burst from one user uses
+    one slot and can't starve everybody else. The base class's own semaphore
+    is therefore given a limit that is never reached.
+    """
+
+    UNBOUNDED = 1 << 30
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(self.UNBOUNDED)
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        self.slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self.locks = UserLocks()
+
+    async def do_process_update(self, update, coroutine):
+        key = update_user_key(update)
+        if key is None:
+            async with self.slots:
+                await coroutine
+            return
+        async with self.locks.hold(key), self.slots:
+            await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass